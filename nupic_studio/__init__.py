@@ -1,6 +1,5 @@
 import pkg_resources
 from pathlib import Path
-from PyQt5 import QtGui, QtCore, QtWidgets
 
 __version__ = "1.1.3"
 REPO_DIR = str(Path(__file__).parent)
@@ -49,6 +48,14 @@ class MachineState(object):
         """
         return self.list
 
+    def copy(self):
+        """
+        Return a copy of this states machine which is not changed when this one rotates.
+        """
+        machine_state = MachineState(self.default_value, self.max_len)
+        machine_state.list = list(self.list)
+        return machine_state
+
     def rotate(self):
         """
         Update states machine by remove the first element and add a new element in the end.
@@ -95,52 +102,3 @@ def getInstantiatedClass(module_name, class_name, class_params):
     class_ = getattr(module, class_name)
     instance = class_(**class_params)
     return instance
-
-
-class ArrayTableModel(QtGui.QStandardItemModel):
-
-    def __init__(self, flags):
-        QtGui.QStandardItemModel.__init__(self)
-
-        self.flags = flags
-        self.header = []
-        self.data = []
-
-    def update(self, header, data):
-        self.header = header
-        self.data = data
-
-        num_cols = len(self.header)
-        self.setColumnCount(num_cols)
-        num_rows = len(self.data)
-        self.setRowCount(num_rows)
-
-        for col in range(num_cols):
-            self.setHeaderData(col, QtCore.Qt.Horizontal, self.header[col])
-
-        for row in range(num_rows):
-            for col in range(num_cols):
-                value = self.data[row][col]
-                self.setData(self.index(row, col, QtCore.QModelIndex()), value)
-
-    def setData(self, index, value, role=None):
-        self.data[index.row()][index.column()] = value
-        self.dataChanged.emit(index, index)
-        return True
-
-    def data(self, index, role=None):
-        column, row = index.column(), index.row()
-        if role == QtCore.Qt.TextAlignmentRole:
-            return QtCore.Qt.AlignRight
-        elif role == QtCore.Qt.DisplayRole:
-            return self.data[row][column]
-        return
-
-    def columnCount(self, parent=None, **kwargs):
-        return len(self.header)
-
-    def rowCount(self, parent=None, **kwargs):
-        return len(self.data)
-
-    def flags(self, index):
-        return self.flags
@@ -1,17 +1,39 @@
-from nupic_studio import MachineState
-from nupic_studio.htm import MAX_PREVIOUS_STEPS
-from nupic_studio.ui import Global
+from nupic_studio.htm.state_store import StateKind, StateField, CounterField, RateField
+from nupic_studio.htm.render_state import RenderField
 
 
-class Bit:
+class Bit(object):
     """
     A class only to group properties related to input bits of sensors.
     """
+    __slots__ = ('states', 'id', 'x', 'y', '__weakref__')
 
-    def __init__(self):
+    # States of this element
+    is_active = StateField(StateKind.ACTIVE)
+    is_predicted = StateField(StateKind.PREDICTED)
+    is_falsely_predicted = StateField(StateKind.FALSELY_PREDICTED)
+
+    # Statistics (counters are updated in bulk by the node and rates are calculated when read)
+    stats_activation_count = CounterField('activation_count')
+    stats_activation_rate = RateField('activation_count')
+    stats_predition_count = CounterField('prediction_count')
+    stats_precision_rate = RateField('prediction_count', 'activation_count')
+
+    # 3D object reference (kept in the render states table, see RenderField)
+    tree3d_initialized = RenderField('tree3d_initialized', False)
+    tree3d_pos = RenderField('tree3d_pos', (0, 0, 0))
+    tree3d_instance = RenderField('tree3d_instance', None)
+    tree3d_selected = RenderField('tree3d_selected', False)
+
+    def __init__(self, states):
         """
         Initializes a new instance of this class.
         """
+
+        # Store which holds the states of this element and the index of this element in it.
+        self.states = states
+        self.id = states.allocate()
+
         self.initialize()
 
     def initialize(self):
@@ -24,45 +46,3 @@ class Bit:
 
         # Position on Y axis
         self.y = -1
-
-        # States of this element
-        self.is_active = MachineState(False, MAX_PREVIOUS_STEPS)
-        self.is_predicted = MachineState(False, MAX_PREVIOUS_STEPS)
-        self.is_falsely_predicted = MachineState(False, MAX_PREVIOUS_STEPS)
-
-        # Statistics
-        self.stats_activation_count = 0
-        self.stats_activation_rate = 0.0
-        self.stats_predition_count = 0
-        self.stats_precision_rate = 0.0
-
-        # 3D object reference
-        self.tree3d_initialized = False
-        self.tree3d_pos = (0, 0, 0)
-        self.tree3d_item_np = None
-        self.tree3d_selected = False
-
-    def nextStep(self):
-        """
-        Perfoms actions related to time step progression.
-        """
-
-        # Update states machine by remove the first element and add a new element in the end
-        self.is_active.rotate()
-        self.is_predicted.rotate()
-        self.is_falsely_predicted.rotate()
-
-    def calculateStatistics(self):
-        """
-        Calculate statistics after an iteration.
-        """
-
-        # Calculate statistics
-        if self.is_active.atCurrStep():
-            self.stats_activation_count += 1
-        if self.is_predicted.atCurrStep():
-            self.stats_predition_count += 1
-        if Global.curr_step > 0:
-            self.stats_activation_rate = self.stats_activation_count / float(Global.curr_step)
-        if self.stats_activation_count > 0:
-            self.stats_precision_rate = self.stats_predition_count / float(self.stats_activation_count)
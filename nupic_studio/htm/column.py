@@ -1,51 +1,46 @@
-from nupic_studio.htm.segment import Segment, SegmentType
+from nupic_studio.htm.render_state import RenderField
 
 
-class Column:
+class Column(object):
     """
     A class only to group properties related to columns.
     """
+    __slots__ = ('region', 'idx', 'x', 'y', 'segment', '__weakref__')
 
-    def __init__(self):
+    # 3D object reference (kept in the render states table, see RenderField)
+    tree3d_pos = RenderField('tree3d_pos', (0, 0, 0))
+
+    def __init__(self, region, idx, segment):
         """
         Initializes a new instance of this class.
         """
 
+        # Region which holds the cells of this column.
+        self.region = region
+
+        # Index of this column in the spatial pooler.
+        self.idx = idx
+
         # Position on X axis
-        self.x = -1
+        self.x = idx // region.height
 
         # Position on Y axis
-        self.y = -1
+        self.y = idx % region.height
 
         # Proximal segment of this column
-        self.segment = Segment(SegmentType.PROXIMAL)
-
-        # List of cells that compose this column.
-        self.cells = []
-
-        # 3D object reference
-        self.tree3d_pos = (0, 0, 0)
-
-    def getCell(self, z):
-        """
-        Return the cell located at given position
-        """
-        for cell in self.cells:
-            if cell.z == z:
-                return cell
+        self.segment = segment
 
-    def nextStep(self):
+    @property
+    def cells(self):
         """
-        Perfoms actions related to time step progression.
+        Return the list of cells that compose this column (cells are created by the region when first requested).
         """
-        self.segment.nextStep()
-        for cell in self.cells:
-            cell.nextStep()
+        first_idx = self.idx * self.region.cells_per_column
+        return [self.region.getCell(first_idx + z) for z in range(self.region.cells_per_column)]
 
-    def calculateStatistics(self):
+    def getCell(self, z):
         """
-        Calculate statistics after an iteration.
+        Return the cell located at given position
         """
-        self.segment.calculateStatistics()
-        for cell in self.cells:
-            cell.calculateStatistics()
+        if 0 <= z < self.region.cells_per_column:
+            return self.region.getCell((self.idx * self.region.cells_per_column) + z)
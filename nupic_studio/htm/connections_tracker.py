@@ -0,0 +1,113 @@
+from nupic_studio.htm.run_context import NetworkError
+
+
+class ConnectionsTracker(object):
+    """
+    Records the changes made by the temporal pooler on its connections (distal segments and synapses) during a time
+    step, so a region only needs to synchronize its elements where something changed.
+    """
+
+    def __init__(self, connections):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Connections being tracked.
+        self.connections = connections
+
+        # Segments created in the current time step and the index of the cell which they belong to.
+        self.created_segments = {}
+
+        # Segments destroyed in the current time step.
+        self.destroyed_segments = set()
+
+        # Synapses created in the current time step.
+        self.created_synapses = set()
+
+        # Synapses destroyed in the current time step.
+        self.destroyed_synapses = set()
+
+        # Synapses whose permanence was updated in the current time step.
+        self.updated_synapses = set()
+
+        # Whether a segment is being destroyed, so the synapses destroyed with it are not registered twice.
+        self.destroying_segment = False
+
+        # Intercept the methods which change the connections
+        self.hook('createSegment', self.onCreateSegment)
+        self.hook('destroySegment', self.onDestroySegment)
+        self.hook('createSynapse', self.onCreateSynapse)
+        self.hook('destroySynapse', self.onDestroySynapse)
+        self.hook('updateSynapsePermanence', self.onUpdateSynapsePermanence)
+
+    def hook(self, name, callback):
+        """
+        Replace a method of the connections by a callback which receives the original method.
+        A region could not keep its elements synchronized without every change, so a missing method is an error.
+        """
+        original = getattr(self.connections, name, None)
+        if original is None:
+            raise NetworkError("Connections class '" + self.connections.__class__.__name__ + "' does not have the method '" + name + "', so its changes cannot be tracked.")
+
+        def wrapper(*args, **kwargs):
+            return callback(original, *args, **kwargs)
+        setattr(self.connections, name, wrapper)
+
+    def reset(self):
+        """
+        Forget the changes already synchronized.
+        """
+        self.created_segments = {}
+        self.destroyed_segments = set()
+        self.created_synapses = set()
+        self.destroyed_synapses = set()
+        self.updated_synapses = set()
+
+    def onCreateSegment(self, original, cell, *args, **kwargs):
+        segment = original(cell, *args, **kwargs)
+        self.created_segments[segment] = cell
+        return segment
+
+    def onDestroySegment(self, original, segment, *args, **kwargs):
+
+        # Synapses are destroyed together with their segment
+        # The original method may destroy them through destroySynapse, which must not register them again
+        for synapse in list(self.connections.synapsesForSegment(segment)):
+            self.forgetSynapse(synapse)
+        self.destroying_segment = True
+        try:
+            original(segment, *args, **kwargs)
+        finally:
+            self.destroying_segment = False
+
+        # A segment created and destroyed in the same time step never reaches the region
+        if segment in self.created_segments:
+            del self.created_segments[segment]
+        else:
+            self.destroyed_segments.add(segment)
+
+    def onCreateSynapse(self, original, segment, *args, **kwargs):
+        synapse = original(segment, *args, **kwargs)
+        self.created_synapses.add(synapse)
+        return synapse
+
+    def onDestroySynapse(self, original, synapse, *args, **kwargs):
+        if not self.destroying_segment:
+            self.forgetSynapse(synapse)
+        return original(synapse, *args, **kwargs)
+
+    def onUpdateSynapsePermanence(self, original, synapse, *args, **kwargs):
+        self.updated_synapses.add(synapse)
+        return original(synapse, *args, **kwargs)
+
+    def forgetSynapse(self, synapse):
+        """
+        Register a synapse as destroyed.
+        """
+        self.updated_synapses.discard(synapse)
+
+        # A synapse created and destroyed in the same time step never reaches the region
+        if synapse in self.created_synapses:
+            self.created_synapses.discard(synapse)
+        else:
+            self.destroyed_synapses.add(synapse)
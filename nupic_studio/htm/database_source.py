@@ -0,0 +1,270 @@
+import os
+import re
+import datetime
+import threading
+import sqlite3
+import dateutil.parser
+from nupic_studio.htm.encoding import FieldDataType
+
+
+class SQLiteDriver(object):
+    """
+    Interface between the SQLite module and the database record stream. Connection strings are like
+    'sqlite:///path/to/file.db' or just the file path.
+    Other drivers can be plugged in by adding a class with the same methods to DATABASE_DRIVERS.
+    """
+
+    def resolveAddress(self, address, base_dir):
+        """
+        Return the address of a database given relatively to a directory (like the one of the project file).
+        """
+        if address == ':memory:' or os.path.isabs(address):
+            return address
+        return os.path.join(base_dir, address)
+
+    def connect(self, address):
+        """
+        Open a connection to the database given by an address (the connection string without its scheme).
+        """
+
+        # SQLite creates an empty database for a file which does not exist, which would hide a mistyped path
+        if address != ':memory:' and not os.path.isfile(address):
+            raise IOError("Database file '" + address + "' was not found.")
+
+        # The connection is shared by the read-ahead threads of the sensors, which are serialized by the pool
+        return sqlite3.connect(address, check_same_thread=False)
+
+    def quoteIdentifier(self, name):
+        """
+        Return a table or field name quoted to be used in a query.
+        """
+        return '"' + name + '"'
+
+    def getSelectQuery(self, table, offset):
+        """
+        Return the query which selects the records of a table in a stable order, starting from a given offset.
+        """
+        query = "SELECT * FROM " + self.quoteIdentifier(table) + " ORDER BY rowid"
+        if offset > 0:
+            query += " LIMIT -1 OFFSET " + str(int(offset))
+        return query
+
+
+# Drivers available for each scheme of the connection strings.
+DATABASE_DRIVERS = {'sqlite': SQLiteDriver}
+
+# Scheme used by connection strings which do not give one.
+DEFAULT_SCHEME = 'sqlite'
+
+
+def parseConnectionString(connection_string):
+    """
+    Return the scheme and the address given by a connection string like 'scheme:///address'.
+    """
+    match = re.match(r'^(\w+):///?(.*)$', connection_string)
+    if match is None:
+        return DEFAULT_SCHEME, connection_string
+    return match.group(1).lower(), match.group(2)
+
+
+class PooledConnection(object):
+    """
+    A connection shared by all streams which read the same database.
+    """
+
+    def __init__(self, key, connection):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Key of the connection in the pool.
+        self.key = key
+
+        # DB-API connection.
+        self.connection = connection
+
+        # Lock which serializes the use of the connection by different threads.
+        self.lock = threading.Lock()
+
+        # Number of streams using the connection.
+        self.references = 0
+
+
+class ConnectionPool(object):
+    """
+    Pool of database connections, so that sensors reading the same database do not open a connection each one.
+    A connection is closed when the last stream using it is closed.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Connections opened for each driver and address.
+        self.connections = {}
+
+        # Lock which protects the pool itself.
+        self.lock = threading.Lock()
+
+    def acquire(self, driver, address):
+        """
+        Return the connection to a database, opening it if it is not in the pool.
+        """
+        key = (driver.__class__, address)
+        with self.lock:
+            pooled_connection = self.connections.get(key)
+            if pooled_connection is None:
+                pooled_connection = PooledConnection(key, driver.connect(address))
+                self.connections[key] = pooled_connection
+            pooled_connection.references += 1
+        return pooled_connection
+
+    def release(self, pooled_connection):
+        """
+        Return a connection to the pool, closing it if it is not used anymore.
+        """
+        with self.lock:
+            pooled_connection.references -= 1
+            if pooled_connection.references == 0:
+                del self.connections[pooled_connection.key]
+                pooled_connection.connection.close()
+
+
+# Pool shared by all database record streams.
+connection_pool = ConnectionPool()
+
+
+class DatabaseRecordStream(object):
+    """
+    Reads the records of a database table in batches through a cursor, with the same interface of a FileRecordStream.
+    Records are returned as dictionaries from field name to value, converted to the data types of the encodings.
+    """
+
+    def __init__(self, connection_string, table, field_types=None, batch_size=256, offset=0, base_dir=''):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Check the data source before opening anything
+        scheme, address = parseConnectionString(connection_string)
+        if scheme not in DATABASE_DRIVERS:
+            raise ValueError("Database scheme '" + scheme + "' is not supported.")
+        if re.match(r'^\w+$', table) is None:
+            raise ValueError("Database table name '" + table + "' is not valid.")
+
+        # Driver for the database and the connection shared with other streams.
+        # Relative addresses are given from a base directory (like the one of the project file) instead of the current
+        # directory.
+        self.driver = DATABASE_DRIVERS[scheme]()
+        self.address = self.driver.resolveAddress(address, base_dir)
+        self.pooled_connection = connection_pool.acquire(self.driver, self.address)
+
+        # Table whose records are read.
+        self.table = table
+
+        # Data type of each field which should be converted.
+        self.field_types = field_types or {}
+
+        # Number of records fetched at once.
+        self.batch_size = batch_size
+
+        # Cursor of the current query, its field names and the records fetched but not returned yet.
+        self.cursor = None
+        self.field_names = []
+        self.batch = []
+        self.position = 0
+
+        # Index of the next record returned.
+        self.offset = 0
+
+        # The connection is returned to the pool if the table can not be read
+        try:
+            self.seek(offset)
+        except Exception:
+            self.close()
+            raise
+
+    def seek(self, offset):
+        """
+        Move to the record at a given offset of the table.
+        """
+        self.closeCursor()
+        with self.pooled_connection.lock:
+            self.cursor = self.pooled_connection.connection.cursor()
+            self.cursor.execute(self.driver.getSelectQuery(self.table, offset))
+        self.field_names = [description[0] for description in self.cursor.description]
+        self.batch = []
+        self.position = 0
+        self.offset = offset
+
+    def rewind(self):
+        """
+        Move to the first record of the table.
+        """
+        self.seek(0)
+
+    def getNextRecordDict(self):
+        """
+        Return the next record or None if the end of the table was reached.
+        """
+
+        # Fetch the next batch when the current one is over
+        if self.position >= len(self.batch):
+            if self.cursor is None:
+                return None
+            with self.pooled_connection.lock:
+                self.batch = self.cursor.fetchmany(self.batch_size)
+            self.position = 0
+            if len(self.batch) == 0:
+                return None
+
+        row = self.batch[self.position]
+        self.position += 1
+        self.offset += 1
+
+        record = {}
+        for i in range(len(self.field_names)):
+            field_name = self.field_names[i]
+            record[field_name] = self.convertValue(row[i], self.field_types.get(field_name))
+        return record
+
+    def convertValue(self, value, data_type):
+        """
+        Convert a value read from the database to a given data type (as a FileRecordStream does for its fields).
+        """
+        if value is None or data_type is None:
+            return value
+        if data_type == FieldDataType.BOOLEAN:
+            return bool(value)
+        elif data_type == FieldDataType.INTEGER:
+            return int(value)
+        elif data_type == FieldDataType.DECIMAL:
+            return float(value)
+        elif data_type == FieldDataType.DATE_TIME:
+            if not isinstance(value, datetime.datetime):
+                return dateutil.parser.parse(str(value))
+            return value
+        elif data_type == FieldDataType.STRING:
+            return str(value)
+        return value
+
+    def closeCursor(self):
+        """
+        Close the cursor of the current query.
+        """
+        if self.cursor is not None:
+            with self.pooled_connection.lock:
+                self.cursor.close()
+            self.cursor = None
+        self.batch = []
+        self.position = 0
+
+    def close(self):
+        """
+        Close the cursor and return the connection to the pool.
+        """
+        self.closeCursor()
+        if self.pooled_connection is not None:
+            connection_pool.release(self.pooled_connection)
+            self.pooled_connection = None
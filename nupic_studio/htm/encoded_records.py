@@ -0,0 +1,157 @@
+import os
+import hashlib
+import numpy
+
+
+# Directory where the encoded records of data files are saved.
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.nupic_studio', 'cache')
+
+# Version of the format of the cache files (files of other versions are ignored).
+CACHE_VERSION = 1
+
+
+def getCacheFileName(file_name, encodings):
+    """
+    Return the name of the cache file for a data file encoded with given encodings.
+    The name starts with a prefix given by the path of the data file (see getCachePrefix) and changes whenever the data
+    file (its size or modification time) or the encodings change, so old cache files are never used.
+    """
+    key = [CACHE_VERSION, os.path.abspath(file_name), os.path.getsize(file_name), os.path.getmtime(file_name)]
+    for encoding in encodings:
+        key.append((encoding.data_source_field_name, encoding.data_source_field_data_type, encoding.encoder_module,
+                    encoding.encoder_class, encoding.encoder_params, encoding.encoder_field_name))
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    return getCachePrefix(file_name) + digest + '.npz'
+
+
+def getCachePrefix(file_name):
+    """
+    Return the prefix shared by all cache files of a data file, whatever its contents or encodings.
+    """
+    path_digest = hashlib.sha1(os.path.abspath(file_name).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(CACHE_DIR, os.path.basename(file_name) + '.' + path_digest + '.')
+
+
+class EncodedRecords(object):
+    """
+    Encoded bits and scalar values of all records of a data source, so that records are only encoded in the first
+    pass over the source. The next passes (after rewind) and later runs take them from memory or from a cache file.
+    """
+
+    def __init__(self, cache_file_name, width, max_size=256 * 1024 * 1024, stale_prefix=None):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # File where the encoded records are saved.
+        self.cache_file_name = cache_file_name
+
+        # Prefix of the cache files of older versions of the same data file, which are removed when a new one is
+        # saved so the cache does not grow with every change of the data file or of the encodings.
+        self.stale_prefix = stale_prefix
+
+        # Number of bits of each encoded record.
+        self.width = width
+
+        # Maximum number of bytes kept in memory. Sources which exceed it are always encoded.
+        self.max_size = max_size
+
+        # Bits (packed in bytes) and scalar values of the records.
+        self.bits = []
+        self.scalars = []
+
+        # Whether all records of the source are already encoded.
+        self.complete = False
+
+        # Whether records are still being recorded.
+        self.enabled = True
+
+        # Position of the next record to be returned.
+        self.position = 0
+
+    def load(self):
+        """
+        Load the records encoded in a previous run. Return False if they were not found.
+        """
+        if not os.path.isfile(self.cache_file_name):
+            return False
+        try:
+            with numpy.load(self.cache_file_name) as data:
+                self.bits = data['bits']
+                self.scalars = data['scalars']
+        except (IOError, OSError, ValueError, KeyError):
+            return False
+        self.complete = True
+        self.position = 0
+        return True
+
+    def add(self, output_array, output_values):
+        """
+        Record the encoded bits and the scalar values of the next record of the first pass.
+        """
+        if self.complete or not self.enabled:
+            return
+
+        try:
+            scalars = numpy.array(output_values, dtype=numpy.float64)
+        except (TypeError, ValueError):
+            scalars = None
+        size = (len(self.bits) + 1) * (((self.width + 7) // 8) + (len(output_values) * 8))
+        if scalars is None or size > self.max_size:
+            # The records cannot be recorded, so they will be always encoded
+            self.enabled = False
+            self.bits = []
+            self.scalars = []
+            return
+
+        self.bits.append(numpy.packbits(output_array > 0))
+        self.scalars.append(scalars)
+
+    def finishPass(self):
+        """
+        Mark the end of the first pass over the source and save the recorded records into the cache file.
+        Return True if the next passes can be taken from the recorded records.
+        """
+        if self.complete:
+            self.position = 0
+            return True
+        if not self.enabled or len(self.bits) == 0:
+            return False
+
+        self.bits = numpy.array(self.bits, dtype=numpy.uint8)
+        self.scalars = numpy.array(self.scalars, dtype=numpy.float64)
+        self.complete = True
+        self.position = 0
+
+        # Failing to write the cache only means that the next runs will encode the records again
+        try:
+            if not os.path.isdir(CACHE_DIR):
+                os.makedirs(CACHE_DIR)
+            numpy.savez_compressed(self.cache_file_name, bits=self.bits, scalars=self.scalars)
+            self.removeStaleFiles()
+        except (IOError, OSError):
+            pass
+        return True
+
+    def removeStaleFiles(self):
+        """
+        Remove the cache files of older versions of the same data file.
+        """
+        if self.stale_prefix is None:
+            return
+        cache_dir, prefix = os.path.split(self.stale_prefix)
+        for name in os.listdir(cache_dir):
+            file_name = os.path.join(cache_dir, name)
+            if name.startswith(prefix) and name.endswith('.npz') and file_name != self.cache_file_name:
+                os.remove(file_name)
+
+    def getNext(self):
+        """
+        Return the encoded bits and the scalar values of the next record, moving to the first one after the last.
+        """
+        if self.position >= len(self.bits):
+            self.position = 0
+        output_array = numpy.unpackbits(self.bits[self.position])[:self.width].astype(numpy.float64)
+        output_values = self.scalars[self.position]
+        self.position += 1
+        return output_array, output_values
@@ -1,3 +1,5 @@
+import collections
+import numpy
 from nupic_studio import MachineState
 from nupic_studio.htm import MAX_PREVIOUS_STEPS, MAX_FUTURE_STEPS, MAX_PREVIOUS_STEPS_WITH_INFERENCE
 from nupic.algorithms.CLAClassifier import CLAClassifier
@@ -14,6 +16,98 @@ class FieldDataType:
     STRING = "String"
 
 
+class EncoderMemo(object):
+    """
+    Bounded LRU memoization around an encoder, given that most fields take a small set of distinct values.
+    Encodings are keyed by the raw value and decodings by the packed bit pattern.
+    """
+
+    def __init__(self, encoder, max_size=1024):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Encoder whose results are memoized.
+        self.encoder = encoder
+
+        # Maximum number of results kept for each operation.
+        self.max_size = max_size
+
+        # Results of the last encodings and decodings, from the least to the most recently used.
+        self.encodings = collections.OrderedDict()
+        self.decodings = collections.OrderedDict()
+
+        # Statistics
+        self.encode_hits = 0
+        self.encode_misses = 0
+        self.decode_hits = 0
+        self.decode_misses = 0
+
+    def getCached(self, cache, key):
+        """
+        Return the result cached for a key (marking it as the most recently used) or None if it is not cached.
+        """
+        result = cache.pop(key, None)
+        if result is not None:
+            cache[key] = result
+        return result
+
+    def putCached(self, cache, key, result):
+        """
+        Cache the result for a key, discarding the least recently used result when the cache is full.
+        """
+        cache[key] = result
+        if len(cache) > self.max_size:
+            cache.popitem(last=False)
+
+    def encode(self, value):
+        """
+        Return the encoded bits and the scalar values of a raw value.
+        """
+
+        # Unhashable values can not be memoized
+        try:
+            result = self.getCached(self.encodings, value)
+        except TypeError:
+            return self.computeEncoding(value)
+
+        if result is not None:
+            self.encode_hits += 1
+        else:
+            self.encode_misses += 1
+            result = self.computeEncoding(value)
+            self.putCached(self.encodings, value, result)
+        return result
+
+    def computeEncoding(self, value):
+        """
+        Encode a raw value with the encoder.
+        Scalar values are converted to floats, the same type of the values taken from the encoded records.
+        """
+        output = numpy.zeros(self.encoder.getWidth())
+        self.encoder.encodeIntoArray(value, output)
+        scalars = self.encoder.getScalars(value)
+        try:
+            scalars = numpy.asarray(scalars, dtype=numpy.float64)
+        except (TypeError, ValueError):
+            pass
+        return output, scalars
+
+    def decode(self, encoded, parent_field_name=''):
+        """
+        Return the fields dictionary and the fields order decoded from a bit pattern.
+        """
+        key = numpy.packbits(numpy.asarray(encoded) > 0).tobytes()
+        result = self.getCached(self.decodings, key)
+        if result is not None:
+            self.decode_hits += 1
+        else:
+            self.decode_misses += 1
+            result = self.encoder.decode(encoded, parentFieldName=parent_field_name)
+            self.putCached(self.decodings, key, result)
+        return result
+
+
 class Encoding:
     """
     A class only to group properties related to encodings.
@@ -33,6 +127,9 @@ class Encoding:
         # Optional encoder to convert raw data to htm input and vice-versa.
         self.encoder = None
 
+        # Memoization of the encoder results.
+        self.encoder_memo = None
+
         # Module name which encoder class is imported.
         self.encoder_module = ""
 
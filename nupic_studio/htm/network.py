@@ -1,9 +1,12 @@
-import os
 import collections
 import json
+import time
+from nupic_studio import MachineState
+from nupic_studio.htm import MAX_PREVIOUS_STEPS_WITH_INFERENCE
 from nupic_studio.htm.node import NodeType
 from nupic_studio.htm.link import Link
-from nupic_studio.ui import Global
+from nupic_studio.htm.network_snapshot import NetworkSnapshot
+from nupic_studio.htm.run_context import RunContext, NetworkError, StatisticsLevel, STATISTICS_LEVELS
 
 
 class Network:
@@ -28,6 +31,28 @@ class Network:
         # The last phase is the phase where top nodes (that do not feed nothing but only receive inputs) are processed.
         self.phases = []
 
+        # Nodes in topological order (i.e. every node comes after the nodes that feed it).
+        self.topological_order = []
+
+        # Time (in seconds) spent by each phase in the last time step.
+        self.phase_times = []
+
+        # Indexes of the nodes by name and of the nodes that feed or are fed by each node.
+        # They are rebuilt from nodes and links only after the hierarchy changes.
+        self.nodes_by_name = {}
+        self.feeders = {}
+        self.feds = {}
+        self.indexes_valid = False
+
+        # Context shared by the nodes of this network along a simulation.
+        self.context = RunContext(self)
+
+        # Whether regions compute their algorithms in worker processes, so the ones of a same phase run in parallel.
+        self.parallel = False
+
+        # Granularity of the statistics calculated at each time step.
+        self.statistics_level = StatisticsLevel.FULL
+
         # Statistics
         self.stats_precision_rate = 0.0
 
@@ -36,82 +61,162 @@ class Network:
         Initialize this network.
         """
 
+        # Reset time steps
+        self.context.curr_step = 0
+        self.context.stats_step = -1
+        self.context.prediction_steps = MachineState(0, MAX_PREVIOUS_STEPS_WITH_INFERENCE)
+
         # Initialize nodes using phases order
-        for nodes in self.phases:
-            for node in nodes:
-                initialized = node.initialize()
-                if not initialized:
-                    return False
+        # Nodes raise an error when they cannot be initialized, which is reported to the context listener
+        try:
+            for nodes in self.phases:
+                for node in nodes:
+                    node.initialize()
+        except NetworkError as error:
+            self.context.reportError(str(error))
+            return False
 
         return True
 
-    def nextStep(self):
+    def nextStep(self, fast=False):
         """
         Perfoms actions related to time step progression.
+        If fast is True, only the algorithms (spatial pooler, temporal pooler and classifiers) are computed. The states of
+        the elements (bits, cells, segments and synapses) are rebuilt in the next step which is not fast and statistics
+        should not be calculated for fast steps.
         """
 
         # Process nodes using phases order
+        # All nodes of a phase are started before finish any of them, so the ones which compute in worker processes
+        # run in parallel
+        # The time spent by each node and phase is measured to estimate the cost of the next step
+        self.phase_times = []
         for nodes in self.phases:
+            phase_start_time = time.time()
+
+            # The costliest nodes are started first, so they do not delay the end of the phase
+            if self.parallel:
+                nodes = sorted(nodes, key=lambda node: node.step_time, reverse=True)
+
+            for node in nodes:
+                start_time = time.time()
+                node.beginStep(fast)
+                node.step_time = time.time() - start_time
             for node in nodes:
-                node.nextStep()
+                start_time = time.time()
+                node.endStep(fast)
+                node.step_time += time.time() - start_time
+
+            self.phase_times.append(time.time() - phase_start_time)
+
+    def shutdown(self):
+        """
+        Release the resources held by the nodes (like worker processes).
+        """
+        for node in self.nodes:
+            node.shutdown()
 
     def preparePhases(self):
         """
         Prepare phases analysing links between nodes.
+        Phases are planned by a topological sort (Kahn's algorithm): sensors are put into the first phase and any
+        other node is put into the phase which follows the phase of its last feeder.
         """
         self.phases = []
+        self.invalidateIndexes()
+
+        # Bind all nodes to the context of this network
+        for node in self.nodes:
+            node.context = self.context
 
-        # First put all sensors as non allocated nodes
-        non_allocated_nodes = [node for node in self.nodes if node.type == NodeType.SENSOR]
-
-        # Now find the regions that these sensors feed and process them recursively
-        self.processPhase(non_allocated_nodes)
-
-    def processPhase(self, non_allocated_nodes):
-
-        # Check what nodes in the temporary list could be allocated into next phase
-        # Only allocate a node to the next phase if this node not receives inputs of other non allocated node
-        # if the node depends of other nodes, the latter ones has priority to be allocated into next phase
-        phase_nodes = []
-        for node in non_allocated_nodes:
-            can_allocate = True
-            for link in self.links:
-                if link.in_node == node and link.out_node in non_allocated_nodes:
-                    can_allocate = False
-                    break
-            if can_allocate:
-                phase_nodes.append(node)
-        self.phases.append(phase_nodes)
-
-        # Remove allocated nodes from non allocated list
-        for node in phase_nodes:
-            if node in non_allocated_nodes:
-                non_allocated_nodes.remove(node)
-
-        # Add higher regions of the phase nodes into non allocated nodes list
-        non_allocated_nodes = [link.in_node
-                               for link in self.links
-                               for node in phase_nodes
-                               if link.out_node == node and not link.in_node in non_allocated_nodes]
-
-        # Process recursively the remaining nodes
-        if len(non_allocated_nodes) > 0:
-            self.processPhase(non_allocated_nodes)
+        # Count the feeders of each node that still were not allocated into a phase
+        pending_feeders_count = {}
+        for node in self.nodes:
+            pending_feeders_count[node] = len(self.getFeederNodes(node))
+
+        # First put all sensors into the first phase
+        # Then allocate into the next phase the nodes whose last pending feeder was allocated in the current phase
+        phase_nodes = [node for node in self.nodes if node.type == NodeType.SENSOR]
+        while len(phase_nodes) > 0:
+            self.phases.append(phase_nodes)
+            next_phase_nodes = []
+            for node in phase_nodes:
+                for fed in self.getFedNodes(node):
+                    pending_feeders_count[fed] -= 1
+                    if pending_feeders_count[fed] == 0:
+                        next_phase_nodes.append(fed)
+            phase_nodes = next_phase_nodes
+        self.topological_order = [node for nodes in self.phases for node in nodes]
+        self.phase_times = []
+
+    def getPlan(self):
+        """
+        Return the phases as a list of dictionaries with the estimated cost of each node (i.e. the time spent by it in
+        the last time step) and the time spent by the whole phase in the last time step. Times are given in seconds.
+        """
+        plan = []
+        for i in range(len(self.phases)):
+            phase = {}
+            phase['nodes'] = [(node.name, node.step_time) for node in self.phases[i]]
+            phase['time'] = self.phase_times[i] if i < len(self.phase_times) else 0.0
+            plan.append(phase)
+        return plan
+
+    def getCriticalPath(self):
+        """
+        Return the chain of nodes (from a sensor to a top region) with the biggest estimated cost, and this cost.
+        A time step cannot take less than this even if all nodes of each phase run in parallel.
+        """
+        finish_costs = {}
+        previous_nodes = {}
+        for node in self.topological_order:
+            start_cost = 0.0
+            previous_nodes[node] = None
+            for feeder in self.getFeederNodes(node):
+                if feeder in finish_costs and (previous_nodes[node] is None or finish_costs[feeder] > start_cost):
+                    start_cost = finish_costs[feeder]
+                    previous_nodes[node] = feeder
+            finish_costs[node] = start_cost + node.step_time
+        if len(finish_costs) == 0:
+            return [], 0.0
+
+        # Walk back from the node which finishes last
+        last_node = max(self.topological_order, key=lambda node: finish_costs[node])
+        path = []
+        node = last_node
+        while node is not None:
+            path.insert(0, node)
+            node = previous_nodes[node]
+        return path, finish_costs[last_node]
 
     def calculateStatistics(self):
         """
         Calculate statistics after an iteration.
         """
 
+        self.context.stats_step += 1
+
         # The network prediction precision is the average between all nodes precision
         precision_rate = 0.0
         nodes_count = 0
-        for nodes in self.phases:
-            for node in nodes:
-                node.calculateStatistics()
-                precision_rate += node.stats_precision_rate
-                nodes_count += 1
-        self.stats_precision_rate = precision_rate / nodes_count
+        for node in self.topological_order:
+            node.calculateStatistics()
+            precision_rate += node.stats_precision_rate
+            nodes_count += 1
+        if nodes_count > 0:
+            self.stats_precision_rate = precision_rate / nodes_count
+
+    def getSnapshot(self):
+        """
+        Return an immutable copy of the states and statistics of the nodes after the last time step.
+        """
+        return NetworkSnapshot(self)
+
+    def hasStatisticsLevel(self, level):
+        """
+        Return whether statistics of a given level are calculated at each time step.
+        """
+        return STATISTICS_LEVELS.index(self.statistics_level) >= STATISTICS_LEVELS.index(level)
 
     def addFeederNode(self, feeder_node, fed_node):
         """
@@ -139,9 +244,7 @@ class Network:
             self.deleteFeederNode(feeder)
 
         # Remove all links involving this node
-        for link in self.links:
-            if link.out_node == node or link.in_node == node:
-                self.links.remove(link)
+        self.links = [link for link in self.links if link.out_node != node and link.in_node != node]
 
         # Delete the node
         self.nodes.remove(node)
@@ -149,29 +252,53 @@ class Network:
 
         self.preparePhases()
 
-    def getFeederNodes(self, node):
+    def invalidateIndexes(self):
         """
-        Delete a node from hierarchy.
+        Mark the indexes of nodes to be rebuilt given that nodes or links changed.
         """
+        self.indexes_valid = False
 
-        # Get all nodes that feed the specified node
-        feeders = [link.out_node
-                   for link in self.links
-                   if link.in_node == node]
-
-        return feeders
+    def updateIndexes(self):
+        """
+        Rebuild the indexes of nodes from the nodes and links of the network.
+        """
+        self.nodes_by_name = {}
+        self.feeders = {}
+        self.feds = {}
+        for node in self.nodes:
+            self.nodes_by_name[node.name] = node
+            self.feeders[node] = []
+            self.feds[node] = []
+        for link in self.links:
+            self.feeders.setdefault(link.in_node, []).append(link.out_node)
+            self.feds.setdefault(link.out_node, []).append(link.in_node)
+        self.indexes_valid = True
 
-    def getFedNodes(self, node):
+    def getNode(self, name):
         """
-        Delete a node from hierarchy.
+        Return the node with the given name (or None if there is no such node).
         """
+        if not self.indexes_valid:
+            self.updateIndexes()
+        return self.nodes_by_name.get(name)
 
-        # Get all nodes that feed the specified node
-        feds = [link.in_node
-                for link in self.links
-                if link.out_node == node]
+    def getFeederNodes(self, node):
+        """
+        Return the nodes that feed the specified node.
+        The returned list belongs to the index and must not be changed.
+        """
+        if not self.indexes_valid:
+            self.updateIndexes()
+        return self.feeders.get(node, [])
 
-        return feds
+    def getFedNodes(self, node):
+        """
+        Return the nodes that are fed by the specified node.
+        The returned list belongs to the index and must not be changed.
+        """
+        if not self.indexes_valid:
+            self.updateIndexes()
+        return self.feds.get(node, [])
 
     def getSourceCode(self):
         """
@@ -261,12 +388,7 @@ class Network:
                                     " }"
 
                     # If file name provided is a relative path, use project file path
-                    data_source = ""
-                    if node.file_name != "":
-                        if os.path.dirname(node.file_name) == '':
-                            data_source = os.path.dirname(Global.project.file_name) + '/' + node.file_name
-                        else:
-                            data_source = node.file_name
+                    data_source = self.context.getFullFileName(node.file_name)
 
                     # Generate the encodings params
                     encodings_params = ""
@@ -0,0 +1,142 @@
+from nupic_studio.htm.node import NodeType
+from nupic_studio.htm.segment import SegmentType
+
+
+class EncodingSnapshot(object):
+    """
+    Values and predictions of an encoding at a given time step.
+    """
+
+    def __init__(self, encoding):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Histories of the values of the encoding (see Encoding).
+        self.current_value = encoding.current_value.copy()
+        self.predicted_values = encoding.predicted_values.copy()
+        self.best_predicted_value = encoding.best_predicted_value.copy()
+
+
+class NodeSnapshot(object):
+    """
+    States and statistics of a node at a given time step.
+    """
+
+    def __init__(self, node):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Name of the node.
+        self.name = node.name
+
+        # Statistics
+        self.stats_precision_rate = node.stats_precision_rate
+
+
+class SensorSnapshot(NodeSnapshot):
+    """
+    States and statistics of a sensor at a given time step.
+    """
+
+    def __init__(self, sensor):
+        """
+        Initializes a new instance of this class.
+        """
+        NodeSnapshot.__init__(self, sensor)
+
+        # States of the bits.
+        self.bit_states = sensor.bit_states.copy()
+
+        # Values of the encodings in the same order of the sensor's encodings.
+        self.encodings = [EncodingSnapshot(encoding) for encoding in sensor.encodings]
+
+
+class RegionSnapshot(NodeSnapshot):
+    """
+    States and statistics of a region at a given time step, together with the distal segments and synapses that
+    existed then. Elements are the same objects of the region, but their states must be read from the stores of this
+    snapshot (by their ids) given that the ones of the region keep changing.
+    Stores and tables are shared with the region, which copies them before changing them (copy-on-write), so taking
+    a snapshot does not walk the elements of the region.
+    """
+
+    def __init__(self, region):
+        """
+        Initializes a new instance of this class.
+        """
+        NodeSnapshot.__init__(self, region)
+
+        # States of the cells, segments and synapses.
+        self.cell_states = region.cell_states.copy()
+        self.segment_states = region.segment_states.copy()
+        self.proximal_synapse_states = region.proximal_synapse_states.copy()
+        self.distal_synapse_states = region.distal_synapse_states.copy()
+
+        # Potential pools and ids of the proximal synapses of each column. The region replaces the arrays of the ids
+        # instead of change them, so only their list is copied.
+        self.proximal_pools = region.proximal_pools
+        self.proximal_synapse_ids = list(region.proximal_synapse_ids)
+
+        # Distal segments and the indexes of their cells indexed by their ids, distal segments of each cell (indexed by
+        # its index in the temporal pooler) and synapses of each distal segment (see Region).
+        self.distal_segment_cells, self.cell_segments, self.segment_synapses = region.shareDistalTables()
+
+    def getSegments(self, cell):
+        """
+        Return the distal segments of a cell.
+        """
+        return self.cell_segments.get(cell.index, ())
+
+    def hasSegment(self, segment):
+        """
+        Return whether a segment existed at the time step of this snapshot.
+        """
+        return segment.type == SegmentType.PROXIMAL or segment in self.segment_synapses
+
+    def getSynapses(self, segment):
+        """
+        Return the synapses of a segment.
+        """
+        if segment.type == SegmentType.PROXIMAL:
+            return segment.getSynapses(self.proximal_pools[segment.col_idx], self.proximal_synapse_ids[segment.col_idx], self.proximal_synapse_states)
+        return self.segment_synapses.get(segment, ())
+
+    def getSynapseStates(self, segment):
+        """
+        Return the store which holds the states of the synapses of a segment.
+        """
+        if segment.type == SegmentType.PROXIMAL:
+            return self.proximal_synapse_states
+        return self.distal_synapse_states
+
+
+class NetworkSnapshot(object):
+    """
+    Immutable copy of everything that the controls show about a network after a time step, so they can be refreshed
+    while the next time steps are performed in background.
+    """
+
+    def __init__(self, network):
+        """
+        Initializes a new instance of this class.
+        """
+        context = network.context
+
+        # Time step of this snapshot.
+        self.step = context.curr_step
+
+        # Time steps of the values kept in the predictions history of the encodings.
+        self.prediction_steps = context.prediction_steps.copy()
+
+        # Statistics
+        self.stats_precision_rate = network.stats_precision_rate
+
+        # Snapshots of the nodes indexed by their names.
+        self.nodes = {}
+        for node in network.nodes:
+            if node.type == NodeType.REGION:
+                self.nodes[node.name] = RegionSnapshot(node)
+            else:
+                self.nodes[node.name] = SensorSnapshot(node)
@@ -1,6 +1,3 @@
-from PyQt5 import QtGui, QtCore, QtWidgets
-
-
 class NodeType:
     """
     Types of nodes in the hierarchy.
@@ -9,7 +6,7 @@ class NodeType:
     SENSOR = 2
 
 
-class Node:
+class Node(object):
     """
     Node that represents region/sensors and their params.
     """
@@ -34,10 +31,16 @@ class Node:
         # An array representing the current output from this node.
         self.output = []
 
+        # Context of the network which this node belongs to.
+        self.context = None
+
+        # Time (in seconds) spent by this node in the last time step, which estimates the cost of the next one.
+        self.step_time = 0.0
+
         # 2D object reference
         self.tree2d_x = 0.0
         self.tree2d_y = 0.0
-        self.tree2d_polygon = QtGui.QPolygon()
+        self.tree2d_polygon = None
 
         # 3D object reference
         self.tree3d_pos = (0, 0, 0)
@@ -48,9 +51,29 @@ class Node:
         """
         pass
 
-    def nextStep(self):
+    def nextStep(self, fast=False):
         """
         Perfoms actions related to time step progression.
+        If fast is True, only the algorithms are computed and the elements are not updated.
+        """
+        pass
+
+    def beginStep(self, fast=False):
+        """
+        Start a time step. Nodes which compute in background only start it here and finish it in endStep, so nodes of
+        the same phase can run in parallel. The remaining nodes perform the whole time step here.
+        """
+        self.nextStep(fast)
+
+    def endStep(self, fast=False):
+        """
+        Finish a time step started by beginStep.
+        """
+        pass
+
+    def shutdown(self):
+        """
+        Release the resources held by this node (like worker processes).
         """
         pass
 
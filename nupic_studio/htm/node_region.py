@@ -1,15 +1,14 @@
 import numpy
 import time
-from PyQt5 import QtGui, QtCore, QtWidgets
 from nupic_studio.htm import MAX_PREVIOUS_STEPS
 from nupic_studio.htm.node import Node, NodeType
 from nupic_studio.htm.column import Column
 from nupic_studio.htm.cell import Cell
-from nupic_studio.htm.segment import Segment, SegmentType
+from nupic_studio.htm.segment import Segment, SegmentType, ProximalSegment
 from nupic_studio.htm.synapse import Synapse
-from nupic_studio.ui import Global
-from nupic.research.spatial_pooler import SpatialPooler
-from nupic.research.temporal_memory import TemporalMemory as TemporalPooler
+from nupic_studio.htm.state_store import StateStore, StateKind
+from nupic_studio.htm.region_algorithms import RegionAlgorithms, RegionWorker
+from nupic_studio.htm.run_context import NetworkError, StatisticsLevel
 
 
 class Region(Node):
@@ -24,11 +23,27 @@ class Region(Node):
 
         Node.__init__(self, name, NodeType.REGION)
 
-        # List of columns that compose this region.
-        self.columns = []
+        # Columns that compose this region. They are only created when requested (see columns property).
+        self.column_objects = None
 
-        # An array representing the input map for this region.
-        self.input_map = []
+        # Cells already created indexed by their index in the temporal pooler.
+        # Cells are only created when requested (by the UI or by distal segments and synapses).
+        self.cell_objects = {}
+
+        # Number of elements (cells or sensor bits) of the input map for this region.
+        self.input_size = 0
+
+        # Stores and ids of the elements of the input map grouped by feeder, in order to read and write their states
+        # in bulk.
+        self.input_sources = []
+
+        # Indexes of the active columns in the current time step.
+        self.active_columns = numpy.zeros(0, dtype=numpy.int64)
+
+        # Nodes that feed this region in the order of the input map and the buffer where their outputs are assembled
+        # at each time step.
+        self.input_feeders = []
+        self.input = None
 
         # Switch for spatial learning.
         self.enable_spatial_learning = True
@@ -150,15 +165,69 @@ class Region(Node):
         # Seed for generate random values.
         self.tp_seed = 42
 
-        # Spatial Pooler instance.
-        self.spatial_pooler = None
+        # Spatial and temporal poolers, computed in this process or in a worker process.
+        self.algorithms = None
+
+        # Stores which hold the states of the cells, segments, and synapses of this region.
+        # Proximal and distal synapses have stores apart given that their states are updated in different ways.
+        self.cell_states = None
+        self.segment_states = None
+        self.proximal_synapse_states = None
+        self.distal_synapse_states = None
+
+        # Ids of the proximal segments indexed by column.
+        self.proximal_segment_ids = None
+
+        # Positions in the input map of the potential pool of each column, i.e. of the only input elements that its
+        # proximal synapses can be connected to.
+        self.proximal_pools = None
+
+        # Ids of the proximal synapses in the synapses store, one array for each column in the same order of its
+        # potential pool. Synapses that never had permanence greater than zero have id equal to -1.
+        # An array is replaced instead of changed, so snapshots of this region can share the arrays.
+        self.proximal_synapse_ids = None
+
+        # Ids of the cells in the cells store indexed by their index in the temporal pooler.
+        self.cell_ids = None
 
-        # Temporal Pooler instance.
-        self.temporal_pooler = None
+        # Distal segments and synapses indexed by their indexes in the temporal pooler.
+        self.distal_segments = {}
+        self.distal_synapses = {}
+
+        # Distal segments and synapses destroyed by the temporal pooler which still are in the history.
+        self.removed_distal_segments = []
+        self.removed_distal_synapses = []
+
+        # Distal segments (including the removed ones) and the indexes of their cells, indexed by their ids in the
+        # segments store. It lets the 3D viewer find the segments whose states changed without walking all cells.
+        self.distal_segment_cells = {}
+
+        # Distal segments of each cell (indexed by its index in the temporal pooler) and synapses of each distal
+        # segment, given as tuples. These tables are kept for snapshots of this region (see shareDistalTables).
+        self.cell_segments = {}
+        self.segment_synapses = {}
+
+        # Whether the distal tables are shared with a snapshot, so they must be copied before they are changed.
+        self.distal_tables_shared = False
 
         # Statistics
         self.stats_precision_rate = 0.0
 
+    @property
+    def columns(self):
+        """
+        Return the columns of this region, creating them in the first call.
+        A region which was not initialized yet has no columns.
+        """
+        if self.proximal_segment_ids is None:
+            return []
+        if self.column_objects is None:
+            self.column_objects = []
+            for idx in range(len(self.proximal_segment_ids)):
+                segment = ProximalSegment(self.segment_states, self, idx, int(self.proximal_segment_ids[idx]))
+                self.column_objects.append(Column(self, idx, segment))
+        return self.column_objects
+
     def getColumn(self, x, y):
         """
         Return the column located at given position
@@ -171,7 +240,7 @@ class Region(Node):
         Return the sum of sizes of all feeder nodes.
         """
         sum_sizes = 0
-        for feeder in Global.project.network.getFeederNodes(self):
+        for feeder in self.context.network.getFeederNodes(self):
             sum_sizes += feeder.width * feeder.height
         return sum_sizes
 
@@ -181,10 +250,9 @@ class Region(Node):
         """
 
         # Check if this region has nodes that feed it
-        feeders_count = len(Global.project.network.getFeederNodes(self))
+        feeders_count = len(self.context.network.getFeederNodes(self))
         if feeders_count == 0:
-            QtWidgets.QMessageBox.warning(None, "Warning", "Region '" + self.name + "' does not have any child!")
-            return
+            raise NetworkError("Region '" + self.name + "' does not have any child!")
 
         # Initialize this node and the nodes that feed it
         Node.initialize(self)
@@ -194,36 +262,72 @@ class Region(Node):
         # For example, if we have 2 nodes that feed this region (#1 and #2) with dimensions 6 and 12 respectively,
         # a input map would be something like:
         #   111111222222222222
-        self.input_map = []
-        for feeder in Global.project.network.getFeederNodes(self):
+        # Only the ids of the input elements are kept (see getInputElement)
+        self.input_sources = []
+        self.input_feeders = self.context.network.getFeederNodes(self)
+        for feeder in self.input_feeders:
             # Arrange input from feeder into input map of this region
+            # The input element of a column is its first cell
             if feeder.type == NodeType.REGION:
-                for column in feeder.columns:
-                    input_elem = column.cells[0]
-                    self.input_map.append(input_elem)
+                input_ids = feeder.cell_ids[::feeder.cells_per_column]
+                input_states = feeder.cell_states
             else:
-                for bit in feeder.bits:
-                    input_elem = bit
-                    self.input_map.append(input_elem)
+                input_ids = numpy.array([bit.id for bit in feeder.bits], dtype=numpy.int64)
+                input_states = feeder.bit_states
+            self.input_sources.append((input_states, input_ids))
+        self.input_size = sum([len(input_ids) for input_states, input_ids in self.input_sources])
+        self.input = numpy.zeros(self.input_size, dtype=int)
+        self.output = numpy.zeros(self.width * self.height)
+        self.active_columns = numpy.zeros(0, dtype=numpy.int64)
+
+        # Create the stores for the states of the elements
+        num_columns = self.width * self.height
+        self.cell_states = StateStore([StateKind.LEARNING, StateKind.ACTIVE, StateKind.PREDICTED, StateKind.FALSELY_PREDICTED], num_columns * self.cells_per_column, counters={'activation_count': StateKind.ACTIVE, 'prediction_count': StateKind.PREDICTED})
+        self.segment_states = StateStore([StateKind.ACTIVE, StateKind.PREDICTED, StateKind.FALSELY_PREDICTED, StateKind.REMOVED], num_columns, counters={'activation_count': StateKind.ACTIVE, 'prediction_count': StateKind.PREDICTED})
+        synapse_kinds = [StateKind.PERMANENCE, StateKind.CONNECTED, StateKind.PREDICTED, StateKind.FALSELY_PREDICTED, StateKind.REMOVED]
+        synapse_counters = {'connection_count': StateKind.CONNECTED, 'prediction_count': StateKind.PREDICTED}
+
+        # Proximal synapses are only updated when their column is active or predicted, while a removed one remains
+        # removed until it gets a permanence again
+        self.proximal_synapse_states = StateStore(synapse_kinds, counters=synapse_counters, carried=[StateKind.REMOVED])
+
+        # Distal synapses are only updated when the temporal pooler changes them
+        self.distal_synapse_states = StateStore(synapse_kinds, counters=synapse_counters, carried=[StateKind.PERMANENCE, StateKind.CONNECTED])
 
         # Initialize elements
-        self.columns = []
-        idx = 0
-        for x in range(self.width):
-            for y in range(self.height):
-                column = Column()
-                column.x = x
-                column.y = y
-                for z in range(self.cells_per_column):
-                    cell = Cell()
-                    cell.index = (idx * self.cells_per_column) + z
-                    cell.z = z
-                    column.cells.append(cell)
-                self.columns.append(column)
-                idx += 1
-
-        # Create Spatial Pooler instance with appropriate parameters
-        self.spatial_pooler = SpatialPooler(
+        # Only the states of cells and proximal segments are allocated, their objects are created when requested
+        self.column_objects = None
+        self.cell_objects = {}
+        self.cell_ids = self.cell_states.allocateMany(num_columns * self.cells_per_column)
+        self.proximal_segment_ids = self.segment_states.allocateMany(num_columns)
+        self.distal_segments = {}
+        self.distal_synapses = {}
+        self.removed_distal_segments = []
+        self.removed_distal_synapses = []
+        self.distal_segment_cells = {}
+        self.cell_segments = {}
+        self.segment_synapses = {}
+        self.distal_tables_shared = False
+
+        # Create Spatial and Temporal Pooler instances with appropriate parameters
+        # In parallel networks they live in a worker process, so regions of the same phase are computed at same time
+        self.shutdown()
+        if self.context.network.parallel:
+            self.algorithms = RegionWorker(self.getSpatialPoolerParams(), self.getTemporalPoolerParams())
+        else:
+            self.algorithms = RegionAlgorithms(self.getSpatialPoolerParams(), self.getTemporalPoolerParams())
+
+        # Proximal synapses are only kept for the potential pools of the columns
+        self.proximal_pools = self.algorithms.potential_pools
+        self.proximal_synapse_ids = [numpy.full(len(pool), -1, dtype=numpy.int64) for pool in self.proximal_pools]
+
+        return True
+
+    def getSpatialPoolerParams(self):
+        """
+        Return the parameters used to create the Spatial Pooler.
+        """
+        return dict(
             inputDimensions=(self.getInputSize(), 1),
             columnDimensions=(self.width, self.height),
             potentialRadius=self.potential_radius,
@@ -242,8 +346,11 @@ class Region(Node):
             seed=self.sp_seed,
             spVerbosity=False)
 
-        # Create Temporal Pooler instance with appropriate parameters
-        self.temporal_pooler = TemporalPooler(
+    def getTemporalPoolerParams(self):
+        """
+        Return the parameters used to create the Temporal Pooler.
+        """
+        return dict(
             columnDimensions=(self.width, self.height),
             cellsPerColumn=self.cells_per_column,
             initialPermanence=self.distal_syn_initial_perm,
@@ -255,245 +362,377 @@ class Region(Node):
             activation_threshold=self.activation_threshold,
             seed=self.tp_seed)
 
-        return True
+    def shutdown(self):
+        """
+        Release the algorithms of this region (stopping its worker process if any).
+        """
+        if self.algorithms is not None:
+            self.algorithms.close()
+            self.algorithms = None
 
-    def nextStep(self):
+    def nextStep(self, fast=False):
         """
         Perfoms actions related to time step progression.
+        If fast is True, only the algorithms are computed and the elements are not updated.
         """
-        Node.nextStep(self)
-        for column in self.columns:
-            column.nextStep()
+        self.beginStep(fast)
+        self.endStep(fast)
+
+    def beginStep(self, fast=False):
+        """
+        Start a time step sending the input to the algorithms.
+        """
+        Node.nextStep(self, fast)
+
+        if not fast:
+            # Move the states of all elements to a new time step
+            self.cell_states.nextStep()
+            self.segment_states.nextStep()
+            self.proximal_synapse_states.nextStep()
+            self.distal_synapse_states.nextStep()
+
+            # Forget the removed distal segments and synapses that left the history (cells and segments release them)
+            # Only created cells can have distal segments
+            left_segments = [segment for segment in self.removed_distal_segments if segment.is_removed.atFirstStep()]
+            left_synapses = [synapse for synapse in self.removed_distal_synapses if synapse.is_removed.atFirstStep()]
+            self.removed_distal_segments = [segment for segment in self.removed_distal_segments if not segment.is_removed.atFirstStep()]
+            self.removed_distal_synapses = [synapse for synapse in self.removed_distal_synapses if not synapse.is_removed.atFirstStep()]
+
+            # The cells are listed first given that the controls can create them while a time step is performed
+            for cell in list(self.cell_objects.values()):
+                cell.nextStep()
+
+            # Update the distal tables for the segments and synapses that left
+            if len(left_segments) > 0 or len(left_synapses) > 0:
+                self.unshareDistalTables()
+                for synapse in left_synapses:
+                    if synapse.segment in self.segment_synapses:
+                        self.segment_synapses[synapse.segment] = tuple(synapse.segment.synapses)
+                for segment in left_segments:
+                    self.segment_synapses.pop(segment, None)
+                    entry = self.distal_segment_cells.get(segment.id)
+                    if entry is not None and entry[0] is segment:
+                        del self.distal_segment_cells[segment.id]
+                        self.updateCellSegments(entry[1])
 
         # Get input from sensors or lower regions and put into a single input map.
         input = self.getInput()
 
-        # Send input to Spatial Pooler and get processed output (i.e. the active columns)
-        # First initialize the vector for representing the current record
-        column_dimensions = (self.width, self.height)
-        column_number = numpy.array(column_dimensions).prod()
-        active_columns = numpy.zeros(column_number)
-        self.spatial_pooler.compute(input, self.enable_spatial_learning, active_columns)
+        # Send input to Spatial and Temporal Poolers
+        self.algorithms.startCompute(input, self.enable_spatial_learning, self.enable_temporal_learning, fast)
+
+    def endStep(self, fast=False):
+        """
+        Finish a time step updating the elements with the output of the algorithms.
+        """
+        result = self.algorithms.getResult()
+        self.active_columns = result.active_columns
 
-        # Send active columns to Temporal Pooler and get processed output (i.e. the predicting cells)
-        # First convert active columns from float array to integer set
-        active_columns_set = set()
-        for idx in range(len(active_columns)):
-            if active_columns[idx] == 1:
-                active_columns_set.add(idx)
-        self.temporal_pooler.compute(active_columns_set, self.enable_temporal_learning)
+        # The output is the activity of the first cell of each column (the input element of an upper region)
+        # Its buffer is reused given that upper regions copy it into their own input
+        active_cells = result.active_cells
+        self.output.fill(0)
+        self.output[active_cells[active_cells % self.cells_per_column == 0] // self.cells_per_column] = 1
 
-        # Update elements regarding spatial pooler
-        self.updateSpatialElements(active_columns)
+        # Changes in the elements of fast steps will be caught up in the next step which is not fast
+        if not fast:
+            # Update elements regarding spatial pooler
+            self.updateSpatialElements(result)
 
-        # Update elements regarding temporal pooler
-        self.updateTemporalElements()
+            # Update elements regarding temporal pooler
+            self.updateTemporalElements(result)
 
         # Get the predicted values
-        self.getPredictions()
+        self.getPredictions(fast)
 
         #TODO: self.output = self.temporal_pooler.getPredictedState()
 
-    def getPredictions(self):
+    def getPredictions(self, fast=False):
         """
         Get the predicted values after an iteration.
         """
-        for feeder in Global.project.network.getFeederNodes(self):
-            feeder.getPredictions()
+        for feeder in self.context.network.getFeederNodes(self):
+            feeder.getPredictions(fast)
 
     def calculateStatistics(self):
         """
         Calculate statistics after an iteration.
         """
 
-        # The region's prediction precision is the average between the nodes that feed it
-        precision_rate = 0.0
-        feeders_count = 0
-        for feeder in Global.project.network.getFeederNodes(self):
-            precision_rate += feeder.stats_precision_rate
-            feeders_count += 1
-        self.stats_precision_rate = precision_rate / feeders_count
+        network = self.context.network
 
-        for column in self.columns:
-            column.calculateStatistics()
+        # The region's prediction precision is the average between the nodes that feed it
+        if network.hasStatisticsLevel(StatisticsLevel.NODE):
+            precision_rate = 0.0
+            feeders_count = 0
+            for feeder in network.getFeederNodes(self):
+                precision_rate += feeder.stats_precision_rate
+                feeders_count += 1
+            self.stats_precision_rate = precision_rate / feeders_count
+
+        # Statistics of the elements are counted at once and their rates are calculated when read
+        # Elements above the statistics level are not counted, so their statistics come from the history of states
+        self.segment_states.setCounting(network.hasStatisticsLevel(StatisticsLevel.COLUMN))
+        self.cell_states.setCounting(network.hasStatisticsLevel(StatisticsLevel.CELL))
+        self.proximal_synapse_states.setCounting(network.hasStatisticsLevel(StatisticsLevel.FULL))
+        self.distal_synapse_states.setCounting(network.hasStatisticsLevel(StatisticsLevel.FULL))
+        self.cell_states.updateCounters()
+        self.segment_states.updateCounters()
+        self.proximal_synapse_states.updateCounters()
+        self.distal_synapse_states.updateCounters()
 
     def getInput(self):
         """
         Get input from sensors or lower regions and put into a single input map.
+        The input is assembled directly from the outputs of the feeders (which are equivalent to the states of the
+        elements of the input map), so no element needs to be read.
         """
+        offset = 0
+        for feeder, (input_states, input_ids) in zip(self.input_feeders, self.input_sources):
+            # Each feeder fills as many positions as its elements in the input map
+            # A feeder can output less than that (like a sensor whose encoder is narrower than it), so the rest of its
+            # positions is filled with zeros
+            output = numpy.asarray(feeder.getOutput())[:len(input_ids)]
+            feeder_input = self.input[offset:offset + len(input_ids)]
+            feeder_input[:len(output)] = output > 0
+            feeder_input[len(output):] = 0
+            offset += len(input_ids)
+
+        return self.input
+
+    def getCell(self, cell_idx):
+        """
+        Return the cell given its index in the temporal pooler, creating it in the first call.
+        """
+        cell = self.cell_objects.get(cell_idx)
+        if cell is None:
+            cell = Cell(self.cell_states, int(self.cell_ids[cell_idx]))
+            cell.index = cell_idx
+            cell.z = cell_idx % self.cells_per_column
 
-        # Initialize the vector for representing the current input map
-        input_list = []
-        for input_elem in self.input_map:
-            if input_elem.is_active.atCurrStep():
-                input_list.append(1)
-            else:
-                input_list.append(0)
-        input = numpy.array(input_list)
+            # The controls can request a cell while a time step is performed, so the first one stored is kept
+            cell = self.cell_objects.setdefault(cell_idx, cell)
+        return cell
 
-        return input
+    def getInputElement(self, input_idx):
+        """
+        Return the element (cell or sensor bit) at a given position of the input map.
+        """
+        for feeder, (input_states, input_ids) in zip(self.input_feeders, self.input_sources):
+            if input_idx < len(input_ids):
+                if feeder.type == NodeType.REGION:
+                    return feeder.getCell(input_idx * feeder.cells_per_column)
+                return feeder.bits[input_idx]
+            input_idx -= len(input_ids)
+        return None
+
+    def getInputStates(self, kind, time_step=0):
+        """
+        Return the states of all elements of the input map for a given time step ago.
+        """
+        rows = [input_states.getRow(kind, time_step)[input_ids] for input_states, input_ids in self.input_sources]
+        return numpy.concatenate(rows)
 
-    def updateSpatialElements(self, active_columns):
+    def setInputStates(self, kind, mask):
+        """
+        Set a state for the current time step to the elements of the input map which are marked in the mask.
+        """
+        offset = 0
+        for input_states, input_ids in self.input_sources:
+            input_states.set(kind, input_ids[mask[offset:offset + len(input_ids)]], True)
+            offset += len(input_ids)
+
+    def getProximalSynapses(self, col_indices):
+        """
+        Return the positions in the input map and the ids of the proximal synapses of given columns, concatenated in
+        the same order of the columns, together with the offset of the synapses of each column.
+        """
+        pools = [numpy.zeros(0, dtype=numpy.int64)] + [self.proximal_pools[col_idx] for col_idx in col_indices]
+        ids = [numpy.zeros(0, dtype=numpy.int64)] + [self.proximal_synapse_ids[col_idx] for col_idx in col_indices]
+        offsets = numpy.cumsum([0] + [len(pool) for pool in pools[1:]])
+        return numpy.concatenate(pools), numpy.concatenate(ids), offsets
+
+    def updateSpatialElements(self, result):
         """
         Update elements regarding spatial pooler
         """
 
-        # Update proximal segments and synapses according to active columns
-        for col_idx in range(len(self.columns)):
-            column = self.columns[col_idx]
+        # Update proximal segments according to active columns
+        segment_ids = self.proximal_segment_ids
+        self.segment_states.set(StateKind.ACTIVE, segment_ids[result.active_columns], True)
 
-            # Update proximal segment
-            segment = column.segment
-            if active_columns[col_idx] == 1:
-                segment.is_active.setForCurrStep(True)
-            else:
-                segment.is_active.setForCurrStep(False)
-
-            # Check if proximal segment is predicted by check if the column has any predicted cell
-            for cell in column.cells:
-                if cell.index in self.temporal_pooler.predictiveCells:
-                    segment.is_predicted.setForCurrStep(True)
-
-            # Update proximal synapses
-            if segment.is_active.atCurrStep() or segment.is_predicted.atCurrStep():
-                permanences_synapses = []
-                self.spatial_pooler.getPermanence(col_idx, permanences_synapses)
-                connected_synapses = []
-                self.spatial_pooler.getConnectedSynapses(col_idx, connected_synapses)
-                for syn_idx in range(len(permanences_synapses)):
-                    # Get the proximal synapse given its position in the input map
-                    # Create a new one if it doesn't exist
-                    synapse = segment.getSynapse(syn_idx)
-
-                    # Update proximal synapse
-                    if permanences_synapses[syn_idx] > 0.0:
-                        if synapse == None:
-                            # Create a new synapse to a input element
-                            # An input element is a column if feeder is a region
-                            # or then a bit if feeder is a sensor
-                            synapse = Synapse()
-                            synapse.input_elem = self.input_map[syn_idx]
-                            synapse.index_sp = syn_idx
-                            segment.synapses.append(synapse)
-
-                        # Update state
-                        synapse.is_removed.setForCurrStep(False)
-                        synapse.permanence.setForCurrStep(permanences_synapses[syn_idx])
-                        if connected_synapses[syn_idx] == 1:
-                            synapse.is_connected.setForCurrStep(True)
-                        else:
-                            synapse.is_connected.setForCurrStep(False)
-                    else:
-                        if synapse != None:
-                            synapse.is_removed.setForCurrStep(True)
-
-    def updateTemporalElements(self):
+        # Check if proximal segment is predicted by check if the column has any predicted cell
+        self.segment_states.set(StateKind.PREDICTED, segment_ids[result.predictive_cells // self.cells_per_column], True)
+
+        # Update proximal synapses of active or predicted columns
+        # After fast-forwarded steps, the algorithms return the synapses of all columns
+        col_indices = result.proximal_col_indices
+        if len(col_indices) == 0:
+            return
+        permanences = result.proximal_permanences
+        input_indices, synapse_ids, offsets = self.getProximalSynapses(col_indices)
+
+        # Give ids to the synapses that got a permanence for the first time
+        # A synapse of the input map is considered to exist only if its permanence is greater than zero
+        exists = permanences > 0.0
+        is_new = exists & (synapse_ids < 0)
+        num_new = numpy.count_nonzero(is_new)
+        if num_new > 0:
+            synapse_ids[is_new] = self.proximal_synapse_states.allocateMany(num_new)
+
+            # Only the arrays of the columns which got new synapses are replaced
+            changed_rows = numpy.unique(numpy.searchsorted(offsets, numpy.flatnonzero(is_new), side='right') - 1)
+            for i in changed_rows.tolist():
+                self.proximal_synapse_ids[col_indices[i]] = synapse_ids[offsets[i]:offsets[i + 1]].copy()
+
+        # Update states
+        existing_ids = synapse_ids[exists]
+        synapse_states = self.proximal_synapse_states
+        synapse_states.set(StateKind.PERMANENCE, existing_ids, permanences[exists])
+        synapse_states.set(StateKind.CONNECTED, existing_ids, permanences[exists] >= self.proximal_syn_connected_perm)
+        synapse_states.set(StateKind.REMOVED, existing_ids, False)
+        synapse_states.set(StateKind.REMOVED, synapse_ids[~exists & (synapse_ids >= 0)], True)
+
+    def updateProximalPredictions(self):
+        """
+        Update proximal segments and synapses regarding the predictions of temporal pooler
+        """
+        segment_ids = self.proximal_segment_ids
+        synapse_states = self.proximal_synapse_states
+        is_connected = synapse_states.getCurrRow(StateKind.CONNECTED)
+
+        # Mark proximal segment and its connected synapses as predicted
+        col_indices = numpy.nonzero(self.segment_states.getCurrRow(StateKind.PREDICTED)[segment_ids])[0]
+        if len(col_indices) > 0:
+            input_indices, synapse_ids, offsets = self.getProximalSynapses(col_indices)
+            exists = synapse_ids >= 0
+            predicted = exists & is_connected[numpy.where(exists, synapse_ids, 0)]
+            synapse_states.set(StateKind.PREDICTED, synapse_ids[predicted], True)
+            input_predicted = numpy.zeros(self.input_size, dtype=bool)
+            input_predicted[input_indices[predicted]] = True
+            self.setInputStates(StateKind.PREDICTED, input_predicted)
+
+        # Mark proximal segment and its connected synapses that were predicted but are not active now
+        col_indices = numpy.nonzero(self.segment_states.getRow(StateKind.PREDICTED, 1)[segment_ids])[0]
+        if len(col_indices) > 0:
+            is_active = self.segment_states.getCurrRow(StateKind.ACTIVE)[segment_ids[col_indices]]
+            self.segment_states.set(StateKind.FALSELY_PREDICTED, segment_ids[col_indices[~is_active]], True)
+
+            input_indices, synapse_ids, offsets = self.getProximalSynapses(col_indices)
+            exists = synapse_ids >= 0
+            safe_ids = numpy.where(exists, synapse_ids, 0)
+            was_predicted = synapse_states.getRow(StateKind.PREDICTED, 1)[safe_ids]
+            connected = is_connected[safe_ids]
+            input_falsely_predicted = self.getInputStates(StateKind.FALSELY_PREDICTED)[input_indices]
+            falsely_predicted = exists & ((was_predicted & ~connected) | (connected & input_falsely_predicted))
+            synapse_states.set(StateKind.FALSELY_PREDICTED, synapse_ids[falsely_predicted], True)
+
+    def updateTemporalElements(self, result):
         """
         Update elements regarding temporal pooler
         """
 
-        # Update cells, distal segments and synapses according to active columns
-        for col_idx in range(len(self.columns)):
-            column = self.columns[col_idx]
-
-            # Mark proximal segment and its connected synapses as predicted
-            if column.segment.is_predicted.atCurrStep():
-                for synapse in column.segment.synapses:
-                    if synapse.is_connected.atCurrStep():
-                        synapse.is_predicted.setForCurrStep(True)
-                        synapse.input_elem.is_predicted.setForCurrStep(True)
-
-            # Mark proximal segment and its connected synapses that were predicted but are not active now
-            if column.segment.is_predicted.atPreviousStep():
-                if not column.segment.is_active.atCurrStep():
-                    column.segment.is_falsely_predicted.setForCurrStep(True)
-                for synapse in column.segment.synapses:
-                    if (synapse.is_predicted.atPreviousStep() and not synapse.is_connected.atCurrStep()) or (synapse.is_connected.atCurrStep() and synapse.input_elem.is_falsely_predicted.atCurrStep()):
-                        synapse.is_falsely_predicted.setForCurrStep(True)
-
-            for cell in column.cells:
-                cell_idx = cell.index
-
-                # Update cell's states
-                if cell_idx in self.temporal_pooler.winnerCells:
-                    cell.is_learning.setForCurrStep(True)
-                if cell_idx in self.temporal_pooler.activeCells:
-                    cell.is_active.setForCurrStep(True)
-                if cell_idx in self.temporal_pooler.predictiveCells:
-                    cell.is_predicted.setForCurrStep(True)
-                if cell.is_predicted.atPreviousStep() and not cell.is_active.atCurrStep():
-                    cell.is_falsely_predicted.setForCurrStep(True)
-
-                # Get the indexes of the distal segments of this cell
-                segments_for_cell = self.temporal_pooler.connections.segmentsForCell(cell_idx)
-
-                # Add the segments that appeared after last iteration
-                for seg_idx in segments_for_cell:
-                    # Check if segment already exists in the cell
-                    seg_found = False
-                    for segment in cell.segments:
-                        if segment.index_tp == seg_idx:
-                            seg_found = True
-                            break
-
-                    # If segment is new, add it to cell
-                    if not seg_found:
-                        segment = Segment(SegmentType.DISTAL)
-                        segment.index_tp = seg_idx
-                        cell.segments.append(segment)
-
-                # Update distal segments
-                for segment in cell.segments:
-                    seg_idx = segment.index_tp
-
-                    # If segment not found in segments indexes returned in last iteration mark it as removed
-                    if seg_idx in segments_for_cell:
-
-                        # Update segment's state
-                        if seg_idx in self.temporal_pooler.activeSegments:
-                            segment.is_active.setForCurrStep(True)
-                        else:
-                            segment.is_active.setForCurrStep(False)
-
-                        # Get the indexes of the synapses of this segment
-                        synapses_for_segment = self.temporal_pooler.connections.synapsesForSegment(seg_idx)
-
-                        # Add the synapses that appeared after last iteration
-                        for syn_idx in synapses_for_segment:
-                            # Check if synapse already exists in the segment
-                            syn_found = False
-                            for synapse in segment.synapses:
-                                if synapse.index_tp == syn_idx:
-                                    syn_found = True
-                                    break
-
-                            # If synapse is new, add it to segment
-                            if not syn_found:
-                                synapse = Synapse()
-                                synapse.index_tp = syn_idx
-                                segment.synapses.append(synapse)
-
-                        # Update synapses
-                        for synapse in segment.synapses:
-                            syn_idx = synapse.index_tp
-
-                            # If synapse not found in synapses indexes returned in last iteration mark it as removed
-                            if syn_idx in synapses_for_segment:
-
-                                # Update synapse's state
-                                synapse_data = self.temporal_pooler.connections.dataForSynapse(syn_idx)
-                                synapse.permanence.setForCurrStep(synapse_data.permanence)
-                                if synapse_data.permanence >= self.distal_syn_connected_perm:
-                                    synapse.is_connected.setForCurrStep(True)
-                                else:
-                                    synapse.is_connected.setForCurrStep(False)
-
-                                # Get cell given cell's index
-                                source_col_idx = synapse_data.presynapticCell / self.cells_per_column
-                                source_cell_rel_idx = synapse_data.presynapticCell % self.cells_per_column
-                                source_cell = self.columns[source_col_idx].cells[source_cell_rel_idx]
-                                synapse.input_elem = source_cell
-                            else:
-                                synapse.is_removed.setForCurrStep(True)
-                    else:
-                        segment.is_removed.setForCurrStep(True)
+        # Update proximal segments and synapses according to predictions
+        self.updateProximalPredictions()
+
+        # Update cells' states
+        cell_states = self.cell_states
+        cell_states.set(StateKind.LEARNING, self.cell_ids[result.winner_cells], True)
+        cell_states.set(StateKind.ACTIVE, self.cell_ids[result.active_cells], True)
+        cell_states.set(StateKind.PREDICTED, self.cell_ids[result.predictive_cells], True)
+        falsely_predicted = cell_states.getRow(StateKind.PREDICTED, 1) & ~cell_states.getCurrRow(StateKind.ACTIVE)
+        cell_states.set(StateKind.FALSELY_PREDICTED, numpy.nonzero(falsely_predicted)[0], True)
+
+        # Update distal segments and synapses that changed in this iteration
+        self.syncDistalElements(result)
+
+        # Update segment's state
+        active_segments = [self.distal_segments[seg_idx].id for seg_idx in result.active_segments]
+        self.segment_states.set(StateKind.ACTIVE, numpy.array(active_segments, dtype=numpy.int64), True)
+
+    def shareDistalTables(self):
+        """
+        Return the distal tables (segments and their cells, segments of each cell and synapses of each segment) to be
+        kept by a snapshot. The region copies them before its next change (copy-on-write), so they remain unchanged.
+        """
+        self.distal_tables_shared = True
+        return self.distal_segment_cells, self.cell_segments, self.segment_synapses
+
+    def unshareDistalTables(self):
+        """
+        Copy the distal tables shared with a snapshot, before changing them.
+        """
+        if self.distal_tables_shared:
+            self.distal_segment_cells = dict(self.distal_segment_cells)
+            self.cell_segments = dict(self.cell_segments)
+            self.segment_synapses = dict(self.segment_synapses)
+            self.distal_tables_shared = False
+
+    def updateCellSegments(self, cell_idx):
+        """
+        Update the segments of a cell in the distal tables.
+        """
+        segments = self.getCell(cell_idx).segments
+        if len(segments) > 0:
+            self.cell_segments[cell_idx] = tuple(segments)
+        else:
+            self.cell_segments.pop(cell_idx, None)
+
+    def syncDistalElements(self, result):
+        """
+        Update the distal segments and synapses according to the changes made by the temporal pooler in this iteration.
+        """
+
+        # Mark the synapses destroyed by the temporal pooler as removed
+        for syn_idx in result.destroyed_synapses:
+            synapse = self.distal_synapses.pop(syn_idx, None)
+            if synapse is not None:
+                self.removed_distal_synapses.append(synapse)
+
+        # Mark the segments destroyed by the temporal pooler as removed
+        for seg_idx in result.destroyed_segments:
+            segment = self.distal_segments.pop(seg_idx, None)
+            if segment is not None:
+                for synapse in segment.synapses:
+                    if self.distal_synapses.get(synapse.index_tp) is synapse:
+                        del self.distal_synapses[synapse.index_tp]
+                self.removed_distal_segments.append(segment)
+
+        # Add the segments that appeared after last iteration
+        if len(result.created_segments) > 0:
+            self.unshareDistalTables()
+        for seg_idx, cell_idx in result.created_segments.items():
+            segment = Segment(SegmentType.DISTAL, self.segment_states)
+            segment.index_tp = seg_idx
+            self.getCell(cell_idx).segments.append(segment)
+            self.distal_segments[seg_idx] = segment
+            self.distal_segment_cells[segment.id] = (segment, cell_idx)
+            self.segment_synapses[segment] = ()
+            self.updateCellSegments(cell_idx)
+
+        # Add the synapses that appeared after last iteration and update the ones whose permanence changed
+        changed_segments = set()
+        for syn_idx, (seg_idx, presynaptic_cell_idx, permanence) in result.synapses_data.items():
+            synapse = self.distal_synapses.get(syn_idx)
+            if synapse is None:
+                synapse = Synapse(self.distal_synapse_states)
+                synapse.index_tp = syn_idx
+                synapse.segment = self.distal_segments[seg_idx]
+                synapse.input_elem = self.getCell(presynaptic_cell_idx)
+                synapse.segment.synapses.append(synapse)
+                self.distal_synapses[syn_idx] = synapse
+                changed_segments.add(synapse.segment)
+
+            # Update synapse's state
+            synapse.permanence.setForCurrStep(permanence)
+            synapse.is_connected.setForCurrStep(permanence >= self.distal_syn_connected_perm)
+        if len(changed_segments) > 0:
+            self.unshareDistalTables()
+            for segment in changed_segments:
+                self.segment_synapses[segment] = tuple(segment.synapses)
+
+        # Removed elements remain marked until they leave the history
+        for segment in self.removed_distal_segments:
+            segment.is_removed.setForCurrStep(True)
+        for synapse in self.removed_distal_synapses:
+            synapse.is_removed.setForCurrStep(True)
@@ -4,13 +4,16 @@ import numpy
 import operator
 import math
 import dateutil.parser
-from PyQt5 import QtGui, QtCore, QtWidgets
 from nupic_studio import getInstantiatedClass
-from nupic_studio.ui import Global
 from nupic_studio.htm import MAX_PREVIOUS_STEPS, MAX_FUTURE_STEPS, MAX_PREVIOUS_STEPS_WITH_INFERENCE
 from nupic_studio.htm.node import Node, NodeType
 from nupic_studio.htm.bit import Bit
-from nupic_studio.htm.encoding import FieldDataType
+from nupic_studio.htm.state_store import StateStore, StateKind
+from nupic_studio.htm.encoding import FieldDataType, EncoderMemo
+from nupic_studio.htm.run_context import NetworkError, StatisticsLevel
+from nupic_studio.htm.record_source import RecordSource
+from nupic_studio.htm.database_source import DatabaseRecordStream
+from nupic_studio.htm.encoded_records import EncodedRecords, getCacheFileName, getCachePrefix
 from nupic.encoders import MultiEncoder
 from nupic.data.file_record_stream import FileRecordStream
 
@@ -46,9 +49,15 @@ class Sensor(Node):
         # An array of the bit objects that compose the current output of this node.
         self.bits = []
 
+        # Store which holds the states of the bits.
+        self.bit_states = None
+
         # Data source which provides records to fed into a region.
         self.data_source = None
 
+        # Records already encoded, which are used in place of the data source once its first pass is over.
+        self.encoded_records = None
+
         # Type of the data source (File or Database).
         self.data_source_type = DataSourceType.FILE
 
@@ -61,12 +70,18 @@ class Sensor(Node):
         # Target table of the database.
         self.database_table = ''
 
+        # Number of records fetched from the database at once.
+        self.database_batch_size = 256
+
         # Multi-encoder which concatenate sub-encodings to convert raw data to htm input and vice-versa.
         self.encoder = None
 
         # List of sub-encodings that handles the input from database.
         self.encodings = []
 
+        # Values of the last record read for each encoding.
+        self.record_values = []
+
         # Method used to get predicted values and their probabilities.
         self.predictions_method = PredictionsMethod.RECONSTRUCTION
 
@@ -93,10 +108,11 @@ class Sensor(Node):
         Node.initialize(self)
 
         # Initialize input bits
+        self.bit_states = StateStore([StateKind.ACTIVE, StateKind.PREDICTED, StateKind.FALSELY_PREDICTED], self.width * self.height, counters={'activation_count': StateKind.ACTIVE, 'prediction_count': StateKind.PREDICTED})
         self.bits = []
         for x in range(self.width):
             for y in range(self.height):
-                bit = Bit()
+                bit = Bit(self.bit_states)
                 bit.x = x
                 bit.y = y
                 self.bits.append(bit)
@@ -107,18 +123,11 @@ class Sensor(Node):
             """
 
             # If file name provided is a relative path, use project file path
-            if self.file_name != '' and os.path.dirname(self.file_name) == '':
-                full_file_name = os.path.dirname(Global.project.file_name) + '/' + self.file_name
-            else:
-                full_file_name = self.file_name
+            full_file_name = self.context.getFullFileName(self.file_name)
 
             # Check if file really exists
             if not os.path.isfile(full_file_name):
-                QtWidgets.QMessageBox.warning(None, "Warning", "Input stream file '" + full_file_name + "' was not found or specified.", QtWidgets.QMessageBox.Ok)
-                return
-
-            # Create a data source for read the file
-            self.data_source = FileRecordStream(full_file_name)
+                raise NetworkError("Input stream file '" + full_file_name + "' was not found or specified.")
 
         elif self.data_source_type == DataSourceType.DATABASE:
             pass
@@ -137,46 +146,106 @@ class Sensor(Node):
             # Add sub-encoder to multi-encoder list
             self.encoder.addEncoder(encoding.data_source_field_name, encoding.encoder)
 
+            # Values repeat often, so the results of the encoder are memoized
+            encoding.encoder_memo = EncoderMemo(encoding.encoder)
+
         # If encoder size is not the same to sensor size then throws exception
         encoder_size = self.encoder.getWidth()
         sensor_size = self.width * self.height
         if encoder_size > sensor_size:
-            QtWidgets.QMessageBox.warning(None, "Warning", "'" + self.name + "': Encoder size (" + str(encoder_size) + ") is different from sensor size (" + str(self.width) + " x " + str(self.height) + " = " + str(sensor_size) + ").", QtWidgets.QMessageBox.Ok)
-            return
+            raise NetworkError("'" + self.name + "': Encoder size (" + str(encoder_size) + ") is different from sensor size (" + str(self.width) + " x " + str(self.height) + " = " + str(sensor_size) + ").")
+
+        self.shutdown()
+        self.encoded_records = None
+        if self.data_source_type == DataSourceType.DATABASE:
+            # Create a data source for read the table, converting its fields to the data types of the encodings
+            # The connection is shared with other sensors reading the same database
+            field_types = dict((encoding.data_source_field_name, encoding.data_source_field_data_type) for encoding in self.encodings)
+            try:
+                stream = DatabaseRecordStream(self.database_connection_string, self.database_table, field_types, self.database_batch_size, base_dir=self.context.project_dir)
+            except Exception as error:
+                raise NetworkError("'" + self.name + "': Database table '" + self.database_table + "' could not be read: " + str(error))
+            self.data_source = RecordSource(stream, batch_size=self.database_batch_size)
+        elif self.data_source_type == DataSourceType.FILE:
+            # Use the records encoded in a previous run if neither the file nor the encodings changed since then
+            self.encoded_records = EncodedRecords(getCacheFileName(full_file_name, self.encodings), encoder_size, stale_prefix=getCachePrefix(full_file_name))
+            if not self.encoded_records.load():
+
+                # Create a data source for read the file
+                # Records are read ahead in background, so time steps do not wait for the file
+                self.data_source = RecordSource(FileRecordStream(full_file_name))
 
         return True
 
-    def nextStep(self):
+    def shutdown(self):
         """
-        Performs actions related to time step progression.
+        Stop reading records of the data source.
         """
+        if self.data_source is not None:
+            self.data_source.close()
+            self.data_source.stream.close()
+        self.data_source = None
 
-        # Update states machine by remove the first element and add a new element in the end
-        for encoding in self.encodings:
-            encoding.current_value.rotate()
-            if encoding.enable_inference:
-                encoding.predicted_values.rotate()
-                encoding.best_predicted_value.rotate()
-
-        Node.nextStep(self)
-        for bit in self.bits:
-            bit.nextStep()
+    def getNextEncodedRecord(self):
+        """
+        Return the encoded bits and the scalar values of the next record.
+        Records are only encoded in the first pass over the data source, the next passes take them from the encoded
+        records.
+        """
+        if self.data_source is None:
+            return self.encoded_records.getNext()
 
         # Get record value from data source
-        # If the last record was reached just rewind it
+        # If the last record was reached just rewind it, unless the next passes can be taken from the encoded records
         data = self.data_source.getNextRecordDict()
         if not data:
+            if self.encoded_records is not None and self.encoded_records.finishPass():
+                self.shutdown()
+                return self.encoded_records.getNext()
             self.data_source.rewind()
             data = self.data_source.getNextRecordDict()
 
-        # Pass raw values to encoder and get a concatenated array
+        # Pass raw values to the encoder of each field and get a concatenated array
+        # The same way as the multi-encoder does, but taking repeated values from the memoized results
         output_array = numpy.zeros(self.encoder.getWidth())
-        self.encoder.encodeIntoArray(data, output_array)
+        output_values = []
+        offset = 0
+        for encoding in self.encodings:
+            field_output, field_values = encoding.encoder_memo.encode(data[encoding.data_source_field_name])
+            output_array[offset:offset + len(field_output)] = field_output
+            offset += len(field_output)
+
+            # Get values obtained from the data source.
+            output_values.extend(field_values)
 
-        # Get values obtained from the data source.
-        output_values = self.encoder.getScalars(data)
+        if self.encoded_records is not None:
+            self.encoded_records.add(output_array, output_values)
+
+        return output_array, output_values
+
+    def nextStep(self, fast=False):
+        """
+        Performs actions related to time step progression.
+        If fast is True, only the record is encoded and the bits and values history are not updated.
+        """
+
+        # Update states machine by remove the first element and add a new element in the end
+        if not fast:
+            for encoding in self.encodings:
+                encoding.current_value.rotate()
+                if encoding.enable_inference:
+                    encoding.predicted_values.rotate()
+                    encoding.best_predicted_value.rotate()
+
+        Node.nextStep(self, fast)
+        if not fast:
+            self.bit_states.nextStep()
+
+        # Get the encoded record and its values
+        output_array, output_values = self.getNextEncodedRecord()
 
         # Get raw values and respective encoded bit array for each field
+        self.record_values = []
         for i in range(len(self.encodings)):
             encoding = self.encodings[i]
 
@@ -192,28 +261,34 @@ class Sensor(Node):
                 curr_value = dateutil.parser.parse(str(curr_value))
             elif encoding.encoder_field_data_type == FieldDataType.STRING:
                 curr_value = str(curr_value)
-            encoding.current_value.setForCurrStep(curr_value)
+            self.record_values.append(curr_value)
+            if not fast:
+                encoding.current_value.setForCurrStep(curr_value)
+
+        self.output = output_array
+        if fast:
+            return
 
         # Update sensor bits
-        for i in range(len(output_array)):
-            if output_array[i] > 0.0:
-                self.bits[i].is_active.setForCurrStep(True)
-            else:
-                self.bits[i].is_active.setForCurrStep(False)
+        # Bits are allocated in order in their store, so the id of a bit is its index in the output, and their states
+        # start cleared at each time step
+        is_active = output_array > 0.0
+        self.bit_states.set(StateKind.ACTIVE, numpy.nonzero(is_active)[0], True)
 
         # Mark falsely predicted bits
-        for bit in self.bits:
-            if bit.is_predicted.atPreviousStep() and not bit.is_active.atCurrStep():
-                bit.is_falsely_predicted.setForCurrStep(True)
+        was_predicted = self.bit_states.getRow(StateKind.PREDICTED, 1)[:len(is_active)]
+        self.bit_states.set(StateKind.FALSELY_PREDICTED, numpy.nonzero(was_predicted & ~is_active)[0], True)
 
-        self.output = output_array
-
-    def getPredictions(self):
+    def getPredictions(self, fast=False):
         """
         Get the predictions after an iteration.
+        If fast is True, classifiers only learn and predictions are not stored.
         """
 
         if self.predictions_method == PredictionsMethod.RECONSTRUCTION:
+            # Reconstruction does not learn anything, so there is nothing to do in fast steps
+            if fast:
+                return
 
             # Prepare list with predictions to be classified
             # This list contains the indexes of all bits that are predicted
@@ -226,7 +301,16 @@ class Sensor(Node):
             output = numpy.array(output)
 
             # Decode output and create predictions list
-            fields_dict, fields_order = self.encoder.decode(output)
+            # Each field is decoded apart, so repeated patterns are taken from the memoized results
+            fields_dict = dict()
+            fields_order = []
+            offset = 0
+            for encoding in self.encodings:
+                encoder_width = encoding.encoder.getWidth()
+                field_dict, field_order = encoding.encoder_memo.decode(output[offset:offset + encoder_width], self.encoder.name)
+                fields_dict.update(field_dict)
+                fields_order.extend(field_order)
+                offset += encoder_width
             for encoding in self.encodings:
                 if encoding.enable_inference:
                     predictions = []
@@ -253,22 +337,26 @@ class Sensor(Node):
             # A classification involves estimate which are the likely values to occurs in the next time step.
 
             offset = 0
-            for encoding in self.encodings:
+            for i in range(len(self.encodings)):
+                encoding = self.encodings[i]
                 encoder_width = encoding.encoder.getWidth()
 
-                if encoding.enable_inference:
+                if encoding.enable_inference and (not fast or self.enable_classification_learning):
                     # Prepare list with predictions to be classified
                     # This list contains the indexes of all bits that are predicted
-                    pattern_n_z = [i
-                                   for i in range(offset, encoder_width)
-                                   if self.bits[i].is_active.atCurrStep()]
+                    pattern_n_z = (numpy.nonzero(self.output[offset:offset + encoder_width])[0] + offset).tolist()
 
                     # Get the bucket index of the current value at the encoder
-                    actual_value = encoding.current_value.atCurrStep()
+                    actual_value = self.record_values[i]
                     bucket_idx = encoding.encoder.getBucketIndices(actual_value)[0]
 
                     # Perform classification
-                    clas_results = encoding.classifier.compute(recordNum=Global.curr_step, patternNZ=pattern_n_z, classification={'bucketIdx': bucket_idx, 'actValue': actual_value}, learn=self.enable_classification_learning, infer=self.enable_classification_inference)
+                    # In fast steps the classifier only learns
+                    infer = self.enable_classification_inference and not fast
+                    clas_results = encoding.classifier.compute(recordNum=self.context.curr_step, patternNZ=pattern_n_z, classification={'bucketIdx': bucket_idx, 'actValue': actual_value}, learn=self.enable_classification_learning, infer=infer)
+                    if fast:
+                        offset += encoder_width
+                        continue
 
                     encoding.predicted_values.setForCurrStep(dict())
                     for step in encoding.steps:
@@ -311,34 +399,40 @@ class Sensor(Node):
         Calculate statistics after an iteration.
         """
 
-        if Global.curr_step > 0:
-            precision = 0.0
+        network = self.context.network
+
+        # The precision is only calculated from the node level
+        if network.hasStatisticsLevel(StatisticsLevel.NODE):
+            if self.context.stats_step > 0:
+                precision = 0.0
+
+                # Calculate the prediction precision comparing if the current value is in the range of any prediction.
+                for encoding in self.encodings:
+                    if encoding.enable_inference:
+                        predictions = encoding.predicted_values.atPreviousStep()[1]
+                        for predicted_value in predictions:
+                            min = None
+                            max = None
+                            value = predicted_value[0]
+                            if self.predictions_method == PredictionsMethod.RECONSTRUCTION:
+                                min = value[0]
+                                max = value[1]
+                            elif self.predictions_method == PredictionsMethod.CLASSIFICATION:
+                                min = value
+                                max = value
+                            if isinstance(min, (int, long, float, complex)) and isinstance(max, (int, long, float, complex)):
+                                min = math.floor(min)
+                                max = math.ceil(max)
+                            if min <= encoding.current_value.atCurrStep() <= max:
+                                precision = 100.0
+                                break
 
-            # Calculate the prediction precision comparing if the current value is in the range of any prediction.
-            for encoding in self.encodings:
-                if encoding.enable_inference:
-                    predictions = encoding.predicted_values.atPreviousStep()[1]
-                    for predicted_value in predictions:
-                        min = None
-                        max = None
-                        value = predicted_value[0]
-                        if self.predictions_method == PredictionsMethod.RECONSTRUCTION:
-                            min = value[0]
-                            max = value[1]
-                        elif self.predictions_method == PredictionsMethod.CLASSIFICATION:
-                            min = value
-                            max = value
-                        if isinstance(min, (int, long, float, complex)) and isinstance(max, (int, long, float, complex)):
-                            min = math.floor(min)
-                            max = math.ceil(max)
-                        if min <= encoding.current_value.atCurrStep() <= max:
-                            precision = 100.0
-                            break
-
-            # The precision rate is the average of the precision calculated in every step
-            self.stats_precision_rate = (self.stats_precision_rate + precision) / 2
-        else:
-            self.stats_precision_rate = 0.0
-
-        for bit in self.bits:
-            bit.calculateStatistics()
+                # The precision rate is the average of the precision calculated in every step
+                self.stats_precision_rate = (self.stats_precision_rate + precision) / 2
+            else:
+                self.stats_precision_rate = 0.0
+
+        # Statistics of the bits are counted at once and their rates are calculated when read
+        # Bits are counted from the column level, given that they are the columns of a sensor
+        self.bit_states.setCounting(network.hasStatisticsLevel(StatisticsLevel.COLUMN))
+        self.bit_states.updateCounters()
@@ -0,0 +1,183 @@
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class RecordSource(object):
+    """
+    Reads the records of a stream (like a FileRecordStream) ahead in a background thread, so a time step does not wait
+    for disk I/O and parsing. Records are passed in batches through a bounded queue, so memory does not grow with the
+    size of the stream.
+
+    If the whole stream fits in the cache, the records of the first pass are kept and the next passes (after rewind)
+    are served from memory. Otherwise, the thread rewinds the stream by itself at the end of each pass and keeps
+    reading.
+    """
+
+    def __init__(self, stream, batch_size=256, max_batches=16, max_cached_records=100000):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Stream whose records are read. Once the thread is started, only the thread uses it.
+        self.stream = stream
+
+        # Number of records read at once and maximum number of batches waiting in the queue.
+        self.batch_size = batch_size
+        self.batches = queue.Queue(max_batches)
+
+        # Records of the first pass, kept while they do not exceed the maximum number of cached records.
+        self.max_cached_records = max_cached_records
+        self.cached_records = []
+
+        # Whether the cache holds the whole stream (then the thread stops at the end of the first pass).
+        self.cache_complete = False
+
+        # Batch being consumed and the position of the next record in it (or in the cache for passes in memory).
+        self.batch = []
+        self.position = 0
+
+        # Whether the current pass is served from the cache.
+        self.reading_cache = False
+
+        # Whether the end of the current pass was reached.
+        self.end_reached = False
+
+        # Error raised while reading the stream. The thread stops after an error, so it is raised again by every read
+        # instead of waiting for records that will never come.
+        self.error = None
+
+        # Flag to ask the thread to stop.
+        self.stop_requested = False
+
+        self.thread = None
+        self.start()
+
+    def start(self):
+        """
+        Start the thread which reads the records ahead.
+        """
+        self.stop_requested = False
+        self.thread = threading.Thread(target=self.readRecords)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def close(self):
+        """
+        Stop the thread and discard the records read ahead.
+        """
+        self.stop_requested = True
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        while not self.batches.empty():
+            self.batches.get_nowait()
+        self.batch = []
+        self.position = 0
+
+    def putBatch(self, batch):
+        """
+        Put a batch (or the end of a pass, given by None) into the queue, waiting while it is full.
+        Return False if the thread was asked to stop.
+        """
+        while not self.stop_requested:
+            try:
+                self.batches.put(batch, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def readRecords(self):
+        """
+        Main loop of the thread: read batches of records and put them into the queue.
+        """
+        caching = len(self.cached_records) == 0
+        try:
+            while not self.stop_requested:
+                batch = []
+                while len(batch) < self.batch_size:
+                    record = self.stream.getNextRecordDict()
+                    if not record:
+                        break
+                    batch.append(record)
+
+                # Keep the records of the first pass while the stream fits in the cache
+                if caching:
+                    self.cached_records.extend(batch)
+                    if len(self.cached_records) > self.max_cached_records:
+                        caching = False
+                        self.cached_records = []
+
+                if len(batch) > 0 and not self.putBatch(batch):
+                    return
+
+                # At the end of the stream, stop if the next passes can be served from memory or rewind it otherwise
+                if len(batch) < self.batch_size:
+                    if caching:
+                        self.cache_complete = True
+                        self.putBatch(None)
+                        return
+                    if not self.putBatch(None):
+                        return
+                    self.stream.rewind()
+        except Exception as error:
+            # Errors are raised to the consumer
+            self.putBatch(error)
+
+    def getNextRecordDict(self):
+        """
+        Return the next record or None if the end of the current pass was reached.
+        """
+        if self.error is not None:
+            raise self.error
+        if self.end_reached:
+            return None
+
+        # Serve the pass from memory
+        if self.reading_cache:
+            if self.position < len(self.cached_records):
+                record = self.cached_records[self.position]
+                self.position += 1
+                return record
+            self.end_reached = True
+            return None
+
+        # Take the next batch read ahead when the current one is over
+        if self.position >= len(self.batch):
+            batch = self.batches.get()
+            if isinstance(batch, Exception):
+                self.error = batch
+                raise batch
+            if batch is None:
+                self.end_reached = True
+                return None
+            self.batch = batch
+            self.position = 0
+
+        record = self.batch[self.position]
+        self.position += 1
+        return record
+
+    def rewind(self):
+        """
+        Move to the first record of the stream.
+        """
+        if self.reading_cache or self.cache_complete:
+            # The whole stream is in memory, so the records read ahead are not needed anymore
+            if not self.reading_cache:
+                self.close()
+                self.reading_cache = True
+        elif not self.end_reached:
+            # Discard the records read ahead and read the stream again from its beginning
+            self.close()
+            self.cached_records = []
+            self.cache_complete = False
+            self.error = None
+            self.stream.rewind()
+            self.start()
+        self.batch = []
+        self.position = 0
+        self.end_reached = False
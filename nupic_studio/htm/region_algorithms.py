@@ -0,0 +1,257 @@
+import multiprocessing
+import traceback
+import numpy
+from nupic_studio.htm.connections_tracker import ConnectionsTracker
+from nupic_studio.htm.run_context import NetworkError
+from nupic.research.spatial_pooler import SpatialPooler
+from nupic.research.temporal_memory import TemporalMemory as TemporalPooler
+
+
+class StepResult(object):
+    """
+    Output of the algorithms of a region for a time step, i.e. everything the region needs to update its elements.
+    Only arrays and plain containers are used, so it can be sent between processes.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Indexes of the active columns.
+        self.active_columns = None
+
+        # Indexes of the active, winner and predictive cells, and of the active distal segments.
+        self.active_cells = None
+        self.winner_cells = None
+        self.predictive_cells = None
+        self.active_segments = None
+
+        # Indexes of the columns whose proximal synapses should be updated and the permanences of their potential pools,
+        # concatenated in the same order of the columns (see RegionAlgorithms.potential_pools).
+        self.proximal_col_indices = None
+        self.proximal_permanences = None
+
+        # Changes in the distal connections since the last step which was not fast.
+        # Created segments are given with the index of the cell which they belong to, while created or updated synapses
+        # are given with a tuple (segment, presynaptic cell, permanence).
+        self.created_segments = {}
+        self.destroyed_segments = []
+        self.destroyed_synapses = []
+        self.synapses_data = {}
+
+
+class RegionAlgorithms(object):
+    """
+    Spatial and temporal poolers of a region computed in the same process of the region.
+    """
+
+    def __init__(self, sp_params, tp_params):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Spatial Pooler instance.
+        self.spatial_pooler = SpatialPooler(**sp_params)
+
+        # Temporal Pooler instance.
+        self.temporal_pooler = TemporalPooler(**tp_params)
+
+        # Tracker of the changes made by the temporal pooler on its connections.
+        self.connections_tracker = ConnectionsTracker(self.temporal_pooler.connections)
+
+        # Number of cells per column of the temporal pooler.
+        self.cells_per_column = tp_params['cellsPerColumn']
+
+        # Buffer where the spatial pooler writes the activity of the columns (reused across steps).
+        self.column_activity = numpy.zeros(self.spatial_pooler.getNumColumns())
+
+        # Buffer where the spatial pooler writes the permanences of a column (reused across columns).
+        self.column_permanences = numpy.zeros(self.spatial_pooler.getNumInputs(), dtype=numpy.float32)
+
+        # Positions in the input map of the potential pool of each column. Synapses outside of the pool never get a
+        # permanence, so only the permanences inside it are returned.
+        self.potential_pools = []
+        potential = numpy.zeros(self.spatial_pooler.getNumInputs())
+        for col_idx in range(self.spatial_pooler.getNumColumns()):
+            self.spatial_pooler.getPotential(col_idx, potential)
+            self.potential_pools.append(numpy.flatnonzero(potential).astype(numpy.int64))
+
+        # Whether steps were fast-forwarded since the last result which was not fast.
+        self.fast_forwarded = False
+
+        # Result of the last computation.
+        self.result = None
+
+    def compute(self, input, learn_spatial, learn_temporal, fast=False):
+        """
+        Compute the spatial and temporal poolers for a given input and return their output.
+        If fast is True, only the active columns and cells are returned.
+        """
+        result = StepResult()
+
+        # Send input to Spatial Pooler and get processed output (i.e. the active columns)
+        # From here on only the indexes of the active columns are used
+        self.spatial_pooler.compute(input, learn_spatial, self.column_activity)
+        active_columns = numpy.flatnonzero(self.column_activity)
+        result.active_columns = active_columns
+
+        # Send active columns to Temporal Pooler and get processed output (i.e. the predicting cells)
+        self.temporal_pooler.compute(set(active_columns.tolist()), learn_temporal)
+        result.active_cells = numpy.fromiter(self.temporal_pooler.activeCells, dtype=numpy.int64)
+
+        if fast:
+            # Changes in the elements will be caught up in the next step which is not fast
+            # Changes in distal elements are kept by the connections tracker until there
+            self.fast_forwarded = True
+            return result
+
+        result.winner_cells = numpy.fromiter(self.temporal_pooler.winnerCells, dtype=numpy.int64)
+        result.predictive_cells = numpy.fromiter(self.temporal_pooler.predictiveCells, dtype=numpy.int64)
+        result.active_segments = numpy.fromiter(self.temporal_pooler.activeSegments, dtype=numpy.int64)
+
+        # Get permanences of the proximal synapses of active or predicted columns
+        # After fast-forwarded steps, synapses of all columns are returned given that any of them could have changed
+        if self.fast_forwarded:
+            col_indices = numpy.arange(len(self.column_activity))
+            self.fast_forwarded = False
+        else:
+            col_indices = numpy.union1d(active_columns, result.predictive_cells // self.cells_per_column)
+        permanences = [numpy.zeros(0, dtype=numpy.float32)]
+        for col_idx in col_indices:
+            self.spatial_pooler.getPermanence(col_idx, self.column_permanences)
+            permanences.append(self.column_permanences[self.potential_pools[col_idx]])
+        result.proximal_col_indices = col_indices
+        result.proximal_permanences = numpy.concatenate(permanences)
+
+        # Get the changes in distal segments and synapses
+        tracker = self.connections_tracker
+        connections = self.temporal_pooler.connections
+        result.created_segments = dict(tracker.created_segments)
+        result.destroyed_segments = list(tracker.destroyed_segments)
+        result.destroyed_synapses = list(tracker.destroyed_synapses)
+        for syn_idx in tracker.created_synapses | tracker.updated_synapses:
+            synapse_data = connections.dataForSynapse(syn_idx)
+            result.synapses_data[syn_idx] = (synapse_data.segment, synapse_data.presynapticCell, synapse_data.permanence)
+        tracker.reset()
+
+        return result
+
+    def startCompute(self, input, learn_spatial, learn_temporal, fast=False):
+        """
+        Start the computation of the algorithms for a given input. Its result is returned by getResult.
+        """
+        self.result = self.compute(input, learn_spatial, learn_temporal, fast)
+
+    def getResult(self):
+        """
+        Return the result of the last computation.
+        """
+        return self.result
+
+    def close(self):
+        """
+        Release the resources used by the algorithms.
+        """
+        self.result = None
+
+
+class WorkerError(object):
+    """
+    An error raised in a worker process, sent back with its traceback (which would be lost otherwise).
+    """
+
+    def __init__(self, message, formatted_traceback):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Message of the error and the traceback formatted in the worker process.
+        self.message = message
+        self.traceback = formatted_traceback
+
+
+def runRegionWorker(connection, sp_params, tp_params):
+    """
+    Main loop of a worker process: receive inputs, compute the algorithms and send back their results until a None
+    message is received.
+    """
+
+    # The potential pools are sent first, given that the region needs them before the first step
+    try:
+        algorithms = RegionAlgorithms(sp_params, tp_params)
+    except Exception as error:
+        connection.send(WorkerError(error.__class__.__name__ + ": " + str(error), traceback.format_exc()))
+        connection.close()
+        return
+    connection.send(algorithms.potential_pools)
+
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+
+        # Errors are sent back to be raised in the process of the region
+        # Only their message and traceback are sent, given that not every exception can be pickled
+        try:
+            result = algorithms.compute(*message)
+        except Exception as error:
+            result = WorkerError(error.__class__.__name__ + ": " + str(error), traceback.format_exc())
+        connection.send(result)
+    connection.close()
+
+
+class RegionWorker(object):
+    """
+    Spatial and temporal poolers of a region computed in a separate process, so regions of the same phase can be
+    computed in parallel. Only the input and the result of each step cross the process boundary.
+    """
+
+    def __init__(self, sp_params, tp_params):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Connection with the worker process.
+        self.connection, worker_connection = multiprocessing.Pipe()
+
+        # Process where the algorithms live.
+        self.process = multiprocessing.Process(target=runRegionWorker, args=(worker_connection, sp_params, tp_params))
+        self.process.daemon = True
+        self.process.start()
+        worker_connection.close()
+
+        # Positions in the input map of the potential pool of each column (see RegionAlgorithms).
+        # A worker which failed to create the algorithms has already finished
+        try:
+            self.potential_pools = self.getResult()
+        except NetworkError:
+            self.process.join()
+            self.connection.close()
+            raise
+
+    def startCompute(self, input, learn_spatial, learn_temporal, fast=False):
+        """
+        Send an input to the worker process and return without wait for the result.
+        """
+        self.connection.send((input, learn_spatial, learn_temporal, fast))
+
+    def getResult(self):
+        """
+        Wait for the result of the last input sent to the worker process.
+        """
+        result = self.connection.recv()
+        if isinstance(result, WorkerError):
+            raise NetworkError("Worker process of the region failed with " + result.message + "\n" + result.traceback)
+        return result
+
+    def close(self):
+        """
+        Stop the worker process.
+        """
+        try:
+            self.connection.send(None)
+        except (IOError, EOFError):
+            pass
+        self.process.join()
+        self.connection.close()
@@ -0,0 +1,35 @@
+import weakref
+
+
+# Render state of the elements (3D positions, node paths, selection, etc) indexed by element.
+# It is kept apart from the elements so headless runs do not pay for it, and an entry disappears together with its
+# element.
+render_states = weakref.WeakKeyDictionary()
+
+
+class RenderField(object):
+    """
+    Descriptor that exposes a render attribute of an element as if it was an ordinary attribute, while keeping its
+    value in the render states table. Elements which never were rendered have no entry in the table.
+    The element must be weak referenceable (i.e. have '__weakref__' in its slots).
+    """
+
+    def __init__(self, name, default=None):
+        self.name = name
+        self.default = default
+
+    def __get__(self, element, owner):
+        if element is None:
+            return self
+        render_state = render_states.get(element)
+        if render_state is None:
+            return self.default
+        return render_state.get(self.name, self.default)
+
+    def __set__(self, element, value):
+        render_state = render_states.get(element)
+        if render_state is None:
+            render_state = {}
+            render_states[element] = render_state
+        render_state[self.name] = value
+
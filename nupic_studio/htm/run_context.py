@@ -0,0 +1,73 @@
+import os
+from nupic_studio import MachineState
+from nupic_studio.htm import MAX_PREVIOUS_STEPS_WITH_INFERENCE
+
+
+class NetworkError(Exception):
+    """
+    Raised when a node cannot be initialized or processed due to an invalid configuration.
+    """
+    pass
+
+
+class StatisticsLevel:
+    """
+    Granularity of the statistics calculated at each time step. Each level includes the lower ones. Counters of the
+    higher levels are calculated from the history of states only when they are read, so they only cover the last
+    time steps.
+    """
+    NONE = "None"
+    NODE = "Node"
+    COLUMN = "Column"
+    CELL = "Cell"
+    FULL = "Full"
+
+
+# Statistics levels ordered from the coarsest to the finest.
+STATISTICS_LEVELS = [StatisticsLevel.NONE, StatisticsLevel.NODE, StatisticsLevel.COLUMN, StatisticsLevel.CELL, StatisticsLevel.FULL]
+
+
+class RunContext(object):
+    """
+    State shared by the nodes of a network along a simulation, so that several networks can run in the same process.
+    """
+
+    def __init__(self, network=None, project_dir=''):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Network which is being simulated.
+        self.network = network
+
+        # Directory of the project file, used to find data files given by relative paths.
+        self.project_dir = project_dir
+
+        # Current time step of the simulation (the first step is 0).
+        self.curr_step = 0
+
+        # Time step counting only the steps whose statistics were calculated (i.e. fast-forwarded steps are not
+        # counted). It is the same as the current step when no step was fast-forwarded.
+        self.stats_step = -1
+
+        # Time steps of the values kept in the predictions history of the encodings (fast-forwarded steps are not kept).
+        self.prediction_steps = MachineState(0, MAX_PREVIOUS_STEPS_WITH_INFERENCE)
+
+        # Function called with the message of any error found while running the network.
+        # If none is given, errors are only returned as failures (for example, by Network.initialize).
+        self.on_error = None
+
+    def getFullFileName(self, file_name):
+        """
+        Return the path of a file given relatively to the project file.
+        """
+        if file_name != '' and os.path.dirname(file_name) == '':
+            return os.path.join(self.project_dir, file_name)
+        return file_name
+
+    def reportError(self, message):
+        """
+        Report an error to the listener (if any).
+        """
+        if self.on_error is not None:
+            self.on_error(message)
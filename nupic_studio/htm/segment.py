@@ -1,6 +1,7 @@
-from nupic_studio import MachineState
-from nupic_studio.htm import MAX_PREVIOUS_STEPS
-from nupic_studio.ui import Global
+import numpy
+from nupic_studio.htm.state_store import StateKind, StateField, CounterField, RateField
+from nupic_studio.htm.render_state import RenderField
+from nupic_studio.htm.synapse import Synapse
 
 
 class SegmentType:
@@ -8,16 +9,43 @@ class SegmentType:
     DISTAL = 1
 
 
-class Segment:
+class Segment(object):
     """
     A class only to group properties related to segments.
     """
-
-    def __init__(self, type):
+    __slots__ = ('states', 'id', 'type', 'index_tp', 'synapses', '__weakref__')
+
+    # States of this element
+    is_active = StateField(StateKind.ACTIVE)
+    is_predicted = StateField(StateKind.PREDICTED)
+    is_falsely_predicted = StateField(StateKind.FALSELY_PREDICTED)
+    is_removed = StateField(StateKind.REMOVED)
+
+    # Statistics (counters are updated in bulk by the node and rates are calculated when read)
+    stats_activation_count = CounterField('activation_count')
+    stats_activation_rate = RateField('activation_count')
+    stats_predition_count = CounterField('prediction_count')
+    stats_precision_rate = RateField('prediction_count', 'activation_count')
+
+    # 3D object reference (kept in the render states table, see RenderField)
+    tree3d_initialized = RenderField('tree3d_initialized', False)
+    tree3d_start_pos = RenderField('tree3d_start_pos', (0, 0, 0))
+    tree3d_end_pos = RenderField('tree3d_end_pos', (0, 0, 0))
+    tree3d_line = RenderField('tree3d_line', None)
+    tree3d_selected = RenderField('tree3d_selected', False)
+
+    def __init__(self, type, states, id=None):
         """
         Initializes a new instance of this class.
         """
 
+        # Store which holds the states of this element and the index of this element in it.
+        # An id is only passed when the segment states already exist in the store (i.e. they are allocated in bulk).
+        self.states = states
+        if id is None:
+            id = states.allocate()
+        self.id = id
+
         # Determine if this segment is proximal or distal.
         self.type = type
 
@@ -27,25 +55,6 @@ class Segment:
         # List of distal synapses of this segment.
         self.synapses = []
 
-        # States of this element
-        self.is_active = MachineState(False, MAX_PREVIOUS_STEPS)
-        self.is_predicted = MachineState(False, MAX_PREVIOUS_STEPS)
-        self.is_falsely_predicted = MachineState(False, MAX_PREVIOUS_STEPS)
-        self.is_removed = MachineState(False, MAX_PREVIOUS_STEPS)
-
-        # Statistics
-        self.stats_activation_count = 0
-        self.stats_activation_rate = 0.0
-        self.stats_predition_count = 0
-        self.stats_precision_rate = 0.0
-
-        # 3D object reference
-        self.tree3d_initialized = False
-        self.tree3d_start_pos = (0, 0, 0)
-        self.tree3d_end_pos = (0, 0, 0)
-        self.tree3d_item_np = None
-        self.tree3d_selected = False
-
     def getSynapse(self, index_sp):
         """
         Return the synapse connected to a given cell or sensor bit
@@ -60,35 +69,94 @@ class Segment:
         Perfoms actions related to time step progression.
         """
 
-        # Update states machine by remove the first element and add a new element in the end
-        self.is_active.rotate()
-        self.is_predicted.rotate()
-        self.is_falsely_predicted.rotate()
-        self.is_removed.rotate()
-
         # Remove synapses that are marked to be removed
+        remaining_synapses = []
         for synapse in self.synapses:
             if synapse.is_removed.atFirstStep():
-                self.synapses.remove(synapse)
-                del synapse
+                synapse.release()
+            else:
+                remaining_synapses.append(synapse)
+        self.synapses = remaining_synapses
 
+    def release(self):
+        """
+        Return the ids of this segment and its synapses to their stores.
+        """
         for synapse in self.synapses:
-            synapse.nextStep()
+            synapse.release()
+        self.synapses = []
+        self.states.release(self.id)
 
-    def calculateStatistics(self):
+
+class ProximalSegment(Segment):
+    """
+    A proximal segment whose synapses are updated in bulk by the region, so synapse objects are only created when
+    they are requested (by the UI for example).
+    """
+    __slots__ = ('region', 'col_idx', 'synapses_cache')
+
+    def __init__(self, states, region, col_idx, id=None):
         """
-        Calculate statistics after an iteration.
+        Initializes a new instance of this class.
         """
+        Segment.__init__(self, SegmentType.PROXIMAL, states, id)
 
-        # Calculate statistics
-        if self.is_active.atCurrStep():
-            self.stats_activation_count += 1
-        if self.is_predicted.atCurrStep():
-            self.stats_predition_count += 1
-        if Global.curr_step > 0:
-            self.stats_activation_rate = self.stats_activation_count / float(Global.curr_step)
-        if self.stats_activation_count > 0:
-            self.stats_precision_rate = self.stats_predition_count / float(self.stats_activation_count)
+        # Region which holds the ids of the synapses of this segment.
+        self.region = region
 
-        for synapse in self.synapses:
-            synapse.calculateStatistics()
+        # Index of the column of this segment in the spatial pooler.
+        self.col_idx = col_idx
+
+        # Synapse objects already created, indexed by their position in the input map.
+        self.synapses_cache = {}
+
+    @property
+    def synapses(self):
+        """
+        Return the synapses of this segment, creating the objects of the synapses that appeared since the last call.
+        """
+        region = self.region
+        return self.getSynapses(region.proximal_pools[self.col_idx], region.proximal_synapse_ids[self.col_idx], region.proximal_synapse_states)
+
+    def getSynapses(self, pool, ids, states):
+        """
+        Return the synapses of this segment given the positions in the input map of its potential pool, the ids of its
+        synapses and the store with their states, which can be a snapshot of the region's store (see RegionSnapshot).
+        """
+
+        # A synapse is listed until it remains removed for all the stored time steps
+        removed_now = states.getCurrRow(StateKind.REMOVED)
+        removed_first = states.getRow(StateKind.REMOVED, states.max_len - 1)
+
+        synapses = []
+        for pool_idx in numpy.nonzero(ids >= 0)[0].tolist():
+            syn_idx = int(pool[pool_idx])
+            id = int(ids[pool_idx])
+            if removed_now[id] and removed_first[id]:
+                continue
+
+            # The synapses read their states from the given store, given that the store of the region can be changing
+            # in other thread
+            synapse = self.synapses_cache.get(syn_idx)
+            if synapse is None or synapse.id != id:
+                synapse = Synapse(states, id)
+                synapse.index_sp = syn_idx
+                synapse.segment = self
+                synapse.input_elem = self.region.getInputElement(syn_idx)
+                self.synapses_cache[syn_idx] = synapse
+            synapse.states = states
+
+            synapses.append(synapse)
+
+        return synapses
+
+    @synapses.setter
+    def synapses(self, synapses):
+        # Synapses of proximal segments are owned by the region
+        self.synapses_cache = {}
+
+    def nextStep(self):
+        """
+        Perfoms actions related to time step progression.
+        """
+        pass
@@ -0,0 +1,435 @@
+import numpy
+from nupic_studio.htm import MAX_PREVIOUS_STEPS
+
+
+class StateKind:
+    """
+    Kinds of states that an element (bit, cell, segment or synapse) can have at each time step.
+    """
+    ACTIVE = "active"
+    PREDICTED = "predicted"
+    FALSELY_PREDICTED = "falsely_predicted"
+    LEARNING = "learning"
+    CONNECTED = "connected"
+    REMOVED = "removed"
+    PERMANENCE = "permanence"
+
+
+# Data type used to store each kind of state.
+STATE_DTYPES = {
+    StateKind.ACTIVE: numpy.bool_,
+    StateKind.PREDICTED: numpy.bool_,
+    StateKind.FALSELY_PREDICTED: numpy.bool_,
+    StateKind.LEARNING: numpy.bool_,
+    StateKind.CONNECTED: numpy.bool_,
+    StateKind.REMOVED: numpy.bool_,
+    StateKind.PERMANENCE: numpy.float32,
+}
+
+
+class StateStore(object):
+    """
+    Stores the states of a group of elements for the last time steps.
+
+    Each state kind is kept in a ring buffer (a list of rows, one for each time step, whose items are indexed by element
+    id), so progressing a time step only moves the head row instead of rotating a queue for every element.
+    """
+
+    def __init__(self, kinds, capacity=0, max_len=MAX_PREVIOUS_STEPS, counters=None, carried=None):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Kinds of states stored for each element.
+        self.kinds = list(kinds)
+
+        # Kinds of states whose values are carried to the next time step instead of being reset.
+        # They are used for states which are only updated when they change (like permanence of distal synapses).
+        self.carried_kinds = set(carried or [])
+
+        # Counters which accumulate how many time steps each element had a given state kind.
+        # For example, {'activation_count': StateKind.ACTIVE}.
+        self.counter_kinds = dict(counters or {})
+        self.counters = {}
+        for name in self.counter_kinds:
+            self.counters[name] = numpy.zeros(0, dtype=numpy.int64)
+
+        # Number of time steps added to the counters.
+        self.counted_steps = 0
+
+        # Number of time steps whose statistics were calculated, whether they were counted or not. Counters only cover
+        # all of them if counting was never disabled (see countsAllSteps).
+        self.statistics_steps = 0
+
+        # Whether the counters are updated at each time step. Otherwise, counters are calculated from the history of
+        # states when they are read (so only the time steps still stored are counted).
+        self.counting = True
+
+        # Number of time steps stored in the history (up to its maximum length).
+        self.recorded_steps = 0
+
+        # Number of time steps kept in history.
+        self.max_len = max_len
+
+        # Row of the ring buffers which holds the current time step.
+        self.head = max_len - 1
+
+        # Number of element ids that the arrays can hold without grow.
+        self.capacity = 0
+
+        # Number of element ids already handed out (including released ones).
+        self.size = 0
+
+        # Ids released by removed elements which can be reused.
+        self.free_ids = []
+
+        # Ring buffers of each state kind.
+        self.rows = {}
+        for kind in self.kinds:
+            self.rows[kind] = [numpy.zeros(0, dtype=STATE_DTYPES[kind]) for i in range(self.max_len)]
+
+        # Whether the rows and counters are shared with a copy of this store (see copy), so they must be copied before
+        # they are changed in place. The rows of the current time step are tracked apart, given that they are the only
+        # ones changed at each time step.
+        self.shared_history = False
+        self.shared_head_kinds = set()
+
+        self.reserve(capacity)
+
+    def copy(self):
+        """
+        Return a frozen copy of this store, so it can be read by another thread while this store keeps changing.
+        Both stores share the same rows and counters, which this store copies before changing them in place
+        (copy-on-write), so a copy takes the same time whatever the number of elements.
+        """
+        store = StateStore.__new__(StateStore)
+        store.kinds = self.kinds
+        store.carried_kinds = self.carried_kinds
+        store.counter_kinds = self.counter_kinds
+        store.counters = dict(self.counters)
+        store.counted_steps = self.counted_steps
+        store.statistics_steps = self.statistics_steps
+        store.counting = self.counting
+        store.recorded_steps = self.recorded_steps
+        store.max_len = self.max_len
+        store.head = self.head
+        store.capacity = self.capacity
+        store.size = self.size
+        store.free_ids = list(self.free_ids)
+        store.rows = dict((kind, list(rows)) for kind, rows in self.rows.items())
+        store.shared_history = True
+        store.shared_head_kinds = set(self.kinds)
+        self.shared_history = True
+        self.shared_head_kinds = set(self.kinds)
+        return store
+
+    def unshareHistory(self):
+        """
+        Copy the rows and counters shared with a copy of this store, before changing them in place.
+        """
+        if not self.shared_history:
+            return
+        for kind in self.kinds:
+            self.rows[kind] = [row.copy() for row in self.rows[kind]]
+        for name in self.counters:
+            self.counters[name] = self.counters[name].copy()
+        self.shared_history = False
+        self.shared_head_kinds = set()
+
+    def reserve(self, capacity):
+        """
+        Grow the ring buffers in order to they hold at least the given number of elements.
+        """
+        if capacity <= self.capacity:
+            return
+
+        # Double the capacity to amortize the cost of growing when elements are created one by one
+        # The rows and counters are replaced, so they are not shared anymore
+        capacity = max(capacity, self.capacity * 2)
+        for kind in self.kinds:
+            rows = []
+            for row in self.rows[kind]:
+                new_row = numpy.zeros(capacity, dtype=STATE_DTYPES[kind])
+                new_row[:self.capacity] = row
+                rows.append(new_row)
+            self.rows[kind] = rows
+        for name in self.counters:
+            counter = numpy.zeros(capacity, dtype=numpy.int64)
+            counter[:self.capacity] = self.counters[name]
+            self.counters[name] = counter
+        self.capacity = capacity
+        self.shared_history = False
+        self.shared_head_kinds = set()
+
+    def allocate(self):
+        """
+        Return an id for a new element, reusing the id of a released element if possible.
+        """
+        if len(self.free_ids) > 0:
+            id = self.free_ids.pop()
+        else:
+            id = self.size
+            self.size += 1
+            self.reserve(self.size)
+
+        self.clean(id)
+        return id
+
+    def allocateMany(self, count):
+        """
+        Return an array with ids for a given number of new elements.
+        """
+
+        # First reuse the released ids and then take new ones from the end
+        num_reused = min(count, len(self.free_ids))
+        reused_ids = self.free_ids[len(self.free_ids) - num_reused:]
+        del self.free_ids[len(self.free_ids) - num_reused:]
+        new_ids = numpy.arange(self.size, self.size + count - num_reused, dtype=numpy.int64)
+        self.size += len(new_ids)
+        self.reserve(self.size)
+
+        ids = numpy.concatenate([numpy.array(reused_ids, dtype=numpy.int64), new_ids])
+        self.clean(ids)
+        return ids
+
+    def clean(self, id):
+        """
+        Clean any history left by a previous owner of one or more ids.
+        """
+        self.unshareHistory()
+        for kind in self.kinds:
+            for row in self.rows[kind]:
+                row[id] = 0
+        for name in self.counters:
+            self.counters[name][id] = 0
+
+    def release(self, id):
+        """
+        Return the id of a removed element to be reused.
+        """
+        self.free_ids.append(id)
+
+    def nextStep(self):
+        """
+        Perfoms actions related to time step progression.
+        """
+
+        # Move the head to the oldest row and replace it by a new row to hold the new time step
+        # Rows are replaced instead of reset, given that the oldest one can be shared with a copy of this store
+        previous_head = self.head
+        self.head = (self.head + 1) % self.max_len
+        self.recorded_steps = min(self.recorded_steps + 1, self.max_len)
+        for kind in self.kinds:
+            rows = self.rows[kind]
+            if kind in self.carried_kinds:
+                rows[self.head] = rows[previous_head].copy()
+            else:
+                rows[self.head] = numpy.zeros(self.capacity, dtype=STATE_DTYPES[kind])
+        self.shared_head_kinds = set()
+
+    def updateCounters(self):
+        """
+        Add the states of the current time step to the counters of all elements at once.
+        """
+        self.statistics_steps += 1
+        if not self.counting:
+            return
+        # Shared counters are replaced instead of changed
+        for name, kind in self.counter_kinds.items():
+            if self.shared_history:
+                self.counters[name] = self.counters[name] + self.getCurrRow(kind)
+            else:
+                self.counters[name] += self.getCurrRow(kind)
+        self.counted_steps += 1
+
+    def setCounting(self, counting):
+        """
+        Enable or disable the update of the counters at each time step.
+        Once enabled, counters are backfilled from the history of states (except the current time step, which is
+        counted by the next update). As the history only keeps the last time steps, counters enabled in the middle of a
+        simulation do not cover all its time steps, which is told by countsAllSteps.
+        """
+        if counting and not self.counting:
+            rows = [(self.head - i) % self.max_len for i in range(1, self.recorded_steps)]
+            for name, kind in self.counter_kinds.items():
+                counter = numpy.zeros(self.capacity, dtype=numpy.int64)
+                for row in rows:
+                    counter += self.rows[kind][row]
+                self.counters[name] = counter
+            self.counted_steps = len(rows)
+        self.counting = counting
+
+    def getCounter(self, name, id):
+        """
+        Return the value of a counter for an element.
+        """
+        if not self.counting:
+            # Count the time steps still stored in the history
+            rows = self.rows[self.counter_kinds[name]]
+            return sum([1 for i in range(self.recorded_steps) if rows[(self.head - i) % self.max_len][id]])
+        return self.counters[name][id].item()
+
+    def getCountedSteps(self):
+        """
+        Return the number of time steps covered by the counters.
+        """
+        if self.counting:
+            return self.counted_steps
+        return self.recorded_steps
+
+    def countsAllSteps(self):
+        """
+        Return whether the counters cover all the time steps whose statistics were calculated. Otherwise, they only
+        cover the last time steps (see getCountedSteps) and must not be presented as statistics of the whole simulation.
+        """
+        return self.getCountedSteps() >= self.statistics_steps
+
+    def getRate(self, name, id, base_name=None):
+        """
+        Return the rate of a counter of an element over the counted time steps or over another counter of it.
+        """
+        count = self.getCounter(name, id)
+        if base_name is None:
+            total = self.getCountedSteps()
+        else:
+            total = self.getCounter(base_name, id)
+        if total > 0:
+            return count / float(total)
+        return 0.0
+
+    def getRow(self, kind, time_step=0):
+        """
+        Return the states of all elements for a given time step ago.
+        """
+        return self.rows[kind][(self.head - time_step) % self.max_len]
+
+    def getCodes(self, kinds, time_step=0):
+        """
+        Return the states of all elements for a given time step ago packed into one code per element, where the bit i
+        of a code is set if the element has the i-th kind of the given kinds.
+        """
+        codes = numpy.zeros(self.capacity, dtype=numpy.uint8)
+        for i in range(len(kinds)):
+            codes |= self.getRow(kinds[i], time_step).astype(numpy.uint8) << numpy.uint8(i)
+        return codes
+
+    def getCurrRow(self, kind):
+        """
+        Return the states of all elements for the current time step.
+        """
+        return self.rows[kind][self.head]
+
+    def get(self, kind, id, time_step=0):
+        """
+        Return the state of an element for a given time step ago.
+        """
+        return self.rows[kind][(self.head - time_step) % self.max_len][id].item()
+
+    def set(self, kind, id, value):
+        """
+        Set the state of one or more elements for the current time step.
+        """
+        if kind in self.shared_head_kinds:
+            self.rows[kind][self.head] = self.rows[kind][self.head].copy()
+            self.shared_head_kinds.discard(kind)
+        self.rows[kind][self.head][id] = value
+
+    def getHistory(self, kind, id):
+        """
+        Return the states of an element from the first to the current time step.
+        """
+        rows = self.rows[kind]
+        return [rows[(self.head + 1 + i) % self.max_len][id].item() for i in range(self.max_len)]
+
+
+class StateView(object):
+    """
+    A view into a store with the same interface of a machine state, so elements can expose their states as before.
+    """
+    __slots__ = ('store', 'kind', 'id')
+
+    def __init__(self, store, kind, id):
+        self.store = store
+        self.kind = kind
+        self.id = id
+
+    def getList(self):
+        """
+        Get list with stored states machine.
+        """
+        return self.store.getHistory(self.kind, self.id)
+
+    def atGivenStepAgo(self, time_step):
+        """
+        Get the state for a given time step.
+        """
+        return self.store.get(self.kind, self.id, time_step)
+
+    def setForCurrStep(self, value):
+        """
+        Set the state for the current time step.
+        """
+        self.store.set(self.kind, self.id, value)
+
+    def atCurrStep(self):
+        """
+        Get the state of the current time step.
+        """
+        return self.store.get(self.kind, self.id)
+
+    def atPreviousStep(self):
+        """
+        Get the state of the previous time step.
+        """
+        return self.store.get(self.kind, self.id, 1)
+
+    def atFirstStep(self):
+        """
+        Get the state of the firt time step.
+        """
+        return self.store.get(self.kind, self.id, self.store.max_len - 1)
+
+
+class StateField(object):
+    """
+    Descriptor that exposes a state kind of an element as a view into the element's store.
+    The element must have the attributes 'states' (the store) and 'id' (its index in the store).
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+
+    def __get__(self, element, owner):
+        if element is None:
+            return self
+        return StateView(element.states, self.kind, element.id)
+
+
+class CounterField(object):
+    """
+    Descriptor that exposes a counter of an element kept by the element's store.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, element, owner):
+        if element is None:
+            return self
+        return element.states.getCounter(self.name, element.id)
+
+
+class RateField(object):
+    """
+    Descriptor that exposes the rate of a counter of an element, which is only calculated when it is read.
+    The rate is over the counted time steps or, if a base counter is given, over that counter.
+    """
+
+    def __init__(self, name, base_name=None):
+        self.name = name
+        self.base_name = base_name
+
+    def __get__(self, element, owner):
+        if element is None:
+            return self
+        return element.states.getRate(self.name, element.id, self.base_name)
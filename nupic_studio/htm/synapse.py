@@ -1,70 +1,59 @@
-from nupic_studio import MachineState
-from nupic_studio.htm import MAX_PREVIOUS_STEPS
-from nupic_studio.ui import Global
+from nupic_studio.htm.state_store import StateKind, StateField, CounterField, RateField
+from nupic_studio.htm.render_state import RenderField
 
 
-class Synapse:
+class Synapse(object):
     """
     A class only to group properties related to synapses.
     """
+    __slots__ = ('states', 'id', 'index_sp', 'index_tp', 'segment', 'input_elem', '__weakref__')
 
-    def __init__(self):
+    # Permanence of this synapse.
+    permanence = StateField(StateKind.PERMANENCE)
+
+    # States of this element
+    is_connected = StateField(StateKind.CONNECTED)
+    is_predicted = StateField(StateKind.PREDICTED)
+    is_falsely_predicted = StateField(StateKind.FALSELY_PREDICTED)
+    is_removed = StateField(StateKind.REMOVED)
+
+    # Statistics (counters are updated in bulk by the region and rates are calculated when read)
+    stats_connection_count = CounterField('connection_count')
+    stats_connection_rate = RateField('connection_count')
+    stats_predition_count = CounterField('prediction_count')
+    stats_precision_rate = RateField('prediction_count', 'connection_count')
+
+    # 3D object reference (kept in the render states table, see RenderField)
+    tree3d_initialized = RenderField('tree3d_initialized', False)
+    tree3d_line = RenderField('tree3d_line', None)
+    tree3d_selected = RenderField('tree3d_selected', False)
+
+    def __init__(self, states, id=None):
         """
         Initializes a new instance of this class.
         """
 
+        # Store which holds the states of this element and the index of this element in it.
+        # An id is only passed when the synapse states already exist in the store (i.e. they are updated in bulk).
+        self.states = states
+        if id is None:
+            id = states.allocate()
+        self.id = id
+
         # Index of this cell in the spatial pooler.
         self.index_sp = -1
 
         # Index of this synapse in the temporal pooler.
         self.index_tp = -1
 
+        # Segment which this synapse belongs to.
+        self.segment = None
+
         # An input element is a cell in case of the source be a column or then a bit in case of the source be a sensor.
         self.input_elem = None
 
-        # Permanence of this synapse.
-        self.permanence = MachineState(0.0, MAX_PREVIOUS_STEPS)
-
-        # States of this element
-        self.is_connected = MachineState(False, MAX_PREVIOUS_STEPS)
-        self.is_predicted = MachineState(False, MAX_PREVIOUS_STEPS)
-        self.is_falsely_predicted = MachineState(False, MAX_PREVIOUS_STEPS)
-        self.is_removed = MachineState(False, MAX_PREVIOUS_STEPS)
-
-        # Statistics
-        self.stats_connection_count = 0
-        self.stats_connection_rate = 0.0
-        self.stats_predition_count = 0
-        self.stats_precision_rate = 0.0
-
-        # 3D object reference
-        self.tree3d_initialized = False
-        self.tree3d_item_np = None
-        self.tree3d_selected = False
-
-    def nextStep(self):
+    def release(self):
         """
-        Perfoms actions related to time step progression.
+        Return the id of this synapse to its store.
         """
-
-        # Update states machine by remove the first element and add a new element in the end
-        self.permanence.rotate()
-        self.is_connected.rotate()
-        self.is_predicted.rotate()
-        self.is_falsely_predicted.rotate()
-        self.is_removed.rotate()
-
-    def calculateStatistics(self):
-        """
-        Calculate statistics after an iteration.
-        """
-
-        # Calculate statistics
-        if self.is_connected.atCurrStep():
-            self.stats_connection_count += 1
-        if self.is_predicted.atCurrStep():
-            self.stats_predition_count += 1
-        if Global.curr_step > 0:
-            self.stats_connection_rate = self.stats_connection_count / float(Global.curr_step)
-        if self.stats_connection_count > 0:
-            self.stats_precision_rate = self.stats_predition_count / float(self.stats_connection_count)
+        self.states.release(self.id)
@@ -1,10 +1,11 @@
-﻿from PyQt5 import QtGui, QtCore, QtWidgets
+﻿import os
 from nupic_studio.htm.network import Network
 from nupic_studio.htm.node import NodeType, Node
 from nupic_studio.htm.node_region import Region
 from nupic_studio.htm.node_sensor import Sensor, DataSourceType, PredictionsMethod
 from nupic_studio.htm.encoding import Encoding
 from nupic_studio.htm.link import Link
+from nupic_studio.htm.run_context import NetworkError, StatisticsLevel
 
 """
 Loads and saves the Elements of the .nuproj file, that contains user entries for project properties
@@ -68,16 +69,19 @@ class Project:
         try:
             project = eval(open(file_name, 'r').read())
         except:
-            QtWidgets.QMessageBox.warning(None, "Warning", "Cannot read the project file (" + file_name + ")!", QtWidgets.QMessageBox.Ok | QtWidgets.QMessageBox.Default, QtWidgets.QMessageBox.NoButton)
-            project = {}
+            raise NetworkError("Cannot read the project file (" + file_name + ")!")
 
         self.file_name = file_name
+        self.network.context.project_dir = os.path.dirname(file_name)
         self.name = project['name']
         self.author = project['author']
         self.description = project['description']
+        self.network.statistics_level = project.get('statistics_level', StatisticsLevel.FULL)
+        self.network.parallel = project.get('parallel', False)
         for node_dict in project['nodes']:
             node = self.readNode(node_dict)
             self.network.nodes.append(node)
+        self.network.invalidateIndexes()
         for link_dict in project['links']:
             link = self.readLink(link_dict)
             self.network.links.append(link)
@@ -134,6 +138,7 @@ class Project:
                 node.data_source_type = DataSourceType.DATABASE
                 node.database_connection_string = node_dict['database_connection_string']
                 node.database_table = node_dict['database_table']
+                node.database_batch_size = int(node_dict.get('database_batch_size', 256))
             node.predictions_method = node_dict['predictions_method']
             if node.predictions_method == PredictionsMethod.CLASSIFICATION:
                 node.enable_classification_learning = node_dict['enable_classification_learning']
@@ -167,19 +172,9 @@ class Project:
         out_node_name = link_dict['out_node']
         in_node_name = link_dict['in_node']
 
-        # Find output node instance
-        out_node = None
-        for node in self.network.nodes:
-            if node.name == out_node_name:
-                out_node = node
-                break
-
-        # Find input node instance
-        in_node = None
-        for node in self.network.nodes:
-            if node.name == in_node_name:
-                in_node = node
-                break
+        # Find output and input node instances
+        out_node = self.network.getNode(out_node_name)
+        in_node = self.network.getNode(in_node_name)
 
         # Create a link from parameters
         link = Link()
@@ -194,11 +189,14 @@ class Project:
         """
 
         self.file_name = file_name
+        self.network.context.project_dir = os.path.dirname(file_name)
 
         project = {}
         project['name'] = self.name
         project['author'] = self.author
         project['description'] = self.description
+        project['statistics_level'] = self.network.statistics_level
+        project['parallel'] = self.network.parallel
         project['nodes'] = []
         for node in self.network.nodes:
             node_dict = self.writeNode(node)
@@ -255,6 +253,7 @@ class Project:
                 node_dict['data_source_type'] = "Database"
                 node_dict['database_connection_string'] = node.database_connection_string
                 node_dict['database_table'] = node.database_table
+                node_dict['database_batch_size'] = str(node.database_batch_size)
             node_dict['predictions_method'] = node.predictions_method
             if node.predictions_method == PredictionsMethod.CLASSIFICATION:
                 node_dict['enable_classification_learning'] = str(node.enable_classification_learning)
@@ -0,0 +1,153 @@
+import os
+import sys
+import time
+import argparse
+from nupic_studio.htm.run_context import STATISTICS_LEVELS
+
+"""
+Runs projects without GUI (i.e. without Qt and Panda3D), so networks can be trained in servers with no display.
+Usage:
+    nupic-studio run project.nuproj --steps N [--output FILE] [--report-every K] [--fast] [--parallel] [--statistics LEVEL] [--show-plan]
+"""
+
+
+def runProject(file_name, num_steps, output, report_every=1, fast=False, parallel=False, statistics_level=None, show_plan=False):
+    """
+    Open a project and perform a given number of time steps on its network, writing progress and statistics in the
+    output stream.
+    If fast is True, only the reported steps update the elements and statistics of the network; the remaining ones
+    only compute the algorithms.
+    If parallel is True, the regions of each phase are computed in parallel worker processes whatever the project says.
+    If a statistics level is given, it replaces the one of the project.
+    If show_plan is True, the phases of the network are written with the time spent by their nodes in the last step.
+    """
+    from nupic_studio.project import Project
+    from nupic_studio.htm.run_context import NetworkError
+
+    # Open the project
+    project = Project()
+    try:
+        project.open(os.path.abspath(file_name))
+    except NetworkError as error:
+        output.write(str(error) + "\n")
+        return False
+    network = project.network
+    if parallel:
+        network.parallel = True
+    if statistics_level is not None:
+        network.statistics_level = statistics_level
+
+    # Worker processes of the regions are stopped even if the run fails
+    try:
+        return runNetwork(network, file_name, num_steps, output, report_every, fast, show_plan)
+    finally:
+        network.shutdown()
+
+
+def runNetwork(network, file_name, num_steps, output, report_every, fast, show_plan):
+    """
+    Initialize a network and perform a given number of time steps on it.
+    """
+    context = network.context
+
+    # Initialize the network
+    # Errors found during initialization are written in the output
+    context.on_error = lambda message: output.write(message + "\n")
+    start_time = time.time()
+    initialized = network.initialize()
+    end_time = time.time()
+    if not initialized:
+        output.write("Network of project '" + file_name + "' could not be initialized.\n")
+        return False
+    output.write("Initialization: " + "{0:.3f}".format(end_time - start_time) + " secs\n")
+    output.write("\n")
+    output.write("Step\tTime (secs)\tAccuracy (%)\n")
+
+    # Initialize time steps parameters
+    context.curr_step = 0
+
+    # Perform the time steps
+    run_start_time = time.time()
+    for step in range(num_steps):
+        if step > 0:
+            context.curr_step += 1
+
+        # Perfoms actions related to time step progression.
+        report = (step + 1) % report_every == 0 or step == num_steps - 1
+        start_time = time.time()
+        if fast and not report:
+            network.nextStep(fast=True)
+        else:
+            network.nextStep()
+            network.calculateStatistics()
+        end_time = time.time()
+        if report:
+            output.write(str(context.curr_step + 1) + "\t{0:.3f}".format(end_time - start_time) + "\t{0:.3f}".format(network.stats_precision_rate) + "\n")
+            output.flush()
+    run_end_time = time.time()
+
+    # Write a summary of the run
+    elapsed_time = run_end_time - run_start_time
+    output.write("\n")
+    output.write("Steps: " + str(num_steps) + "\n")
+    output.write("Total time: " + "{0:.3f}".format(elapsed_time) + " secs\n")
+    if elapsed_time > 0:
+        output.write("Throughput: " + "{0:.3f}".format(num_steps / elapsed_time) + " steps/sec\n")
+    output.write("Accuracy: " + "{0:.3f}".format(network.stats_precision_rate) + "\n")
+    if show_plan:
+        writePlan(network, output)
+    output.flush()
+
+    return True
+
+
+def writePlan(network, output):
+    """
+    Write the phases of a network and its critical path with the times spent in the last time step.
+    """
+    output.write("\n")
+    output.write("Phase\tTime (secs)\tNodes (secs)\n")
+    plan = network.getPlan()
+    for i in range(len(plan)):
+        nodes = ", ".join([name + " ({0:.3f})".format(cost) for name, cost in plan[i]['nodes']])
+        output.write(str(i + 1) + "\t{0:.3f}".format(plan[i]['time']) + "\t" + nodes + "\n")
+    path, cost = network.getCriticalPath()
+    output.write("Critical path: " + " -> ".join([node.name for node in path]) + " ({0:.3f} secs)".format(cost) + "\n")
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="nupic-studio", description="Runs NuPIC Studio projects without GUI.")
+    subparsers = parser.add_subparsers(dest="command")
+    run_parser = subparsers.add_parser("run", help="perform time steps on the network of a project")
+    run_parser.add_argument("project", help="project file (.nuproj)")
+    run_parser.add_argument("--steps", type=int, required=True, help="number of time steps to perform")
+    run_parser.add_argument("--output", help="file to write progress and statistics (default is stdout)")
+    run_parser.add_argument("--report-every", type=int, default=1, help="number of time steps between progress lines")
+    run_parser.add_argument("--fast", action="store_true", help="update elements and statistics only in the reported time steps")
+    run_parser.add_argument("--parallel", action="store_true", help="compute the regions of each phase in parallel processes")
+    run_parser.add_argument("--statistics", choices=STATISTICS_LEVELS, help="finest elements whose statistics are calculated (default is the project's level)")
+    run_parser.add_argument("--show-plan", action="store_true", help="write the phases and the critical path of the network at the end")
+    args = parser.parse_args(args)
+
+    if args.command != "run":
+        parser.print_help()
+        return 2
+    if args.steps < 1 or args.report_every < 1:
+        parser.error("number of steps and report interval must be positive")
+
+    # Write to the given file or to stdout
+    if args.output:
+        output = open(args.output, 'w')
+    else:
+        output = sys.stdout
+    try:
+        succeeded = runProject(args.project, args.steps, output, args.report_every, args.fast, args.parallel, args.statistics, args.show_plan)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    return 0 if succeeded else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,12 @@
 import os
+import math
 import time
 import shutil
 import psutil
 import socket
 import platform
 import pymemcache
+import numpy
 from direct.showbase.ShowBase import ShowBase
 from direct.task import Task
 from panda3d.core import AmbientLight
@@ -20,22 +22,44 @@ from panda3d.core import TextNode
 from panda3d.core import BamCache
 from panda3d.core import GraphicsOutput, Texture, Vec3
 from panda3d.core import LineSegs
-from panda3d.core import TextureStage
-from panda3d.core import TexGenAttrib
-from panda3d.bullet import BulletWorld
-from panda3d.bullet import BulletPlaneShape
-from panda3d.bullet import BulletBoxShape
-from panda3d.bullet import BulletTriangleMesh
-from panda3d.bullet import BulletTriangleMeshShape
-from panda3d.bullet import BulletSphereShape
-from panda3d.bullet import BulletCylinderShape
-from panda3d.bullet import BulletRigidBodyNode
-from panda3d.bullet import BulletDebugNode
+from panda3d.core import Shader
+from panda3d.core import GeomEnums
+from panda3d.core import OmniBoundingVolume
+from panda3d.core import Geom, GeomNode, GeomLines, InternalName
+from panda3d.core import GeomVertexArrayFormat, GeomVertexFormat, GeomVertexData, GeomVertexArrayData
 from nupic_studio import REPO_DIR
-from nupic_studio.util import createAxesCross, Color3D, Texture3D
+from nupic_studio.util import createAxesCross, Color3D
 
 VIEW_RADIUS = 1000
 
+# Shaders used to draw elements as instances of the same geometry.
+# The position (xyz), the scale (w) and the color of each instance are fetched from a buffer texture.
+INSTANCE_VERTEX_SHADER = """
+#version 140
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform samplerBuffer instance_data;
+in vec4 p3d_Vertex;
+in vec3 p3d_Normal;
+out vec4 instance_color;
+out vec3 normal;
+void main() {
+    vec4 offset = texelFetch(instance_data, gl_InstanceID * 2);
+    instance_color = texelFetch(instance_data, gl_InstanceID * 2 + 1);
+    normal = p3d_Normal;
+    gl_Position = p3d_ModelViewProjectionMatrix * vec4(p3d_Vertex.xyz * offset.w + offset.xyz, 1);
+}
+"""
+INSTANCE_FRAGMENT_SHADER = """
+#version 140
+in vec4 instance_color;
+in vec3 normal;
+out vec4 p3d_FragColor;
+void main() {
+    float light = 0.4 + 0.6 * abs(dot(normalize(normal), normalize(vec3(0.3, -1.0, 0.5))));
+    p3d_FragColor = vec4(clamp(instance_color.rgb, 0.0, 1.0) * light, 1);
+}
+"""
+
 # Redirect output to log file
 # TODO: When implement project uncomment
 #log_file = os.path.join(REPO_DIR, "output.log")
@@ -50,6 +74,452 @@ cache = BamCache.get_global_ptr()
 cache.set_active(False)
 
 
+class InstancedElements(object):
+    """
+    Elements of the same type (like all cells) drawn as instances of a single geometry in a single draw call.
+    Positions and colors of the instances are kept in an array which is written to a buffer texture once per frame,
+    so changing the state of an element is only a buffer update instead of a scene node of its own.
+    """
+
+    def __init__(self, simulation, name, model_file, capacity=1024):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Geometry shared by all instances
+        model_np = simulation.loader.loadModel(Filename.from_os_specific(os.path.join(REPO_DIR, "models", model_file)))
+        model_np.flattenStrong()
+        min_point, max_point = model_np.getTightBounds()
+        self.radius = max(max_point - min_point) / 2.0
+        self.geom_np = model_np.find("**/+GeomNode")
+        self.geom_np.reparentTo(simulation.render)
+        self.geom_np.setName(name)
+
+        # Instances are moved by the shader, so the geometry can not be culled by its own bounds
+        self.geom_np.node().setBounds(OmniBoundingVolume())
+        self.geom_np.node().setFinal(True)
+
+        # Position and scale (1st row) and color (2nd row) of each instance
+        self.data = numpy.zeros((capacity * 2, 4), dtype=numpy.float32)
+        self.count = 0
+
+        # Buffer texture read by the shader
+        self.texture = Texture(name + "_data")
+        self.texture.setupBufferTexture(capacity * 2, Texture.T_float, Texture.F_rgba32, GeomEnums.UH_dynamic)
+        self.geom_np.setShader(Shader.make(Shader.SL_GLSL, INSTANCE_VERTEX_SHADER, INSTANCE_FRAGMENT_SHADER))
+        self.geom_np.setShaderInput("instance_data", self.texture)
+        self.geom_np.setInstanceCount(0)
+
+        # Whether the data was changed since it was written to the texture
+        self.dirty = False
+
+    def add(self, position, color=Color3D.GRAY):
+        """
+        Add an instance at a given position and return its index.
+        """
+
+        # Double the capacity when it is full
+        if self.count * 2 >= len(self.data):
+            self.data = numpy.concatenate((self.data, numpy.zeros_like(self.data)))
+            self.texture.setupBufferTexture(len(self.data), Texture.T_float, Texture.F_rgba32, GeomEnums.UH_dynamic)
+
+        idx = self.count
+        self.count += 1
+        self.data[idx * 2] = (position[0], position[1], position[2], 1.0)
+        self.data[idx * 2 + 1] = color
+        self.geom_np.setInstanceCount(self.count)
+        self.dirty = True
+        return idx
+
+    def setColor(self, idx, color):
+        """
+        Change the color of an instance.
+        """
+        self.data[idx * 2 + 1] = color
+        self.dirty = True
+
+    def setVisible(self, idx, visible):
+        """
+        Show or hide an instance (hidden instances are scaled to nothing).
+        """
+        self.data[idx * 2, 3] = 1.0 if visible else 0.0
+        self.dirty = True
+
+    def isVisible(self, idx):
+        """
+        Return whether an instance is shown.
+        """
+        return self.data[idx * 2, 3] > 0.0
+
+    def getPosition(self, idx):
+        """
+        Return the position of an instance.
+        """
+        return tuple(self.data[idx * 2, :3])
+
+    def flush(self):
+        """
+        Write the changes of the instances to the buffer texture.
+        """
+        if self.dirty:
+            self.texture.setRamImage(self.data.tobytes())
+            self.dirty = False
+
+    def clear(self):
+        """
+        Remove all instances.
+        """
+        self.count = 0
+        self.geom_np.setInstanceCount(0)
+        self.dirty = True
+
+
+class LineElements(object):
+    """
+    Elements of the same type (like all synapses) drawn as lines of a single geometry in a single draw call.
+    End points and colors of the lines are kept in arrays which are written to the vertex data once per frame, and the
+    primitive only indexes the visible lines, so showing thousands of synapses does not create a scene node each one.
+    """
+
+    def __init__(self, simulation, name, thickness=1, radius=0.5, capacity=1024):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Name of the lines and their radius (in world units) when they are picked.
+        self.name = name
+        self.radius = radius
+
+        # Positions and colors are kept in separated arrays of the vertex data, so each one is copied at once
+        position_format = GeomVertexArrayFormat()
+        position_format.addColumn(InternalName.getVertex(), 3, Geom.NT_float32, Geom.C_point)
+        color_format = GeomVertexArrayFormat()
+        color_format.addColumn(InternalName.getColor(), 4, Geom.NT_float32, Geom.C_color)
+        vertex_format = GeomVertexFormat()
+        vertex_format.addArray(position_format)
+        vertex_format.addArray(color_format)
+        self.vertex_data = GeomVertexData(name, GeomVertexFormat.registerFormat(vertex_format), Geom.UH_dynamic)
+
+        # Primitive with the indexes of the vertices of the visible lines
+        self.lines = GeomLines(Geom.UH_dynamic)
+        self.lines.setIndexType(Geom.NT_uint32)
+        geom = Geom(self.vertex_data)
+        geom.addPrimitive(self.lines)
+        geom_node = GeomNode(name)
+        geom_node.addGeom(geom)
+        self.geom_np = simulation.render.attachNewNode(geom_node)
+        self.geom_np.setRenderModeThickness(thickness)
+        self.geom_np.setLightOff()
+
+        # Lines are moved without recomputing the bounds, so the geometry can not be culled by them
+        geom_node.setBounds(OmniBoundingVolume())
+        geom_node.setFinal(True)
+
+        # Start and end positions (2 rows) and colors (2 rows) of each line
+        self.positions = numpy.zeros((capacity * 2, 3), dtype=numpy.float32)
+        self.colors = numpy.zeros((capacity * 2, 4), dtype=numpy.float32)
+        self.visible = numpy.zeros(capacity, dtype=numpy.bool_)
+        self.count = 0
+
+        # Indexes of removed lines which can be reused.
+        self.free_ids = []
+
+        # Whether the arrays were changed since they were written to the geometry
+        self.dirty = False
+
+    def add(self, start, end, color=Color3D.GRAY):
+        """
+        Add a visible line between two positions and return its index, reusing the index of a removed line if possible.
+        """
+        if len(self.free_ids) > 0:
+            idx = self.free_ids.pop()
+        else:
+            # Double the capacity when it is full
+            if self.count >= len(self.visible):
+                self.positions = numpy.concatenate((self.positions, numpy.zeros_like(self.positions)))
+                self.colors = numpy.concatenate((self.colors, numpy.zeros_like(self.colors)))
+                self.visible = numpy.concatenate((self.visible, numpy.zeros_like(self.visible)))
+            idx = self.count
+            self.count += 1
+
+        self.positions[idx * 2] = start
+        self.positions[idx * 2 + 1] = end
+        self.colors[idx * 2:idx * 2 + 2] = color
+        self.visible[idx] = True
+        self.dirty = True
+        return idx
+
+    def remove(self, idx):
+        """
+        Hide a line and return its index to be reused.
+        """
+        self.visible[idx] = False
+        self.free_ids.append(idx)
+        self.dirty = True
+
+    def setColor(self, idx, color):
+        """
+        Change the color of a line.
+        """
+        self.colors[idx * 2:idx * 2 + 2] = color
+        self.dirty = True
+
+    def setVisible(self, idx, visible):
+        """
+        Show or hide a line (hidden lines are left out of the primitive).
+        """
+        self.visible[idx] = visible
+        self.dirty = True
+
+    def isVisible(self, idx):
+        """
+        Return whether a line is shown.
+        """
+        return bool(self.visible[idx])
+
+    def flush(self):
+        """
+        Write the changes of the lines to the vertex data and index the visible ones.
+        """
+        if not self.dirty:
+            return
+        self.dirty = False
+
+        self.vertex_data.modifyArrayHandle(0).copyDataFrom(self.positions)
+        self.vertex_data.modifyArrayHandle(1).copyDataFrom(self.colors)
+
+        # Each visible line is indexed by its start and end vertices
+        line_ids = numpy.nonzero(self.visible[:self.count])[0].astype(numpy.uint32)
+        if len(line_ids) == 0:
+            self.lines.clearVertices()
+            return
+        indexes = numpy.empty(len(line_ids) * 2, dtype=numpy.uint32)
+        indexes[0::2] = line_ids * 2
+        indexes[1::2] = line_ids * 2 + 1
+        index_array = GeomVertexArrayData(self.lines.getIndexFormat(), Geom.UH_dynamic)
+        index_array.modifyHandle().copyDataFrom(indexes)
+        self.lines.setVertices(index_array)
+
+    def clear(self):
+        """
+        Remove all lines.
+        """
+        self.count = 0
+        self.free_ids = []
+        self.visible[:] = False
+        self.dirty = True
+
+
+class ElementPicker(object):
+    """
+    Spatial index over the positions of the elements, used to find the element under the mouse.
+    A ray is walked through the cells of a uniform grid and only the elements of the crossed cells are tested, instead
+    of keeping a collision mesh for each element in a physics world. Elements are spheres (like bits and cells) or lines
+    with a thickness (like segments and synapses).
+    """
+
+    def __init__(self, cell_size=5.0):
+        """
+        Initializes a new instance of this class.
+        """
+
+        # Size of the cells of the grid.
+        self.cell_size = float(cell_size)
+
+        # Elements which overlap each cell of the grid, given as tuples (name, start, end, radius, elements, index).
+        # A sphere is given as a line whose start and end are the same.
+        self.grid = {}
+
+        # Entry of each element and the cells where it was put, indexed by the element name.
+        self.entries = {}
+
+        # Lowest and highest cells of the grid which have elements.
+        self.min_cell = None
+        self.max_cell = None
+
+    def getGridCell(self, position):
+        """
+        Return the cell of the grid which contains a position.
+        """
+        return tuple(int(math.floor(position[i] / self.cell_size)) for i in range(3))
+
+    def add(self, name, position, radius, instances=None, idx=None):
+        """
+        Add an element given by its bounding sphere. If it is an instance, it is only picked while it is visible.
+        """
+        self.addLine(name, position, position, radius, instances, idx)
+
+    def addLine(self, name, start, end, radius, lines=None, idx=None):
+        """
+        Add an element given by a line with a thickness (i.e. the capsule around the line). If it is one of a group of
+        line elements, it is only picked while it is visible. An element with the same name is replaced.
+        """
+        self.remove(name)
+        entry = (name, tuple(start), tuple(end), radius, lines, idx)
+
+        # The element is put in every cell which its capsule overlaps
+        # The line is walked in steps no longer than half a cell, so a long line is only put in the cells around it
+        # instead of in every cell of its bounding box
+        length = math.sqrt(sum((end[i] - start[i]) * (end[i] - start[i]) for i in range(3)))
+        num_steps = max(int(math.ceil(length / (self.cell_size * 0.5))), 1)
+        margin = radius + (length / num_steps) * 0.5
+        cells = set()
+        for n in range(num_steps + 1):
+            point = [start[i] + ((end[i] - start[i]) * n / float(num_steps)) for i in range(3)]
+            low = self.getGridCell([point[i] - margin for i in range(3)])
+            high = self.getGridCell([point[i] + margin for i in range(3)])
+            for i in range(low[0], high[0] + 1):
+                for j in range(low[1], high[1] + 1):
+                    for k in range(low[2], high[2] + 1):
+                        cells.add((i, j, k))
+        for cell in cells:
+            self.grid.setdefault(cell, []).append(entry)
+        self.entries[name] = (entry, cells)
+
+        low = tuple(min(cell[i] for cell in cells) for i in range(3))
+        high = tuple(max(cell[i] for cell in cells) for i in range(3))
+        if self.min_cell is None:
+            self.min_cell = low
+            self.max_cell = high
+        else:
+            self.min_cell = tuple(min(self.min_cell[i], low[i]) for i in range(3))
+            self.max_cell = tuple(max(self.max_cell[i], high[i]) for i in range(3))
+
+    def remove(self, name):
+        """
+        Remove an element (like a line which is going to be reused by other element).
+        """
+        item = self.entries.pop(name, None)
+        if item is None:
+            return
+        entry, cells = item
+        for cell in cells:
+            self.grid[cell].remove(entry)
+
+    def intersectSphere(self, origin, direction, position, radius):
+        """
+        Return the fraction of the ray where it enters a sphere or None if it misses the sphere.
+        """
+        diff = [origin[i] - position[i] for i in range(3)]
+        a = sum(direction[i] * direction[i] for i in range(3))
+        b = 2.0 * sum(direction[i] * diff[i] for i in range(3))
+        c = sum(diff[i] * diff[i] for i in range(3)) - (radius * radius)
+        discriminant = (b * b) - (4.0 * a * c)
+        if a == 0 or discriminant < 0:
+            return None
+        root = math.sqrt(discriminant)
+        t = (-b - root) / (2.0 * a)
+        if t < 0:
+            t = (-b + root) / (2.0 * a)
+        if t < 0:
+            return None
+        return t
+
+    def intersectLine(self, origin, direction, start, end, radius):
+        """
+        Return the fraction of the ray where it passes closest to a line with a thickness or None if it misses it.
+        """
+        edge = [end[i] - start[i] for i in range(3)]
+        diff = [origin[i] - start[i] for i in range(3)]
+        a = float(sum(direction[i] * direction[i] for i in range(3)))
+        b = float(sum(direction[i] * edge[i] for i in range(3)))
+        c = float(sum(direction[i] * diff[i] for i in range(3)))
+        e = float(sum(edge[i] * edge[i] for i in range(3)))
+        f = float(sum(edge[i] * diff[i] for i in range(3)))
+        if a == 0 or e == 0:
+            return None
+
+        # Find the closest points between the ray and the line (t along the ray and s along the line), clamping them to
+        # their ends
+        denominator = (a * e) - (b * b)
+        t = 0.0
+        if denominator > 1e-12:
+            t = min(max(((b * f) - (c * e)) / denominator, 0.0), 1.0)
+        s = ((b * t) + f) / e
+        if s < 0.0:
+            s = 0.0
+            t = min(max(-c / a, 0.0), 1.0)
+        elif s > 1.0:
+            s = 1.0
+            t = min(max((b - c) / a, 0.0), 1.0)
+
+        # The line is hit if the distance between the closest points is within its thickness
+        distance = [(origin[i] + (direction[i] * t)) - (start[i] + (edge[i] * s)) for i in range(3)]
+        if sum(distance[i] * distance[i] for i in range(3)) > radius * radius:
+            return None
+        return t
+
+    def pick(self, p_from, p_to):
+        """
+        Return the name and the position of the closest visible element hit by the ray from p_from to p_to,
+        or (None, None) if nothing is hit.
+        """
+        if self.min_cell is None:
+            return None, None
+        direction = [p_to[i] - p_from[i] for i in range(3)]
+
+        # Clip the ray to the bounds of the grid
+        t_enter = 0.0
+        t_exit = 1.0
+        for i in range(3):
+            box_min = self.min_cell[i] * self.cell_size
+            box_max = (self.max_cell[i] + 1) * self.cell_size
+            if direction[i] == 0:
+                if p_from[i] < box_min or p_from[i] > box_max:
+                    return None, None
+            else:
+                t0 = (box_min - p_from[i]) / direction[i]
+                t1 = (box_max - p_from[i]) / direction[i]
+                t_enter = max(t_enter, min(t0, t1))
+                t_exit = min(t_exit, max(t0, t1))
+        if t_enter > t_exit:
+            return None, None
+
+        # Prepare the walk through the cells crossed by the ray, starting from the cell where it enters the grid
+        start = [p_from[i] + (direction[i] * t_enter) for i in range(3)]
+        cell = list(self.getGridCell(start))
+        step = [0, 0, 0]
+        t_max = [float('inf')] * 3
+        t_delta = [float('inf')] * 3
+        for i in range(3):
+            cell[i] = min(max(cell[i], self.min_cell[i]), self.max_cell[i])
+            if direction[i] > 0:
+                step[i] = 1
+                t_max[i] = (((cell[i] + 1) * self.cell_size) - p_from[i]) / direction[i]
+                t_delta[i] = self.cell_size / direction[i]
+            elif direction[i] < 0:
+                step[i] = -1
+                t_max[i] = ((cell[i] * self.cell_size) - p_from[i]) / direction[i]
+                t_delta[i] = -self.cell_size / direction[i]
+
+        best_entry = None
+        best_t = float('inf')
+        while True:
+            for entry in self.grid.get(tuple(cell), []):
+                name, start, end, radius, elements, idx = entry
+                if elements is not None and not elements.isVisible(idx):
+                    continue
+                if start == end:
+                    t = self.intersectSphere(p_from, direction, start, radius)
+                else:
+                    t = self.intersectLine(p_from, direction, start, end, radius)
+                if t is not None and t < best_t:
+                    best_entry = entry
+                    best_t = t
+
+            # Move to the next cell crossed by the ray, stopping when an element closer than it was already hit
+            axis = t_max.index(min(t_max))
+            if t_max[axis] > t_exit or best_t <= t_max[axis]:
+                break
+            cell[axis] += step[axis]
+            t_max[axis] += t_delta[axis]
+
+        if best_entry is None:
+            return None, None
+        hit_pos = Point3(*[p_from[i] + (direction[i] * best_t) for i in range(3)])
+        return best_entry[0], hit_pos
+
+
 class Simulation(ShowBase):
 
     def __init__(self, project, project_path):
@@ -71,8 +541,6 @@ class Simulation(ShowBase):
         self.project_path = project_path
         self.last_bit_idx = 0
         self.last_cell_idx = 0
-        self.last_segment_idx = 0
-        self.last_synapse_idx = 0
 
         # Clear the record folder
         # TODO: When implement project uncomment
@@ -84,11 +552,6 @@ class Simulation(ShowBase):
         #else:
         #    self.record_dir = None
 
-        # Enable physics
-        print("Enabling physics...")
-        self.physics_manager = BulletWorld()
-        self.physics_manager.setGravity((0, 0, 0))
-
         # Allow AI entities as much time as they need to think
         self.frame_rate = 60
         print("Configuring frame rate (" + str(self.frame_rate) + ")...")
@@ -97,14 +560,6 @@ class Simulation(ShowBase):
         globalClock.setFrameRate(self.frame_rate)
         globalClock.reset()
 
-        # Turn on debug wireframes for every object in this simulation
-        print("Enabling debug...")
-        self.debug_senses_nps = []
-        debug_node = BulletDebugNode("Debug")
-        self.debug_np = self.render.attachNewNode(debug_node)
-        self.physics_manager.setDebugNode(self.debug_np.node())
-        #self.debug_np.show()
-
         # Necessary for scene visualization
         self.mouse_feature = ""
         self.start_mouse_work_fn = None
@@ -135,15 +590,6 @@ class Simulation(ShowBase):
         #    self.memcached_client = pymemcache.client.base.Client((ip, port))
         #    print("Sharing objects in " + ip + ":" + str(port) + " ...")
 
-        # Load the color textures
-        print("Loading textures...")
-        Texture3D.RED = self.loader.loadTexture(Filename.from_os_specific(os.path.join(REPO_DIR, "models", "tex_red.png")))
-        Texture3D.YELLOW = self.loader.loadTexture(Filename.from_os_specific(os.path.join(REPO_DIR, "models", "tex_yellow.png")))
-        Texture3D.GREEN_YELLOW = self.loader.loadTexture(Filename.from_os_specific(os.path.join(REPO_DIR, "models", "tex_green_yellow.png")))
-        Texture3D.Green = self.loader.loadTexture(Filename.from_os_specific(os.path.join(REPO_DIR, "models", "tex_green.png")))
-        Texture3D.BLUE = self.loader.loadTexture(Filename.from_os_specific(os.path.join(REPO_DIR, "models", "tex_blue.png")))
-        Texture3D.GRAY = self.loader.loadTexture(Filename.from_os_specific(os.path.join(REPO_DIR, "models", "tex_gray.png")))
-
         print("Adjusting lights...")
         directional_light_1 = DirectionalLight('directional_light_1')
         directional_light_1.setColor(Color3D.WHITE)
@@ -156,6 +602,18 @@ class Simulation(ShowBase):
         self.directional_light_2_np.setHpr(20, -20, 0)
         self.render.setLight(self.directional_light_2_np)
 
+        # Cells and bits are too many to have a scene node each one, so they are drawn as instances
+        print("Creating instanced elements...")
+        self.cell_instances = InstancedElements(self, "cells", "sphere.dae")
+        self.bit_instances = InstancedElements(self, "bits", "box.dae")
+
+        # Segments and synapses are drawn as lines batched into a single geometry each type
+        self.segment_lines = LineElements(self, "segments", 3, 1.0)
+        self.synapse_lines = LineElements(self, "synapses", 1, 0.5)
+
+        # Index of the positions of the elements used to pick them with the mouse
+        self.picker = ElementPicker()
+
         # Adjust the scene elements
         print("Adjusting camera position...")
         self.disable_mouse()
@@ -210,8 +668,10 @@ class Simulation(ShowBase):
         # Don't update if simulating is stopping! Risk of null objects raise exceptions.
         if self.is_simulating:
             self.updateCamera()
-            time_per_frame = self.getTimePerFrame()
-            self.physics_manager.doPhysics(time_per_frame)
+            self.cell_instances.flush()
+            self.bit_instances.flush()
+            self.segment_lines.flush()
+            self.synapse_lines.flush()
         return Task.cont
 
     def getIp(self):
@@ -311,7 +771,7 @@ class Simulation(ShowBase):
             touched_object_text = ""
             touched_pos_text = ""
             if self.touched_object is not None:
-                touched_object_text = "Name: " + self.touched_object.getParent(0).getName()
+                touched_object_text = "Name: " + self.touched_object
             if self.touched_pos is not None:
                 touched_pos_text = "XYZ: ({:d}, {:d}, {:d})".format(int(self.touched_pos[0]), int(self.touched_pos[1]), int(self.touched_pos[2]))
             self.touched_object_np.node().setText(touched_object_text)
@@ -326,11 +786,7 @@ class Simulation(ShowBase):
         p_to = self.render.getRelativePoint(self.cam, p_to)
 
         # Get the target coordinates which correspond to mouse coordinates and walk the camera to this direction
-        result = self.physics_manager.rayTestClosest(p_from, p_to)
-        if result.hasHit():
-            return result.getNode(), result.getHitPos()
-        else:
-            return None, None
+        return self.picker.pick(p_from, p_to)
 
     def createScreenWidgets(self):
 
@@ -406,75 +862,38 @@ class Simulation(ShowBase):
         self.touched_object_np.hide()
         self.touched_pos_np.hide()
 
-    def createElement(self, name, type, start, end=None):
-        if type == "cell":
-            model_file = "sphere.dae"
-        elif type == "bit":
-            model_file = "box.dae"
-        elif type == "segment" or type == "synapse":
-            model_file = "cylinder.dae"
-
-        # Create the rigid body
-        body_node = BulletRigidBodyNode(name)
-        body_node.setDeactivationEnabled(False)
-        body_np = self.render.attachNewNode(body_node)
-        body_np.setName(name)
-
-        if type == "segment" or type == "synapse":
-            # Calculate the linear distance between the start and the end position of the segment.
-            length = (Point3(start) - Point3(end)).length()
-
-            body_np.setPos(start)
-            body_np.lookAt(end)
-            body_np.setScale(1, length/2, 1)
-        else:
-            body_np.setPos(start)
-
-        # Load the 3d model file using the asset folder relative path and attach the geom node to rigid body
-        object_np = self.loader.loadModel(Filename.from_os_specific(os.path.join(REPO_DIR, "models", model_file)))
-        object_np.reparentTo(body_np)
-        object_np.setPosHpr((0, 0, 0), (0, 0, 0))
-        object_np.setName(name + "_geom")
-        object_np.setTexGen(TextureStage.getDefault(), TexGenAttrib.MWorldPosition)
-
-        # Apply any transforms from modelling sotware to gain performance
-        object_np.flattenStrong()
-
-        # Create the shape used for collisions
-        geom_nodes = object_np.findAllMatches("**/+GeomNode")
-        mesh = BulletTriangleMesh()
-        for geom in geom_nodes[0].node().getGeoms():
-            mesh.addGeom(geom)
-        shape = BulletTriangleMeshShape(mesh, dynamic=True)
-        body_node.addShape(shape)
-
-        self.physics_manager.attachRigidBody(body_node)
-        return body_np
-
     def createBit(self, position):
         name = "bit_" + str(self.last_bit_idx)
         self.last_bit_idx += 1
-        return self.createElement(name, "bit", position)
+        idx = self.bit_instances.add(position)
+        self.picker.add(name, position, self.bit_instances.radius, self.bit_instances, idx)
+        return idx
 
     def createCell(self, position):
         name = "cell_" + str(self.last_cell_idx)
         self.last_cell_idx += 1
-        return self.createElement(name, "cell", position)
+        idx = self.cell_instances.add(position)
+        self.picker.add(name, position, self.cell_instances.radius, self.cell_instances, idx)
+        return idx
 
     def createSegment(self, start, end):
-        name = "segment_" + str(self.last_segment_idx)
-        self.last_segment_idx += 1
-        return self.createElement(name, "segment", start, end)
+        return self.createLine(self.segment_lines, start, end)
 
     def createSynapse(self, start, end):
-        name = "synapse_" + str(self.last_synapse_idx)
-        self.last_synapse_idx += 1
-        return self.createElement(name, "synapse", start, end)
-
-    def removeElement(self, element_np):
-        if len(element_np.children) > 0:
-            geo_np = element_np.children[0]
-            geo_np.detachNode()
-            del geo_np
-        element_np.detachNode()
-        del element_np
+        return self.createLine(self.synapse_lines, start, end)
+
+    def createLine(self, lines, start, end):
+        # The name of a line is given by its index, which is reused once the line is removed
+        idx = lines.add(start, end)
+        self.picker.addLine(lines.name + "_" + str(idx), start, end, lines.radius, lines, idx)
+        return idx
+
+    def removeSegment(self, idx):
+        self.removeLine(self.segment_lines, idx)
+
+    def removeSynapse(self, idx):
+        self.removeLine(self.synapse_lines, idx)
+
+    def removeLine(self, lines, idx):
+        self.picker.remove(lines.name + "_" + str(idx))
+        lines.remove(idx)
@@ -56,3 +56,52 @@ class Global:
     sel_step = 0
     time_steps_predictions_chart = None
     project = None
+
+
+class ArrayTableModel(QtGui.QStandardItemModel):
+
+    def __init__(self, flags):
+        QtGui.QStandardItemModel.__init__(self)
+
+        self.flags = flags
+        self.header = []
+        self.data = []
+
+    def update(self, header, data):
+        self.header = header
+        self.data = data
+
+        num_cols = len(self.header)
+        self.setColumnCount(num_cols)
+        num_rows = len(self.data)
+        self.setRowCount(num_rows)
+
+        for col in range(num_cols):
+            self.setHeaderData(col, QtCore.Qt.Horizontal, self.header[col])
+
+        for row in range(num_rows):
+            for col in range(num_cols):
+                value = self.data[row][col]
+                self.setData(self.index(row, col, QtCore.QModelIndex()), value)
+
+    def setData(self, index, value, role=None):
+        self.data[index.row()][index.column()] = value
+        self.dataChanged.emit(index, index)
+        return True
+
+    def data(self, index, role=None):
+        column, row = index.column(), index.row()
+        if role == QtCore.Qt.TextAlignmentRole:
+            return QtCore.Qt.AlignRight
+        elif role == QtCore.Qt.DisplayRole:
+            return self.data[row][column]
+        return
+
+    def columnCount(self, parent=None, **kwargs):
+        return len(self.header)
+
+    def rowCount(self, parent=None, **kwargs):
+        return len(self.data)
+
+    def flags(self, index):
+        return self.flags
@@ -259,7 +259,7 @@ class DesignPanel(QtWidgets.QWidget):
         """
 
         # See if the point is under this node.
-        if node.tree2d_polygon.boundingRect().contains(mouse_point):
+        if node.tree2d_polygon is not None and node.tree2d_polygon.boundingRect().contains(mouse_point):
             return node
 
         # See if the point is under a node in the subtree.
@@ -3,15 +3,17 @@ import os
 import time
 import webbrowser
 from PyQt5 import QtGui, QtCore, QtWidgets
-from nupic_studio import __version__, REPO_DIR, MachineState
+from nupic_studio import __version__, REPO_DIR
 from nupic_studio.simulation import Simulation
-from nupic_studio.htm import MAX_PREVIOUS_STEPS, MAX_PREVIOUS_STEPS_WITH_INFERENCE
+from nupic_studio.htm import MAX_PREVIOUS_STEPS
+from nupic_studio.htm.run_context import NetworkError
 from nupic_studio.ui import ICON, Global, State, DEFAULT_CONFIGURATION
 from nupic_studio.ui.architecture_window import ArchitectureWindow
 from nupic_studio.ui.node_information_window import NodeInformationWindow
 from nupic_studio.ui.simulation_window import SimulationWindow
 from nupic_studio.ui.output_window import OutputWindow
 from nupic_studio.ui.project_properties_window import ProjectPropertiesWindow
+from nupic_studio.ui.simulation_worker import SimulationWorker
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -25,7 +27,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.paused = False
         self.simulation = None
         self.pending_project_changes = False
-        self.num_steps_pending = 0
+        self.worker = None
+        self.snapshot = None
         self.loadConfig()
         self.initUI()
 
@@ -169,6 +172,13 @@ class MainWindow(QtWidgets.QMainWindow):
         self.button_multiple_steps.setToolTip("Forward a specific number of time steps")
         self.button_multiple_steps.triggered.connect(self.buttonMultipleSteps_click)
 
+        # button_fast_forward
+        self.button_fast_forward = QtWidgets.QAction(self)
+        self.button_fast_forward.setEnabled(False)
+        self.button_fast_forward.setText("Fast-forward")
+        self.button_fast_forward.setToolTip("Forward a specific number of time steps updating the elements only in the last one")
+        self.button_fast_forward.triggered.connect(self.buttonFastForward_click)
+
         # button_stop
         self.button_stop = QtWidgets.QAction(self)
         self.button_stop.setEnabled(False)
@@ -196,6 +206,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.tool_bar.addAction(self.button_init)
         self.tool_bar.addAction(self.button_step)
         self.tool_bar.addAction(self.button_multiple_steps)
+        self.tool_bar.addAction(self.button_fast_forward)
         self.tool_bar.addAction(self.button_stop)
         self.tool_bar.addWidget(self.text_box_step)
         self.tool_bar.addWidget(self.slider_step)
@@ -284,6 +295,7 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         self.button_step.setEnabled(enable)
         self.button_multiple_steps.setEnabled(enable)
+        self.button_fast_forward.setEnabled(enable)
         self.button_stop.setEnabled(enable)
 
     def clearControls(self):
@@ -394,7 +406,11 @@ class MainWindow(QtWidgets.QMainWindow):
             # If file exists, continue operation
             if selected_file != '':
                 # Open the selected project
-                Global.project.open(selected_file)
+                try:
+                    Global.project.open(selected_file)
+                except NetworkError as error:
+                    QtWidgets.QMessageBox.warning(self, "Warning", str(error))
+                    return False
 
                 # Initialize project state
                 self.setWindowTitle(Global.project.name + " - [" + Global.project.file_name + "] - NuPIC Studio")
@@ -435,6 +451,14 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def stopSimulation(self):
 
+        # Wait the steps in background
+        if self.isWorkerRunning():
+            self.worker.stop()
+            self.worker.wait()
+
+        # Stop the worker processes of the regions (if any)
+        Global.project.network.shutdown()
+
         # Destroy everything
         destroy_world = True if self.state == State.SIMULATING else False
         self.state = State.STOPPED
@@ -503,6 +527,7 @@ class MainWindow(QtWidgets.QMainWindow):
         # Initialize the network starting from top region.
         start_time = time.time()
         end_time = time.time()
+        Global.project.network.context.on_error = self.showNetworkError
         initialized = Global.project.network.initialize()
 
         if initialized:
@@ -513,9 +538,7 @@ class MainWindow(QtWidgets.QMainWindow):
             self.simulation = Simulation(None, None)
 
             # Initialize time steps parameters
-            Global.curr_step = 0
             Global.sel_step = 0
-            Global.time_steps_predictions_chart = MachineState(0, MAX_PREVIOUS_STEPS_WITH_INFERENCE)
 
             self.output_window.addText("Initialization: " + "{0:.3f}".format(end_time - start_time) + " secs")
             self.output_window.addText("")
@@ -526,7 +549,8 @@ class MainWindow(QtWidgets.QMainWindow):
             Global.project.network.nextStep()
             Global.project.network.calculateStatistics()
             end_time = time.time()
-            self.output_window.addText(str(Global.curr_step + 1) + "\t{0:.3f}".format(end_time - start_time) + "\t{0:.3f}".format(Global.project.network.stats_precision_rate))
+            self.showSnapshot(self.takeSnapshot())
+            self.output_window.addText(str(self.snapshot.step + 1) + "\t{0:.3f}".format(end_time - start_time) + "\t{0:.3f}".format(self.snapshot.stats_precision_rate))
 
             # Disable relevant buttons:
             self.enableSteeringButtons(True)
@@ -539,52 +563,128 @@ class MainWindow(QtWidgets.QMainWindow):
             self.update_timer.setInterval(1)
             self.update_timer.start()
 
-    def buttonStep_click(self, event):
+    def showNetworkError(self, message):
         """
-        Performs a single simulation step.
+        Show an error reported by the network.
         """
+        QtWidgets.QMessageBox.warning(self, "Warning", message)
+
+    def stepNetwork(self, fast=False):
+        """
+        Performs a single time step on the network.
+        It only touches the network (neither controls nor globals), so it can be called by the simulation worker.
+        """
+        network = Global.project.network
 
         # Update time steps parameters
-        Global.curr_step += 1
-        if Global.curr_step >= (MAX_PREVIOUS_STEPS - 1):
-            self.slider_step.setEnabled(True)
-        Global.sel_step = self.slider_step.maximum() - self.slider_step.value()
-        Global.time_steps_predictions_chart.rotate()
-        Global.time_steps_predictions_chart.setForCurrStep(Global.curr_step)
+        context = network.context
+        context.curr_step += 1
+        if not fast:
+            context.prediction_steps.rotate()
+            context.prediction_steps.setForCurrStep(context.curr_step)
 
         # Perfoms actions related to time step progression.
-        start_time = time.time()
-        Global.project.network.nextStep()
-        Global.project.network.calculateStatistics()
-        end_time = time.time()
-        self.output_window.addText(str(Global.curr_step + 1) + "\t{0:.3f}".format(end_time - start_time) + "\t{0:.3f}".format(Global.project.network.stats_precision_rate))
+        network.nextStep(fast)
+        if not fast:
+            network.calculateStatistics()
+
+    def takeSnapshot(self):
+        """
+        Return a snapshot of the network after the last time step.
+        """
+        return Global.project.network.getSnapshot()
+
+    def showSnapshot(self, snapshot):
+        """
+        Make a snapshot of the network the one shown by the controls.
+        """
+        self.snapshot = snapshot
+        Global.curr_step = snapshot.step
+        Global.time_steps_predictions_chart = snapshot.prediction_steps
+
+    def showStepsPerformed(self, snapshot, num_steps, elapsed_time):
+        """
+        Output the time spent by the last performed steps and refresh the controls with their snapshot.
+        """
+        self.showSnapshot(snapshot)
+        if snapshot.step >= (MAX_PREVIOUS_STEPS - 1):
+            self.slider_step.setEnabled(True)
+        Global.sel_step = self.slider_step.maximum() - self.slider_step.value()
+        self.output_window.addText(str(snapshot.step + 1) + "\t{0:.3f}".format(elapsed_time / num_steps) + "\t{0:.3f}".format(snapshot.stats_precision_rate))
 
         # Update controls
         self.refreshControls()
 
-    def buttonMultipleSteps_click(self, event):
+    def startWorker(self, num_steps, fast):
         """
-        Performs full HTM simulation.
+        Performs a number of time steps in background.
         """
+        self.worker = SimulationWorker(self.stepNetwork, self.takeSnapshot, num_steps, fast)
+        self.worker.stepsPerformed.connect(self.worker_stepsPerformed)
+        self.worker.finished.connect(self.worker_finished)
 
-        # Get number of steps to perform simulation
-        self.num_steps_pending = -1
+        # Only stop is allowed while the worker is running
+        self.button_step.setEnabled(False)
+        self.button_multiple_steps.setEnabled(False)
+        self.button_fast_forward.setEnabled(False)
+        self.worker.start()
+
+    def isWorkerRunning(self):
+        return self.worker is not None and self.worker.isRunning()
+
+    def worker_stepsPerformed(self, snapshot, num_steps, elapsed_time):
+        # Controls are refreshed from the snapshot, so the worker goes on with the next time steps meanwhile
+        self.showStepsPerformed(snapshot, num_steps, elapsed_time)
+
+    def worker_finished(self):
+        # The last step performed by the worker was already published
+        self.worker = None
+        if self.state == State.SIMULATING:
+            self.enableSteeringButtons(True)
+
+    def buttonStep_click(self, event):
+        """
+        Performs a single simulation step.
+        """
+        start_time = time.time()
+        self.stepNetwork()
+        end_time = time.time()
+        self.showStepsPerformed(self.takeSnapshot(), 1, end_time - start_time)
+
+    def getNumSteps(self):
+        """
+        Ask user for the number of steps to perform.
+        """
         entered_integer, ok = QtWidgets.QInputDialog.getInt(self, "Input Dialog", "Enter number of steps:")
         if ok:
             if entered_integer < 2:
                 QtWidgets.QMessageBox.warning(self, "Warning", "Invalid value specified!")
             else:
-                self.num_steps_pending = entered_integer
+                return entered_integer
+        return 0
+
+    def buttonMultipleSteps_click(self, event):
+        """
+        Performs full HTM simulation.
+        """
+        num_steps = self.getNumSteps()
+        if num_steps > 0:
+            self.startWorker(num_steps, False)
 
-        while self.num_steps_pending > 0:
-            self.buttonStep_click(event)
-            self.num_steps_pending -= 1
+    def buttonFastForward_click(self, event):
+        """
+        Performs a number of time steps computing only the algorithms, except by the last step which also updates the
+        elements, statistics and controls.
+        """
+        num_steps = self.getNumSteps()
+        if num_steps > 0:
+            self.startWorker(num_steps, True)
 
     def buttonStop_click(self, event):
         # If multiple steps processing is running just stop the loop
         # otherwise, ask user to stop the simulation
-        if self.num_steps_pending > 0:
-            self.num_steps_pending = 0
+        if self.isWorkerRunning():
+            self.worker.stop()
         else:
             dialog_result = QtWidgets.QMessageBox.question(self, "Question", "Current simulation (learning) will stop!\r\nDo you want proceed?", QtWidgets.QMessageBox.Yes, QtWidgets.QMessageBox.No)
             if dialog_result == QtWidgets.QMessageBox.Yes:
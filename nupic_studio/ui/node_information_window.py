@@ -1,11 +1,11 @@
 ﻿import pyqtgraph as pg
 from PyQt5 import QtGui, QtCore, QtWidgets
-from nupic_studio import ArrayTableModel
-from nupic_studio.ui import ICON, State, Global
+from nupic_studio.ui import ArrayTableModel, ICON, State, Global
 from nupic_studio.htm import MAX_PREVIOUS_STEPS, MAX_FUTURE_STEPS, MAX_PREVIOUS_STEPS_WITH_INFERENCE
 from nupic_studio.htm.node import NodeType, Node
 from nupic_studio.htm.node_sensor import PredictionsMethod
 from nupic_studio.htm.encoding import FieldDataType
+from nupic_studio.htm.state_store import StateKind
 
 
 class NodeInformationWindow(QtWidgets.QWidget):
@@ -374,7 +374,7 @@ class NodeInformationWindow(QtWidgets.QWidget):
 
         if self.main_window.isRunning():
             if selected_node.type == NodeType.REGION:
-                self.text_box_region_precision_rate.setText("{0:.3f}".format(self.selected_region.stats_precision_rate))
+                self.text_box_region_precision_rate.setText("{0:.3f}".format(self.getNodeSnapshot(self.selected_region).stats_precision_rate))
 
                 # Bind the columns from this region
                 header, data = self.getColumnsData(self.selected_region)
@@ -382,7 +382,7 @@ class NodeInformationWindow(QtWidgets.QWidget):
                 self.data_grid_columns.resizeColumnsToContents()
 
             elif selected_node.type == NodeType.SENSOR:
-                self.text_box_sensor_precision_rate.setText("{0:.3f}".format(self.selected_sensor.stats_precision_rate))
+                self.text_box_sensor_precision_rate.setText("{0:.3f}".format(self.getNodeSnapshot(self.selected_sensor).stats_precision_rate))
 
                 # Bind the bits from this sensor
                 header, data = self.getBitsData(self.selected_sensor)
@@ -423,20 +423,46 @@ class NodeInformationWindow(QtWidgets.QWidget):
 
         return formatted_value
 
+    def getNodeSnapshot(self, node):
+        """
+        Return the states of a node published by the network after the last time step.
+        The node itself is only read for its structure, given that its states change while the simulation runs.
+        """
+        return self.main_window.snapshot.nodes[node.name]
+
+    def getEncodingSnapshot(self):
+        """
+        Return the values of the selected encoding published by the network after the last time step.
+        """
+        idx = self.selected_sensor.encodings.index(self.selected_encoding)
+        return self.getNodeSnapshot(self.selected_sensor).encodings[idx]
+
+    def getRateHeaders(self, states, titles):
+        """
+        Return the headers of the rate columns of a grid. Rates which do not cover all the time steps (i.e. their
+        counters were disabled by the statistics level at some point) are labeled with the time steps they cover.
+        """
+        if states.countsAllSteps():
+            return titles
+        suffix = " (last " + str(states.getCountedSteps()) + " steps)"
+        return [title + suffix for title in titles]
+
     def getBitsData(self, selected_sensor):
-        header = ['Pos (x,y)', 'Was Predicted', 'Is Active', 'Activation Rate', 'Precision Rate']
+        states = self.getNodeSnapshot(selected_sensor).bit_states
+        header = ['Pos (x,y)', 'Was Predicted', 'Is Active'] + self.getRateHeaders(states, ['Activation Rate', 'Precision Rate'])
         data = []
         for bit in selected_sensor.bits:
             pos = str(bit.x) + ", " + str(bit.y)
-            was_predicted = bit.is_predicted.atGivenStepAgo(Global.sel_step + 1)
-            is_active = bit.is_active.atGivenStepAgo(Global.sel_step)
-            activation_rate = "{0:.3f}".format(bit.stats_activation_rate)
-            precision_rate = "{0:.3f}".format(bit.stats_precision_rate)
+            was_predicted = states.get(StateKind.PREDICTED, bit.id, Global.sel_step + 1)
+            is_active = states.get(StateKind.ACTIVE, bit.id, Global.sel_step)
+            activation_rate = "{0:.3f}".format(states.getRate('activation_count', bit.id))
+            precision_rate = "{0:.3f}".format(states.getRate('prediction_count', bit.id, 'activation_count'))
             data.append([pos, was_predicted, is_active, activation_rate, precision_rate])
         return header, data
 
     def updateEncodingControls(self):
-        self.text_box_current_value.setText(self.formatValue(self.selected_encoding.encoder_field_data_type, self.selected_encoding.current_value.atGivenStepAgo(Global.sel_step)))
+        encoding_snapshot = self.getEncodingSnapshot()
+        self.text_box_current_value.setText(self.formatValue(self.selected_encoding.encoder_field_data_type, encoding_snapshot.current_value.atGivenStepAgo(Global.sel_step)))
         self.slider_step.setVisible(self.selected_encoding.enable_inference)
         self.label_predicted_values.setVisible(self.selected_encoding.enable_inference)
         self.data_grid_predicted_values.setVisible(self.selected_encoding.enable_inference)
@@ -454,13 +480,14 @@ class NodeInformationWindow(QtWidgets.QWidget):
         self.data_grid_predicted_values.resizeColumnsToContents()
 
     def updatePredictionsChart(self):
+        encoding_snapshot = self.getEncodingSnapshot()
 
         # Update the chart with the updated predictions history
         if self.current_values_plot_item == None:
             # Set plot lines
-            self.current_values_plot_item = self.predictions_chart.plot(Global.time_steps_predictions_chart.getList(), self.selected_encoding.current_value.getList())
+            self.current_values_plot_item = self.predictions_chart.plot(Global.time_steps_predictions_chart.getList(), encoding_snapshot.current_value.getList())
             self.current_values_plot_item.setPen(QtGui.QColor.fromRgb(0, 100, 0)) # green color
-            self.predicted_values_plot_item = self.predictions_chart.plot(Global.time_steps_predictions_chart.getList(), self.selected_encoding.best_predicted_value.getList())
+            self.predicted_values_plot_item = self.predictions_chart.plot(Global.time_steps_predictions_chart.getList(), encoding_snapshot.best_predicted_value.getList())
             self.predicted_values_plot_item.setPen(QtGui.QColor.fromRgb(255, 215, 80)) # yellow color
 
             # Set legend
@@ -468,8 +495,8 @@ class NodeInformationWindow(QtWidgets.QWidget):
             legend.addItem(self.current_values_plot_item, "Current")
             legend.addItem(self.predicted_values_plot_item, "Predicted")
         else:
-            self.current_values_plot_item.setData(Global.time_steps_predictions_chart.getList(), self.selected_encoding.current_value.getList())
-            self.predicted_values_plot_item.setData(Global.time_steps_predictions_chart.getList(), self.selected_encoding.best_predicted_value.getList())
+            self.current_values_plot_item.setData(Global.time_steps_predictions_chart.getList(), encoding_snapshot.current_value.getList())
+            self.predicted_values_plot_item.setData(Global.time_steps_predictions_chart.getList(), encoding_snapshot.best_predicted_value.getList())
 
         # Set X axis visible range
         min_x = Global.time_steps_predictions_chart.atFirstStep()
@@ -485,7 +512,7 @@ class NodeInformationWindow(QtWidgets.QWidget):
             header = ['Value', 'Probability']
 
         data = []
-        predictions = self.selected_encoding.predicted_values.atGivenStepAgo(Global.sel_step)[future_step]
+        predictions = self.getEncodingSnapshot().predicted_values.atGivenStepAgo(Global.sel_step)[future_step]
         for predicted_value in predictions:
             if self.selected_sensor.predictions_method == PredictionsMethod.RECONSTRUCTION:
                 value = predicted_value[1]
@@ -498,58 +525,67 @@ class NodeInformationWindow(QtWidgets.QWidget):
         return header, data
 
     def getColumnsData(self, selected_region):
-        header = ['Pos (x,y)', 'Was Predicted', 'Is Active', 'Activation Rate', 'Precision Rate']
+        states = self.getNodeSnapshot(selected_region).segment_states
+        header = ['Pos (x,y)', 'Was Predicted', 'Is Active'] + self.getRateHeaders(states, ['Activation Rate', 'Precision Rate'])
         data = []
         for column in selected_region.columns:
             pos = str(column.x) + ", " + str(column.y)
-            was_predicted = column.segment.is_predicted.atGivenStepAgo(Global.sel_step + 1)
-            is_active = column.segment.is_active.atGivenStepAgo(Global.sel_step)
-            activation_rate = "{0:.3f}".format(column.segment.stats_activation_rate)
-            precision_rate = "{0:.3f}".format(column.segment.stats_precision_rate)
+            id = column.segment.id
+            was_predicted = states.get(StateKind.PREDICTED, id, Global.sel_step + 1)
+            is_active = states.get(StateKind.ACTIVE, id, Global.sel_step)
+            activation_rate = "{0:.3f}".format(states.getRate('activation_count', id))
+            precision_rate = "{0:.3f}".format(states.getRate('prediction_count', id, 'activation_count'))
             data.append([pos, was_predicted, is_active, activation_rate, precision_rate])
         return header, data
 
     def getProximalSynapsesData(self, selected_segment):
         #TODO: Put sensor bit position (x,y,z)
-        header = ['Permanence', 'Is Connected', 'Connection Rate', 'Precision Rate']
+        region_snapshot = self.getNodeSnapshot(self.selected_region)
+        states = region_snapshot.proximal_synapse_states
+        header = ['Permanence', 'Is Connected'] + self.getRateHeaders(states, ['Connection Rate', 'Precision Rate'])
         data = []
-        for synapse in selected_segment.synapses:
-            permanence = "{0:.3f}".format(synapse.permanence.atGivenStepAgo(Global.sel_step))
-            is_connected = synapse.is_connected.atGivenStepAgo(Global.sel_step)
-            connection_rate = "{0:.3f}".format(synapse.stats_connection_rate)
-            precision_rate = "{0:.3f}".format(synapse.stats_precision_rate)
+        for synapse in region_snapshot.getSynapses(selected_segment):
+            permanence = "{0:.3f}".format(states.get(StateKind.PERMANENCE, synapse.id, Global.sel_step))
+            is_connected = states.get(StateKind.CONNECTED, synapse.id, Global.sel_step)
+            connection_rate = "{0:.3f}".format(states.getRate('connection_count', synapse.id))
+            precision_rate = "{0:.3f}".format(states.getRate('prediction_count', synapse.id, 'connection_count'))
             data.append([permanence, is_connected, connection_rate, precision_rate])
         return header, data
 
     def getCellsData(self, selected_column):
-        header = ['Pos (z)', 'Was Predicted', 'Is Active', 'Activation Rate', 'Precision Rate']
+        states = self.getNodeSnapshot(self.selected_region).cell_states
+        header = ['Pos (z)', 'Was Predicted', 'Is Active'] + self.getRateHeaders(states, ['Activation Rate', 'Precision Rate'])
         data = []
         for cell in selected_column.cells:
             pos = str(cell.z)
-            was_predicted = cell.is_predicted.atGivenStepAgo(Global.sel_step + 1)
-            is_active = cell.is_active.atGivenStepAgo(Global.sel_step)
-            activation_rate = "{0:.3f}".format(cell.stats_activation_rate)
-            precision_rate = "{0:.3f}".format(cell.stats_precision_rate)
+            was_predicted = states.get(StateKind.PREDICTED, cell.id, Global.sel_step + 1)
+            is_active = states.get(StateKind.ACTIVE, cell.id, Global.sel_step)
+            activation_rate = "{0:.3f}".format(states.getRate('activation_count', cell.id))
+            precision_rate = "{0:.3f}".format(states.getRate('prediction_count', cell.id, 'activation_count'))
             data.append([pos, was_predicted, is_active, activation_rate, precision_rate])
         return header, data
 
     def getDistalSegmetsData(self, selected_cell):
-        header = ['Is Active', 'Activation Rate', 'Activation Rate']
+        region_snapshot = self.getNodeSnapshot(self.selected_region)
+        states = region_snapshot.segment_states
+        header = ['Is Active'] + self.getRateHeaders(states, ['Activation Rate', 'Activation Rate'])
         data = []
-        for segment in selected_cell.segments:
-            is_active = segment.is_active.atGivenStepAgo(Global.sel_step)
-            activation_rate = "{0:.3f}".format(segment.stats_activation_rate)
+        for segment in region_snapshot.getSegments(selected_cell):
+            is_active = states.get(StateKind.ACTIVE, segment.id, Global.sel_step)
+            activation_rate = "{0:.3f}".format(states.getRate('activation_count', segment.id))
             data.append([is_active, activation_rate, activation_rate])
         return header, data
 
     def getDistalSynapsesData(self, selected_segment):
         #TODO: Put lateral cell position (x,y,z)
-        header = ['Permanence', 'Is Connected', 'Connection Rate']
+        region_snapshot = self.getNodeSnapshot(self.selected_region)
+        states = region_snapshot.distal_synapse_states
+        header = ['Permanence', 'Is Connected'] + self.getRateHeaders(states, ['Connection Rate'])
         data = []
-        for synapse in selected_segment.synapses:
-            permanence = "{0:.3f}".format(synapse.permanence.atGivenStepAgo(Global.sel_step))
-            is_connected = synapse.is_connected.atGivenStepAgo(Global.sel_step)
-            connection_rate = "{0:.3f}".format(synapse.stats_connection_rate)
+        for synapse in region_snapshot.getSynapses(selected_segment):
+            permanence = "{0:.3f}".format(states.get(StateKind.PERMANENCE, synapse.id, Global.sel_step))
+            is_connected = states.get(StateKind.CONNECTED, synapse.id, Global.sel_step)
+            connection_rate = "{0:.3f}".format(states.getRate('connection_count', synapse.id))
             data.append([permanence, is_connected, connection_rate])
         return header, data
 
@@ -612,7 +648,7 @@ class NodeInformationWindow(QtWidgets.QWidget):
             self.data_grid_cells.model().update(header, data)
             self.data_grid_cells.resizeColumnsToContents()
 
-        self.main_window.simulation_window.refreshControls()
+        self.main_window.simulation_window.refreshControls(True)
 
     def dataGridProximalSynapses_selectionChanged(self, event):
         if self.selected_proximal_synapse != None:
@@ -621,10 +657,10 @@ class NodeInformationWindow(QtWidgets.QWidget):
         selected_rows = self.data_grid_proximal_synapses.selectionModel().selectedRows()
         if len(selected_rows) > 0:
             index = selected_rows[0].row()
-            self.selected_proximal_synapse = self.selected_column.segment.synapses[index]
+            self.selected_proximal_synapse = self.getNodeSnapshot(self.selected_region).getSynapses(self.selected_column.segment)[index]
             self.selected_proximal_synapse.tree3d_selected = True
 
-        self.main_window.simulation_window.refreshControls()
+        self.main_window.simulation_window.refreshControls(True)
 
     def dataGridCells_selectionChanged(self, event):
         if self.selected_cell != None:
@@ -644,7 +680,7 @@ class NodeInformationWindow(QtWidgets.QWidget):
             self.data_grid_distal_segments.model().update(header, data)
             self.data_grid_distal_segments.resizeColumnsToContents()
 
-        self.main_window.simulation_window.refreshControls()
+        self.main_window.simulation_window.refreshControls(True)
 
     def dataGridDistalSegments_selectionChanged(self, event):
         if self.selected_distal_segment != None:
@@ -655,7 +691,7 @@ class NodeInformationWindow(QtWidgets.QWidget):
         selected_rows = self.data_grid_distal_segments.selectionModel().selectedRows()
         if len(selected_rows) > 0:
             index = selected_rows[0].row()
-            self.selected_distal_segment = self.selected_cell.segments[index]
+            self.selected_distal_segment = self.getNodeSnapshot(self.selected_region).getSegments(self.selected_cell)[index]
 
             # Bind the synapses of the selected segment
             self.showTab(self.tab_page_distal_synapses, "Distal Synapses")
@@ -663,7 +699,7 @@ class NodeInformationWindow(QtWidgets.QWidget):
             self.data_grid_distal_synapses.model().update(header, data)
             self.data_grid_distal_synapses.resizeColumnsToContents()
 
-        self.main_window.simulation_window.refreshControls()
+        self.main_window.simulation_window.refreshControls(True)
 
     def dataGridDistalSynapses_selectionChanged(self, event):
         if self.selected_distal_synapse != None:
@@ -672,7 +708,7 @@ class NodeInformationWindow(QtWidgets.QWidget):
         selected_rows = self.data_grid_distal_synapses.selectionModel().selectedRows()
         if len(selected_rows) > 0:
             index = selected_rows[0].row()
-            self.selected_distal_synapse = self.selected_distal_segment.synapses[index]
+            self.selected_distal_synapse = self.getNodeSnapshot(self.selected_region).getSynapses(self.selected_distal_segment)[index]
             self.selected_distal_synapse.tree3d_selected = True
 
-        self.main_window.simulation_window.refreshControls()
+        self.main_window.simulation_window.refreshControls(True)
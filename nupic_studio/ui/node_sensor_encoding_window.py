@@ -1,8 +1,7 @@
 ﻿import collections
 import json
 from PyQt5 import QtGui, QtCore, QtWidgets
-from nupic_studio import ArrayTableModel
-from nupic_studio.ui import ICON, Global
+from nupic_studio.ui import ArrayTableModel, ICON, Global
 from nupic_studio.htm.encoding import Encoding, FieldDataType
 
 
@@ -1,5 +1,6 @@
 ﻿from PyQt5 import QtGui, QtCore, QtWidgets
 from nupic_studio.ui import ICON, Global
+from nupic_studio.htm.run_context import STATISTICS_LEVELS
 
 
 class ProjectPropertiesWindow(QtWidgets.QDialog):
@@ -37,6 +38,22 @@ class ProjectPropertiesWindow(QtWidgets.QDialog):
         # text_box_description
         self.text_box_description = QtWidgets.QTextEdit()
 
+        # label_statistics_level
+        self.label_statistics_level = QtWidgets.QLabel()
+        self.label_statistics_level.setText("Statistics")
+        self.label_statistics_level.setAlignment(QtCore.Qt.AlignRight)
+
+        # combo_box_statistics_level
+        self.combo_box_statistics_level = QtWidgets.QComboBox()
+        for level in STATISTICS_LEVELS:
+            self.combo_box_statistics_level.addItem(level)
+        self.combo_box_statistics_level.setToolTip("Finest elements whose statistics are calculated at each time step. Statistics of finer elements are calculated from the stored time steps when they are inspected.")
+
+        # check_box_parallel
+        self.check_box_parallel = QtWidgets.QCheckBox()
+        self.check_box_parallel.setText("Compute regions in parallel processes")
+        self.check_box_parallel.setToolTip("Compute the spatial and temporal poolers of each region in a worker process, so the regions of a same phase run in parallel.")
+
         # group_box_main_layout
         group_box_main_layout = QtWidgets.QGridLayout()
         group_box_main_layout.addWidget(self.label_name, 0, 0)
@@ -45,6 +62,9 @@ class ProjectPropertiesWindow(QtWidgets.QDialog):
         group_box_main_layout.addWidget(self.text_box_author, 1, 1)
         group_box_main_layout.addWidget(self.label_description, 2, 0)
         group_box_main_layout.addWidget(self.text_box_description, 2, 1)
+        group_box_main_layout.addWidget(self.label_statistics_level, 3, 0)
+        group_box_main_layout.addWidget(self.combo_box_statistics_level, 3, 1)
+        group_box_main_layout.addWidget(self.check_box_parallel, 4, 1)
 
         # group_box_main
         self.group_box_main = QtWidgets.QGroupBox()
@@ -76,18 +96,24 @@ class ProjectPropertiesWindow(QtWidgets.QDialog):
         self.text_box_name.setText(Global.project.name)
         self.text_box_author.setText(Global.project.author)
         self.text_box_description.setText(Global.project.description)
+        self.combo_box_statistics_level.setCurrentIndex(self.combo_box_statistics_level.findText(Global.project.network.statistics_level, QtCore.Qt.MatchFixedString))
+        self.check_box_parallel.setChecked(Global.project.network.parallel)
 
     def buttonOk_click(self, event):
         name = self.text_box_name.text()
         author = self.text_box_author.text()
         description = self.text_box_description.toPlainText()
+        statistics_level = str(self.combo_box_statistics_level.currentText())
+        parallel = self.check_box_parallel.isChecked()
 
         # If anything has changed
-        if Global.project.name != name or Global.project.author != author or Global.project.description != description:
+        if Global.project.name != name or Global.project.author != author or Global.project.description != description or Global.project.network.statistics_level != statistics_level or Global.project.network.parallel != parallel:
             # Set project properties with controls values
             Global.project.name = name
             Global.project.author = author
             Global.project.description = description
+            Global.project.network.statistics_level = statistics_level
+            Global.project.network.parallel = parallel
             self.accept()
 
         self.close()
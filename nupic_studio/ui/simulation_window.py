@@ -1,13 +1,32 @@
 ﻿import copy
 import os
+import numpy
 from PIL import Image
 from PyQt5 import QtGui, QtCore, QtWidgets
 from nupic_studio import REPO_DIR
 from nupic_studio.htm.node import Node, NodeType
 from nupic_studio.htm.segment import SegmentType
+from nupic_studio.htm.state_store import StateKind
 from nupic_studio.ui import ICON, Global, State, NEW_VIEW
 from nupic_studio.ui.simulation_legend_window import SimulationLegendWindow
-from nupic_studio.util import Texture3D
+from nupic_studio.util import Color3D
+
+
+# Kinds of states which decide how each type of element is drawn, in the order of their bits in the state codes.
+BIT_STATE_KINDS = [StateKind.ACTIVE, StateKind.PREDICTED, StateKind.FALSELY_PREDICTED]
+CELL_STATE_KINDS = [StateKind.ACTIVE, StateKind.PREDICTED, StateKind.FALSELY_PREDICTED, StateKind.LEARNING]
+SEGMENT_STATE_KINDS = [StateKind.ACTIVE, StateKind.PREDICTED, StateKind.FALSELY_PREDICTED, StateKind.REMOVED]
+SYNAPSE_STATE_KINDS = [StateKind.CONNECTED, StateKind.PREDICTED, StateKind.FALSELY_PREDICTED, StateKind.REMOVED]
+
+# Bits of the segment codes for which the synapses of the segment are shown (active, predicted or falsely predicted).
+SYNAPSES_SHOWN_MASK = 1 | 2 | 4
+
+
+def getStates(code, kinds):
+    """
+    Return the kinds of states given by a state code.
+    """
+    return set(kinds[i] for i in range(len(kinds)) if code & (1 << i))
 
 
 class SimulationWindow(QtWidgets.QWidget):
@@ -49,11 +68,11 @@ class SimulationWindow(QtWidgets.QWidget):
         """
         self.viewer_3d.update()
 
-    def refreshControls(self):
+    def refreshControls(self, full=False):
         """
         Refresh controls for each time step.
         """
-        self.viewer_3d.updateElements3d()
+        self.viewer_3d.updateElements3d(full)
 
 
 class Viewer3D(QtWidgets.QLabel):
@@ -82,6 +101,16 @@ class Viewer3D(QtWidgets.QLabel):
         # Vertical space between two cells
         self.offset_cells = 5
 
+        # State codes of the elements in the last drawing (indexed by node name and element type), the distal segments
+        # and the synapses of each segment drawn in the last drawing (indexed by node name) and the ids of the bits of
+        # the sensors.
+        # They let a drawing update only the elements whose visible state changed and remove the lines of the elements
+        # which no longer exist.
+        self.drawn_codes = {}
+        self.drawn_distal_segments = {}
+        self.drawn_synapses = {}
+        self.element_ids = {}
+
         self.initUI()
 
         # Create views menus
@@ -374,21 +403,22 @@ class Viewer3D(QtWidgets.QLabel):
         self.top_region = top_region
 
         # Set the colors of the states.
-        self.COLOR_INACTIVE = Texture3D.GRAY
-        self.COLOR_SELECTED = Texture3D.BLUE
-        self.COLOR_BIT_ACTIVE = Texture3D.Green
-        self.COLOR_BIT_PREDICTED = Texture3D.YELLOW
-        self.COLOR_BIT_FALSELY_PREDICTED = Texture3D.RED
-        self.COLOR_CELL_LEARNING = Texture3D.GREEN_YELLOW
-        self.COLOR_CELL_ACTIVE = Texture3D.Green
-        self.COLOR_CELL_PREDICTED = Texture3D.YELLOW
-        self.COLOR_CELL_FALSELY_PREDICTED = Texture3D.RED
-        self.COLOR_SEGMENT_ACTIVE = Texture3D.Green
-        self.COLOR_SEGMENT_PREDICTED = Texture3D.YELLOW
-        self.COLOR_SEGMENT_FALSELY_PREDICTED = Texture3D.RED
-        self.COLOR_SYNAPSE_CONNECTED = Texture3D.Green
-        self.COLOR_SYNAPSE_PREDICTED = Texture3D.YELLOW
-        self.COLOR_SYNAPSE_FALSELY_PREDICTED = Texture3D.RED
+        # Bits and cells are instances and segments and synapses are lines, all of them colored directly.
+        self.COLOR_INACTIVE = Color3D.GRAY
+        self.COLOR_SELECTED = Color3D.BLUE
+        self.COLOR_BIT_ACTIVE = Color3D.GREEN
+        self.COLOR_BIT_PREDICTED = Color3D.YELLOW
+        self.COLOR_BIT_FALSELY_PREDICTED = Color3D.RED
+        self.COLOR_CELL_LEARNING = Color3D.GREEN_YELLOW
+        self.COLOR_CELL_ACTIVE = Color3D.GREEN
+        self.COLOR_CELL_PREDICTED = Color3D.YELLOW
+        self.COLOR_CELL_FALSELY_PREDICTED = Color3D.RED
+        self.COLOR_SEGMENT_ACTIVE = Color3D.GREEN
+        self.COLOR_SEGMENT_PREDICTED = Color3D.YELLOW
+        self.COLOR_SEGMENT_FALSELY_PREDICTED = Color3D.RED
+        self.COLOR_SYNAPSE_CONNECTED = Color3D.GREEN
+        self.COLOR_SYNAPSE_PREDICTED = Color3D.YELLOW
+        self.COLOR_SYNAPSE_FALSELY_PREDICTED = Color3D.RED
 
         # Arrange the tree once to see how big it is.
         self.tree_width = 0
@@ -406,7 +436,12 @@ class Viewer3D(QtWidgets.QLabel):
         # Once we have the final position of the regions, we can calculate the position of every column and cell.
         self.calculateNodeElementsPosition(self.top_region)
 
-        # Draw the tree recursively from top region.
+        # Resolve the view filters into colors and draw the tree recursively from top region.
+        self.drawn_codes = {}
+        self.drawn_distal_segments = {}
+        self.drawn_synapses = {}
+        self.element_ids = {}
+        self.updateColorTables()
         self.drawNode(self.top_region, True)
 
     def clear(self):
@@ -560,13 +595,17 @@ class Viewer3D(QtWidgets.QLabel):
             self.main_window.simulation.startMouseWork("zoom", start_fn, stop_fn)
             self.main_window.simulation.mouse_steps = event.angleDelta().y()
 
-    def updateElements3d(self):
+    def updateElements3d(self, full=False):
         """
         Refresh controls for each time step.
+        If full is True (i.e. view filters or selection changed), all elements are redrawn.
         """
         if self.main_window.isRunning():
+            if full:
+                self.updateColorTables()
+
             # Draw the tree recursively from top region.
-            self.drawNode(self.top_region, False)
+            self.drawNode(self.top_region, False, full)
 
     def centerNode(self, node, offset_x):
         """
@@ -705,105 +744,249 @@ class Viewer3D(QtWidgets.QLabel):
 
         return min_x, min_z
 
-    def drawNode(self, node, initialize):
+    def updateColorTables(self):
+        """
+        Resolve the view filters (menus) into tables which give the color of an element for each code of its states,
+        or None if the element is hidden. Drawing an element is then only a lookup in these tables.
+        """
+
+        # Bits
+        self.bit_colors = []
+        for code in range(2 ** len(BIT_STATE_KINDS)):
+            states = getStates(code, BIT_STATE_KINDS)
+            if self.menu_show_bits_none.isChecked():
+                color = None
+            elif StateKind.FALSELY_PREDICTED in states and self.menu_show_bits_falsely_predicted.isChecked():
+                color = self.COLOR_BIT_FALSELY_PREDICTED
+            elif StateKind.PREDICTED in states and self.menu_show_bits_predicted.isChecked():
+                color = self.COLOR_BIT_PREDICTED
+            elif StateKind.ACTIVE in states and self.menu_show_bits_active.isChecked():
+                color = self.COLOR_BIT_ACTIVE
+            else:
+                color = self.COLOR_INACTIVE
+            self.bit_colors.append(color)
+
+        # Cells
+        self.cell_colors = []
+        for code in range(2 ** len(CELL_STATE_KINDS)):
+            states = getStates(code, CELL_STATE_KINDS)
+            if self.menu_show_cells_none.isChecked():
+                color = None
+            elif StateKind.FALSELY_PREDICTED in states and self.menu_show_cells_falsely_predicted.isChecked():
+                color = self.COLOR_CELL_FALSELY_PREDICTED
+            elif StateKind.PREDICTED in states and self.menu_show_cells_predicted.isChecked():
+                color = self.COLOR_CELL_PREDICTED
+            elif StateKind.LEARNING in states and self.menu_show_cells_learning.isChecked():
+                color = self.COLOR_CELL_LEARNING
+            elif StateKind.ACTIVE in states and self.menu_show_cells_active.isChecked():
+                color = self.COLOR_CELL_ACTIVE
+            elif self.menu_show_cells_inactive.isChecked():
+                color = self.COLOR_INACTIVE
+            else:
+                color = None
+            self.cell_colors.append(color)
+
+        # Segments
+        self.segment_colors = {}
+        for type in [SegmentType.PROXIMAL, SegmentType.DISTAL]:
+            is_proximal = (type == SegmentType.PROXIMAL)
+            colors = []
+            for code in range(2 ** len(SEGMENT_STATE_KINDS)):
+                states = getStates(code, SEGMENT_STATE_KINDS)
+                color = None
+                if StateKind.REMOVED in states or (is_proximal and self.menu_show_proximal_segments_none.isChecked()) or (not is_proximal and self.menu_show_distal_segments_none.isChecked()):
+                    color = None
+                elif StateKind.FALSELY_PREDICTED in states:
+                    if is_proximal and self.menu_show_proximal_segments_falsely_predicted.isChecked():
+                        color = self.COLOR_SEGMENT_FALSELY_PREDICTED
+                elif StateKind.PREDICTED in states:
+                    if is_proximal and self.menu_show_proximal_segments_predicted.isChecked():
+                        color = self.COLOR_SEGMENT_PREDICTED
+                elif StateKind.ACTIVE in states:
+                    if (is_proximal and self.menu_show_proximal_segments_active.isChecked()) or (not is_proximal and self.menu_show_distal_segments_active.isChecked()):
+                        color = self.COLOR_SEGMENT_ACTIVE
+                elif is_proximal:
+                    color = self.COLOR_INACTIVE
+                colors.append(color)
+            self.segment_colors[type] = colors
+
+        # Synapses (given that their segment is showing synapses)
+        self.synapse_colors = {}
+        for type in [SegmentType.PROXIMAL, SegmentType.DISTAL]:
+            is_proximal = (type == SegmentType.PROXIMAL)
+            colors = []
+            for code in range(2 ** len(SYNAPSE_STATE_KINDS)):
+                states = getStates(code, SYNAPSE_STATE_KINDS)
+                color = None
+                if StateKind.REMOVED in states or (is_proximal and self.menu_show_proximal_synapses_none.isChecked()) or (not is_proximal and self.menu_show_distal_synapses_none.isChecked()):
+                    color = None
+                elif StateKind.FALSELY_PREDICTED in states:
+                    if is_proximal and self.menu_show_proximal_synapses_falsely_predicted.isChecked():
+                        color = self.COLOR_SYNAPSE_FALSELY_PREDICTED
+                elif StateKind.PREDICTED in states:
+                    if is_proximal and self.menu_show_proximal_synapses_predicted.isChecked():
+                        color = self.COLOR_SYNAPSE_PREDICTED
+                elif StateKind.CONNECTED in states:
+                    if (is_proximal and self.menu_show_proximal_synapses_connected.isChecked()) or (not is_proximal and self.menu_show_distal_synapses_connected.isChecked()):
+                        color = self.COLOR_SYNAPSE_CONNECTED
+                else:
+                    if (is_proximal and self.menu_show_proximal_synapses_active.isChecked()) or (not is_proximal and self.menu_show_distal_synapses_active.isChecked()):
+                        color = self.COLOR_INACTIVE
+                colors.append(color)
+            self.synapse_colors[type] = colors
+
+    def getDirtyIndexes(self, key, codes, full):
+        """
+        Return the indexes of the elements whose state codes changed since the last drawing (or all of them if full is
+        True) and remember the new codes.
+        """
+        last_codes = self.drawn_codes.get(key)
+        self.drawn_codes[key] = codes
+        if full or last_codes is None or len(last_codes) != len(codes):
+            return numpy.arange(len(codes))
+        return numpy.nonzero(codes != last_codes)[0]
+
+    def drawNode(self, node, initialize, full=True):
         """
         Draw the nodes for the subtree rooted at this node.
+        Unless full is True, only the elements whose visible state changed since the last drawing are updated.
         """
 
         # Recursively make the node draw its feeders.
         for feeder in Global.project.network.getFeederNodes(node):
-            self.drawNode(feeder, initialize)
+            self.drawNode(feeder, initialize, full)
 
-        # Draw a column of cells if node is a region
-        # or an input bit if node is a sensor
+        # States are read from the last snapshot published by the network, never from the node itself
+        node_snapshot = self.main_window.snapshot.nodes[node.name]
+
+        # Draw the columns of cells if node is a region
+        # or the input bits if node is a sensor
         if node.type == NodeType.REGION:
-            for column in node.columns:
-                if initialize:
-                    for cell in column.cells:
-                        cell.tree3d_initialized = False
-                self.drawColumn(column)
+            self.drawRegion(node, node_snapshot, initialize, full or initialize)
         else:
-            for bit in node.bits:
-                if initialize:
-                    bit.tree3d_initialized = False
-                self.drawBit(bit)
+            self.drawSensor(node, node_snapshot, initialize, full or initialize)
 
-    def drawBit(self, bit):
+    def drawSensor(self, node, node_snapshot, initialize, full):
+        if initialize:
+            for bit in node.bits:
+                bit.tree3d_initialized = False
+                bit.tree3d_instance = None
+            self.element_ids[node.name] = numpy.array([bit.id for bit in node.bits], dtype=numpy.int64)
+
+        # Update only the bits whose states changed
+        bit_codes = node_snapshot.bit_states.getCodes(BIT_STATE_KINDS, Global.sel_step)[self.element_ids[node.name]]
+        for idx in self.getDirtyIndexes((node.name, 'bits'), bit_codes, full).tolist():
+            self.drawBit(node.bits[idx], bit_codes[idx])
+
+    def drawRegion(self, node, node_snapshot, initialize, full):
+        columns = node.columns
+        if initialize:
+            for column in columns:
+                for cell in column.cells:
+                    cell.tree3d_initialized = False
+                    cell.tree3d_instance = None
+
+            # Forget the lines of segments and synapses which belong to a previous simulation
+            segments = [column.segment for column in columns] + [segment for segment, cell_idx in node_snapshot.distal_segment_cells.values()]
+            for segment in segments:
+                segment.tree3d_initialized = False
+                segment.tree3d_line = None
+                synapses = segment.synapses_cache.values() if segment.type == SegmentType.PROXIMAL else node_snapshot.getSynapses(segment)
+                for synapse in synapses:
+                    synapse.tree3d_initialized = False
+                    synapse.tree3d_line = None
+            self.drawn_distal_segments[node.name] = {}
+            self.drawn_synapses[node.name] = {}
+        drawn_synapses = self.drawn_synapses.setdefault(node.name, {})
+
+        # Update only the cells whose states changed
+        cell_codes = node_snapshot.cell_states.getCodes(CELL_STATE_KINDS, Global.sel_step)[node.cell_ids]
+        for idx in self.getDirtyIndexes((node.name, 'cells'), cell_codes, full).tolist():
+            self.drawCell(node.getCell(idx), cell_codes[idx])
+
+        segment_codes = node_snapshot.segment_states.getCodes(SEGMENT_STATE_KINDS, Global.sel_step)
+        synapse_codes = {
+            SegmentType.PROXIMAL: node_snapshot.proximal_synapse_states.getCodes(SYNAPSE_STATE_KINDS, Global.sel_step),
+            SegmentType.DISTAL: node_snapshot.distal_synapse_states.getCodes(SYNAPSE_STATE_KINDS, Global.sel_step)}
+
+        # Update the proximal segments whose states changed and the ones which are showing (or were showing) synapses
+        column_codes = segment_codes[node.proximal_segment_ids]
+        last_column_codes = self.drawn_codes.get((node.name, 'columns'))
+        dirty_columns = set(self.getDirtyIndexes((node.name, 'columns'), column_codes, full).tolist())
+        dirty_columns.update(numpy.nonzero(column_codes & SYNAPSES_SHOWN_MASK)[0].tolist())
+        if last_column_codes is not None and len(last_column_codes) == len(column_codes):
+            dirty_columns.update(numpy.nonzero(last_column_codes & SYNAPSES_SHOWN_MASK)[0].tolist())
+        for col_idx in sorted(dirty_columns):
+            self.drawSegment(node_snapshot, columns[col_idx].segment, segment_codes, synapse_codes, drawn_synapses)
+
+        # Distal segments are only visible while they are showing synapses, so only these ones and the ones drawn in
+        # the last drawing (which could be hidden now) are updated
+        drawn_segments = self.drawn_distal_segments.get(node.name, {})
+        segments = dict(drawn_segments)
+        if full:
+            segments.update(node_snapshot.distal_segment_cells.values())
+        else:
+            for id in numpy.nonzero(segment_codes & SYNAPSES_SHOWN_MASK)[0].tolist():
+                entry = node_snapshot.distal_segment_cells.get(id)
+                if entry is not None:
+                    segments[entry[0]] = entry[1]
+        drawn_segments = {}
+        for segment, cell_idx in segments.items():
+            # Segments released since the last drawing are erased by themselves given that their ids can already belong
+            # to other segments
+            if not node_snapshot.hasSegment(segment):
+                self.eraseSegment(segment, drawn_synapses)
+                continue
+            segment.tree3d_start_pos = node.getCell(cell_idx).tree3d_pos
+            segment.tree3d_end_pos = self.calculateSegmentEndPos(node_snapshot.getSynapses(segment), segment.tree3d_start_pos)
+            self.drawSegment(node_snapshot, segment, segment_codes, synapse_codes, drawn_synapses)
+            if segment.tree3d_initialized:
+                drawn_segments[segment] = cell_idx
+        self.drawn_distal_segments[node.name] = drawn_segments
+
+    def drawBit(self, bit, code):
 
         # Update properties according to state
-        is_visible = True
-        if self.menu_show_bits_none.isChecked():
-            is_visible = False
-        elif bit.is_falsely_predicted.atGivenStepAgo(Global.sel_step) and self.menu_show_bits_falsely_predicted.isChecked():
-            color = self.COLOR_BIT_FALSELY_PREDICTED
-        elif bit.is_predicted.atGivenStepAgo(Global.sel_step) and self.menu_show_bits_predicted.isChecked():
-            color = self.COLOR_BIT_PREDICTED
-        elif bit.is_active.atGivenStepAgo(Global.sel_step) and self.menu_show_bits_active.isChecked():
-            color = self.COLOR_BIT_ACTIVE
-        else:
-            color = self.COLOR_INACTIVE
+        color = self.bit_colors[code]
+        is_visible = color is not None
 
+        bit_instances = self.main_window.simulation.bit_instances
         if is_visible:
             # Draw the input bit
             if not bit.tree3d_initialized:
-                bit.tree3d_item_np = self.main_window.simulation.createBit(bit.tree3d_pos)
+                bit.tree3d_instance = self.main_window.simulation.createBit(bit.tree3d_pos)
                 bit.tree3d_initialized = True
 
             # Update the color
             if bit.tree3d_selected:
                 color = self.COLOR_SELECTED
-            bit.tree3d_item_np.setTexture(color)
-
-        if bit.tree3d_item_np != None:
-            bit.tree3d_item_np.show() if is_visible else bit.tree3d_item_np.hide()
+            bit_instances.setColor(bit.tree3d_instance, color)
 
-    def drawColumn(self, column):
+        if bit.tree3d_instance is not None:
+            bit_instances.setVisible(bit.tree3d_instance, is_visible)
 
-        # Update proximal segment
-        self.drawSegment(column.segment)
-        for cell in column.cells:
-            self.drawCell(cell)
-
-    def drawCell(self, cell):
+    def drawCell(self, cell, code):
 
         # Update properties according to state
-        is_visible = True
-        if self.menu_show_cells_none.isChecked():
-            is_visible = False
-        elif cell.is_falsely_predicted.atGivenStepAgo(Global.sel_step) and self.menu_show_cells_falsely_predicted.isChecked():
-            color = self.COLOR_CELL_FALSELY_PREDICTED
-        elif cell.is_predicted.atGivenStepAgo(Global.sel_step) and self.menu_show_cells_predicted.isChecked():
-            color = self.COLOR_CELL_PREDICTED
-        elif cell.is_learning.atGivenStepAgo(Global.sel_step) and self.menu_show_cells_learning.isChecked():
-            color = self.COLOR_CELL_LEARNING
-        elif cell.is_active.atGivenStepAgo(Global.sel_step) and self.menu_show_cells_active.isChecked():
-            color = self.COLOR_CELL_ACTIVE
-        elif self.menu_show_cells_inactive.isChecked():
-            color = self.COLOR_INACTIVE
-        else:
-            is_visible = False
+        color = self.cell_colors[code]
+        is_visible = color is not None
 
+        cell_instances = self.main_window.simulation.cell_instances
         if is_visible:
             # Draw the cell
             if not cell.tree3d_initialized:
-                cell.tree3d_item_np = self.main_window.simulation.createCell(cell.tree3d_pos)
+                cell.tree3d_instance = self.main_window.simulation.createCell(cell.tree3d_pos)
                 cell.tree3d_initialized = True
 
             # Update the color
             if cell.tree3d_selected:
                 color = self.COLOR_SELECTED
-            cell.tree3d_item_np.setTexture(color)
-
-        if cell.tree3d_item_np != None:
-            cell.tree3d_item_np.show() if is_visible else cell.tree3d_item_np.hide()
+            cell_instances.setColor(cell.tree3d_instance, color)
 
-        # Draw/update all distal segments
-        for segment in cell.segments:
-            segment.tree3d_start_pos = cell.tree3d_pos
-            segment.tree3d_end_pos = self.calculateSegmentEndPos(segment, segment.tree3d_start_pos)
-            self.drawSegment(segment)
+        if cell.tree3d_instance is not None:
+            cell_instances.setVisible(cell.tree3d_instance, is_visible)
 
-    def calculateSegmentEndPos(self, segment, start_pos):
+    def calculateSegmentEndPos(self, synapses, start_pos):
         """
         Calculates an average position of the segment's end through their synapses' end positions.
         """
@@ -812,7 +995,7 @@ class Viewer3D(QtWidgets.QLabel):
         sum_k = 0.0
         num_x_below = 0
         num_x_above = 0
-        for synapse in segment.synapses:
+        for synapse in synapses:
             x_syn, y_syn, z_syn = synapse.input_elem.tree3d_pos
 
             # Calculate 'k' (slope) of the straight line representing this synapse
@@ -838,8 +1021,8 @@ class Viewer3D(QtWidgets.QLabel):
         # Calculate the 'k' (slope) of the new straight line representing this segment
         # It is an average value among the 'k' of the synapses
         k = 0
-        if len(segment.synapses) > 0:
-            k = int(sum_k / len(segment.synapses))
+        if len(synapses) > 0:
+            k = int(sum_k / len(synapses))
 
         # Find the 'b' of the straight line equation using 'k' and segment's start position:
         #    y = ax + b (where 'a' = 'k')
@@ -860,95 +1043,86 @@ class Viewer3D(QtWidgets.QLabel):
 
         return int(x_seg2), int(y_seg2), z_seg2
 
-    def drawSegment(self, segment):
+    def drawSegment(self, node_snapshot, segment, segment_codes, synapse_codes, drawn_synapses):
 
         # Update properties according to state
-        is_visible = True
-        if segment.is_removed.atGivenStepAgo(Global.sel_step) or (segment.type == SegmentType.PROXIMAL and self.menu_show_proximal_segments_none.isChecked()) or (segment.type == SegmentType.DISTAL and self.menu_show_distal_segments_none.isChecked()):
-            is_visible = False
-        else:
-            if segment.is_falsely_predicted.atGivenStepAgo(Global.sel_step):
-                if segment.type == SegmentType.PROXIMAL and self.menu_show_proximal_segments_falsely_predicted.isChecked():
-                    color = self.COLOR_SEGMENT_FALSELY_PREDICTED
-                else:
-                    is_visible = False
-            elif segment.is_predicted.atGivenStepAgo(Global.sel_step):
-                if segment.type == SegmentType.PROXIMAL and self.menu_show_proximal_segments_predicted.isChecked():
-                    color = self.COLOR_SEGMENT_PREDICTED
-                else:
-                    is_visible = False
-            elif segment.is_active.atGivenStepAgo(Global.sel_step):
-                if (segment.type == SegmentType.PROXIMAL and self.menu_show_proximal_segments_active.isChecked()) or (segment.type == SegmentType.DISTAL and self.menu_show_distal_segments_active.isChecked()):
-                    color = self.COLOR_SEGMENT_ACTIVE
-                else:
-                    is_visible = False
-            else:
-                if segment.type == SegmentType.PROXIMAL:
-                    color = self.COLOR_INACTIVE
-                else:
-                    is_visible = False
+        code = segment_codes[segment.id]
+        color = self.segment_colors[segment.type][code]
+        is_visible = color is not None
 
+        segment_lines = self.main_window.simulation.segment_lines
         if is_visible:
             # Draw the segment
             if not segment.tree3d_initialized:
-                segment.tree3d_item_np = self.main_window.simulation.createSegment(segment.tree3d_start_pos, segment.tree3d_end_pos)
+                segment.tree3d_line = self.main_window.simulation.createSegment(segment.tree3d_start_pos, segment.tree3d_end_pos)
                 segment.tree3d_initialized = True
 
             # Update the color
             if segment.tree3d_selected:
                 color = self.COLOR_SELECTED
-            segment.tree3d_item_np.setTexture(color)
+            segment_lines.setColor(segment.tree3d_line, color)
         else:
+            # Return the line of the segment to be reused by other segment
             segment.tree3d_initialized = False
-            if segment.tree3d_item_np is not None:
-                self.main_window.simulation.removeElement(segment.tree3d_item_np)
+            if segment.tree3d_line is not None:
+                self.main_window.simulation.removeSegment(segment.tree3d_line)
+                segment.tree3d_line = None
 
         # Draw/update all synapses of this segment
-        for synapse in segment.synapses:
-            self.drawSynapse(segment, synapse, is_visible)
+        # Synapses are only shown while their segment is visible and active or predicted
+        shows_synapses = is_visible and (code & SYNAPSES_SHOWN_MASK) != 0
+        synapses = node_snapshot.getSynapses(segment)
+        for synapse in synapses:
+            self.drawSynapse(segment, synapse, synapse_codes[segment.type][synapse.id], shows_synapses)
+
+        # Remove the lines of the synapses drawn in the last drawing which no longer belong to the segment (released
+        # synapses or proximal synapses whose ids changed)
+        last_synapses = drawn_synapses.pop(segment, ())
+        if len(last_synapses) > 0:
+            curr_synapses = set(synapses)
+            for synapse in last_synapses:
+                if synapse not in curr_synapses:
+                    self.drawSynapse(segment, synapse, 0, False)
+        shown_synapses = [synapse for synapse in synapses if synapse.tree3d_line is not None]
+        if len(shown_synapses) > 0:
+            drawn_synapses[segment] = shown_synapses
+
+    def eraseSegment(self, segment, drawn_synapses):
+        """
+        Remove the lines of a segment which no longer exists and the ones of its synapses.
+        """
+        for synapse in drawn_synapses.pop(segment, ()):
+            self.drawSynapse(segment, synapse, 0, False)
+        segment.tree3d_initialized = False
+        if segment.tree3d_line is not None:
+            self.main_window.simulation.removeSegment(segment.tree3d_line)
+            segment.tree3d_line = None
 
-    def drawSynapse(self, segment, synapse, segment_is_visible):
+    def drawSynapse(self, segment, synapse, code, segment_shows_synapses):
 
         # Update properties according to state
-        is_visible = True
-        if synapse.is_removed.atGivenStepAgo(Global.sel_step) or (not segment.is_active.atGivenStepAgo(Global.sel_step) and not segment.is_predicted.atGivenStepAgo(Global.sel_step) and not segment.is_falsely_predicted.atGivenStepAgo(Global.sel_step)) or (segment.type == SegmentType.PROXIMAL and self.menu_show_proximal_synapses_none.isChecked()) or (segment.type == SegmentType.DISTAL and self.menu_show_distal_synapses_none.isChecked()):
-            is_visible = False
-        else:
-            if synapse.is_falsely_predicted.atGivenStepAgo(Global.sel_step):
-                if (segment.type == SegmentType.PROXIMAL and self.menu_show_proximal_synapses_falsely_predicted.isChecked()):
-                    color = self.COLOR_SYNAPSE_FALSELY_PREDICTED
-                else:
-                    is_visible = False
-            elif synapse.is_predicted.atGivenStepAgo(Global.sel_step):
-                if (segment.type == SegmentType.PROXIMAL and self.menu_show_proximal_synapses_predicted.isChecked()):
-                    color = self.COLOR_SYNAPSE_PREDICTED
-                else:
-                    is_visible = False
-            elif synapse.is_connected.atGivenStepAgo(Global.sel_step):
-                if (segment.type == SegmentType.PROXIMAL and self.menu_show_proximal_synapses_connected.isChecked()) or (segment.type == SegmentType.DISTAL and self.menu_show_distal_synapses_connected.isChecked()):
-                    color = self.COLOR_SYNAPSE_CONNECTED
-                else:
-                    is_visible = False
-            else:
-                if (segment.type == SegmentType.PROXIMAL and self.menu_show_proximal_synapses_active.isChecked()) or (segment.type == SegmentType.DISTAL and self.menu_show_distal_synapses_active.isChecked()):
-                    color = self.COLOR_INACTIVE
-                else:
-                    is_visible = False
+        color = None
+        if segment_shows_synapses:
+            color = self.synapse_colors[segment.type][code]
+        is_visible = color is not None
 
-        if is_visible and segment_is_visible:
+        synapse_lines = self.main_window.simulation.synapse_lines
+        if is_visible:
             # Draw the synapse
             if not synapse.tree3d_initialized:
-                synapse.tree3d_item_np = self.main_window.simulation.createSynapse(segment.tree3d_end_pos, synapse.input_elem.tree3d_pos)
+                synapse.tree3d_line = self.main_window.simulation.createSynapse(segment.tree3d_end_pos, synapse.input_elem.tree3d_pos)
                 synapse.tree3d_initialized = True
 
             # Update the color
             if synapse.tree3d_selected:
                 color = self.COLOR_SELECTED
-            synapse.tree3d_item_np.setTexture(color)
+            synapse_lines.setColor(synapse.tree3d_line, color)
         else:
+            # Return the line of the synapse to be reused by other synapse
             synapse.tree3d_initialized = False
-            if synapse.tree3d_item_np is not None:
-                self.main_window.simulation.removeElement(synapse.tree3d_item_np)
+            if synapse.tree3d_line is not None:
+                self.main_window.simulation.removeSynapse(synapse.tree3d_line)
+                synapse.tree3d_line = None
 
     def selectView(self, view):
         """
@@ -987,7 +1161,7 @@ class Viewer3D(QtWidgets.QLabel):
         self.menu_show_distal_synapses_active.setChecked(view['show_distal_synapses_active'])
 
         # Update simulation
-        self.updateElements3d()
+        self.updateElements3d(True)
 
         # Disable change options for the 'Default' view
         default_view_selected = False
@@ -1009,7 +1183,7 @@ class Viewer3D(QtWidgets.QLabel):
                 self.menu_show_bits_falsely_predicted.setChecked(False)
         else:
             self.menu_show_bits_none.setChecked(False)
-        self.updateElements3d()
+        self.updateElements3d(True)
 
     def menuShowCells_click(self, event):
         menu_clicked = self.sender()
@@ -1022,7 +1196,7 @@ class Viewer3D(QtWidgets.QLabel):
                 self.menu_show_cells_inactive.setChecked(False)
         else:
             self.menu_show_cells_none.setChecked(False)
-        self.updateElements3d()
+        self.updateElements3d(True)
 
     def menuShowProximalSegments_click(self, event):
         menu_clicked = self.sender()
@@ -1033,7 +1207,7 @@ class Viewer3D(QtWidgets.QLabel):
                 self.menu_show_proximal_segments_falsely_predicted.setChecked(False)
         else:
             self.menu_show_proximal_segments_none.setChecked(False)
-        self.updateElements3d()
+        self.updateElements3d(True)
 
     def menuShowProximalSynapses_click(self, event):
         menu_clicked = self.sender()
@@ -1045,7 +1219,7 @@ class Viewer3D(QtWidgets.QLabel):
                 self.menu_show_proximal_synapses_falsely_predicted.setChecked(False)
         else:
             self.menu_show_proximal_synapses_none.setChecked(False)
-        self.updateElements3d()
+        self.updateElements3d(True)
 
     def menuShowDistalSegments_click(self, event):
         menu_clicked = self.sender()
@@ -1054,7 +1228,7 @@ class Viewer3D(QtWidgets.QLabel):
                 self.menu_show_distal_segments_active.setChecked(False)
         else:
             self.menu_show_distal_segments_none.setChecked(False)
-        self.updateElements3d()
+        self.updateElements3d(True)
 
     def menuShowDistalSynapses_click(self, event):
         menu_clicked = self.sender()
@@ -1064,7 +1238,7 @@ class Viewer3D(QtWidgets.QLabel):
                 self.menu_show_distal_synapses_active.setChecked(False)
         else:
             self.menu_show_distal_synapses_none.setChecked(False)
-        self.updateElements3d()
+        self.updateElements3d(True)
 
     def menuView_click(self, event):
         menu_clicked = self.sender()
@@ -0,0 +1,87 @@
+import time
+from PyQt5 import QtCore
+
+
+class SimulationWorker(QtCore.QThread):
+    """
+    Performs time steps of the network in background, so the GUI keeps responsive while a simulation runs.
+    Results are published to the GUI at a bounded rate instead of once per step, as immutable snapshots of the network
+    (so the GUI never reads the network while a time step is performed).
+    """
+
+    # Emitted with the snapshot of the last time step performed, the number of steps and the time spent since the last
+    # publication.
+    stepsPerformed = QtCore.pyqtSignal(object, int, float)
+
+    def __init__(self, step_function, snapshot_function, num_steps, fast=False, publish_interval=0.2):
+        """
+        Initializes a new instance of this class.
+        """
+        QtCore.QThread.__init__(self)
+
+        # Function which performs a single time step given whether it is fast or not.
+        self.step_function = step_function
+
+        # Function which returns a snapshot of the network after the last time step.
+        self.snapshot_function = snapshot_function
+
+        # Number of time steps to be performed.
+        self.num_steps = num_steps
+
+        # Whether the steps are fast-forwarded (the last one always updates the elements).
+        self.fast = fast
+
+        # Minimum time (in seconds) between two publications.
+        self.publish_interval = publish_interval
+
+        # Flag to ask the loop to stop after the current time step.
+        self.stop_requested = False
+
+    def stop(self):
+        """
+        Ask to stop after the current time step.
+        """
+        self.stop_requested = True
+
+    def performStep(self, fast):
+        """
+        Perform a single time step and return the time spent on it.
+        """
+        start_time = time.time()
+        self.step_function(fast)
+        return time.time() - start_time
+
+    def run(self):
+        """
+        Perform the time steps publishing the progress from time to time.
+        """
+        last_publish_time = time.time()
+        elapsed_time = 0.0
+        pending_steps = 0
+        fast = False
+        for i in range(self.num_steps):
+            if self.stop_requested:
+                break
+
+            # Only the last step is not fast, so elements and statistics are updated at the end
+            fast = self.fast and i < self.num_steps - 1
+
+            elapsed_time += self.performStep(fast)
+            pending_steps += 1
+
+            # Publish only the latest step if the last publication is recent
+            end_time = time.time()
+            if end_time - last_publish_time >= self.publish_interval and not fast:
+                self.stepsPerformed.emit(self.snapshot_function(), pending_steps, elapsed_time)
+                last_publish_time = end_time
+                elapsed_time = 0.0
+                pending_steps = 0
+
+        # When stopped after a fast step, one more step (which is not fast) is performed to catch up the elements and
+        # statistics, otherwise the last published snapshot would not match the network anymore
+        if fast:
+            elapsed_time += self.performStep(False)
+            pending_steps += 1
+
+        if pending_steps > 0:
+            self.stepsPerformed.emit(self.snapshot_function(), pending_steps, elapsed_time)
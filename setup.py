@@ -48,7 +48,8 @@ setup(
         'nupic_studio.images': ['*'],
         'nupic_studio.projects': ['*']},
     entry_points = {
-        'gui_scripts': ['nupic_studio = nupic_studio.program:main']},
+        'gui_scripts': ['nupic_studio = nupic_studio.program:main'],
+        'console_scripts': ['nupic-studio = nupic_studio.runner:main']},
     description = 'NuPIC Studio is a virtual studio that allows developers to create, debug, and visualize HTM networks from NuPIC library',
     author='David Ragazzi',
     author_email='david_ragazzi@hotmail.com',
@@ -0,0 +1,230 @@
+import os
+import sys
+import time
+import argparse
+import numpy
+from nupic_studio import REPO_DIR, MachineState
+from nupic_studio.htm import MAX_PREVIOUS_STEPS
+from nupic_studio.htm.state_store import StateKind, StateStore
+
+"""
+Measures the time spent by the time steps, so the speed-ups of the state store and of the bulk update of the elements
+can be checked on a given machine.
+Usage:
+    python -m tests.benchmark.step_benchmark [--project FILE] [--steps N] [--elements N]
+The first part compares the old per-element states (one MachineState per state kind of each element) with a state
+store holding the same elements. The second part performs time steps on the network of a project (hot_gym.nuproj by
+default) and writes the time spent by the steps and by the update of the proximal elements of each region, comparing
+the latter with the per-synapse loop that updated them before, replayed on the same results of the algorithms.
+"""
+
+# Kinds of states kept for each synapse.
+SYNAPSE_KINDS = [StateKind.ACTIVE, StateKind.CONNECTED, StateKind.REMOVED, StateKind.PERMANENCE]
+
+
+def benchmarkStates(num_elements, num_steps, output):
+    """
+    Move the states of a given number of elements to the next time step using machine states and a state store.
+    """
+    output.write("States of " + str(num_elements) + " elements (" + str(num_steps) + " steps)\n")
+
+    # One machine state for each state kind of each element
+    machine_states = [MachineState(False, MAX_PREVIOUS_STEPS) for i in range(num_elements * len(SYNAPSE_KINDS))]
+    start_time = time.time()
+    for step in range(num_steps):
+        for machine_state in machine_states:
+            machine_state.rotate()
+    machine_states_time = (time.time() - start_time) / num_steps
+
+    # One ring buffer for each state kind
+    store = StateStore(SYNAPSE_KINDS, num_elements, carried=[StateKind.PERMANENCE])
+    store.allocateMany(num_elements)
+    start_time = time.time()
+    for step in range(num_steps):
+        store.nextStep()
+    store_time = (time.time() - start_time) / num_steps
+
+    output.write("Machine states: " + "{0:.3f}".format(machine_states_time * 1000) + " ms/step\n")
+    output.write("State store: " + "{0:.3f}".format(store_time * 1000) + " ms/step\n")
+    if store_time > 0:
+        output.write("Speed-up: " + "{0:.1f}".format(machine_states_time / store_time) + "x\n")
+
+
+class LoopSynapse(object):
+    """
+    Proximal synapse as it was kept before the state stores, with one machine state for each state kind.
+    """
+
+    def __init__(self, index_sp):
+        """
+        Initializes a new instance of this class.
+        """
+        self.index_sp = index_sp
+        self.permanence = MachineState(0.0, MAX_PREVIOUS_STEPS)
+        self.is_connected = MachineState(False, MAX_PREVIOUS_STEPS)
+        self.is_removed = MachineState(False, MAX_PREVIOUS_STEPS)
+
+
+class LoopSegment(object):
+    """
+    Proximal segment as it was kept before the state stores, with a list of synapses searched one by one.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of this class.
+        """
+        self.synapses = []
+
+    def getSynapse(self, index_sp):
+        """
+        Return the synapse connected to a given cell or sensor bit
+        """
+        for synapse in self.synapses:
+            if synapse.index_sp == index_sp:
+                return synapse
+
+
+def updateSpatialElementsLoop(region, segments, result):
+    """
+    Update the proximal synapses of the columns returned by the algorithms the way it was done before the bulk update,
+    one synapse of the input map at a time.
+    """
+    offset = 0
+    for col_idx in result.proximal_col_indices.tolist():
+        # Permanences and connections of all synapses of the column, as they were taken from the spatial pooler
+        pool = region.proximal_pools[col_idx]
+        column_permanences = numpy.zeros(region.input_size, dtype=numpy.float32)
+        column_permanences[pool] = result.proximal_permanences[offset:offset + len(pool)]
+        offset += len(pool)
+        permanences_synapses = column_permanences.tolist()
+        connected_synapses = (column_permanences >= region.proximal_syn_connected_perm).astype(int).tolist()
+
+        segment = segments.setdefault(col_idx, LoopSegment())
+        for syn_idx in range(len(permanences_synapses)):
+            # Get the proximal synapse given its position in the input map
+            # Create a new one if it doesn't exist
+            synapse = segment.getSynapse(syn_idx)
+
+            # Update proximal synapse
+            if permanences_synapses[syn_idx] > 0.0:
+                if synapse is None:
+                    synapse = LoopSynapse(syn_idx)
+                    segment.synapses.append(synapse)
+
+                # Update state
+                synapse.is_removed.setForCurrStep(False)
+                synapse.permanence.setForCurrStep(permanences_synapses[syn_idx])
+                synapse.is_connected.setForCurrStep(connected_synapses[syn_idx] == 1)
+            else:
+                if synapse is not None:
+                    synapse.is_removed.setForCurrStep(True)
+
+
+def timeMethod(obj, method_name, times, calls=None):
+    """
+    Replace a method of an object by one which appends the time spent by each call to a list and, if a list of calls is
+    given, the arguments of each call to it.
+    """
+    method = getattr(obj, method_name)
+
+    def timedMethod(*args, **kwargs):
+        if calls is not None:
+            calls.append(args)
+        start_time = time.time()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            times.append(time.time() - start_time)
+    setattr(obj, method_name, timedMethod)
+
+
+def benchmarkProject(file_name, num_steps, output):
+    """
+    Perform a given number of time steps on the network of a project, writing the time spent by them.
+    """
+    from nupic_studio.project import Project
+    from nupic_studio.htm.node import NodeType
+
+    output.write("Project '" + file_name + "' (" + str(num_steps) + " steps)\n")
+    project = Project()
+    project.open(os.path.abspath(file_name))
+    network = project.network
+    try:
+        if not network.initialize():
+            output.write("Network could not be initialized.\n")
+            return False
+
+        # Time the update of the proximal elements of each region, keeping the results of the algorithms so they can
+        # be replayed by the per-synapse loop
+        regions = {}
+        update_times = {}
+        update_calls = {}
+        for node in network.nodes:
+            if node.type == NodeType.REGION:
+                regions[node.name] = node
+                update_times[node.name] = []
+                update_calls[node.name] = []
+                timeMethod(node, 'updateSpatialElements', update_times[node.name], update_calls[node.name])
+
+        # The first step is left out given that it creates the elements
+        network.context.curr_step = 0
+        network.nextStep()
+        for times in update_times.values():
+            del times[:]
+
+        # Perform the time steps updating the elements and then only computing the algorithms
+        step_times = []
+        for step in range(num_steps):
+            network.context.curr_step += 1
+            start_time = time.time()
+            network.nextStep()
+            network.calculateStatistics()
+            step_times.append(time.time() - start_time)
+        fast_step_times = []
+        for step in range(num_steps):
+            network.context.curr_step += 1
+            start_time = time.time()
+            network.nextStep(fast=True)
+            fast_step_times.append(time.time() - start_time)
+
+        output.write("Step: " + "{0:.3f}".format(sum(step_times) / num_steps * 1000) + " ms/step\n")
+        output.write("Fast step: " + "{0:.3f}".format(sum(fast_step_times) / num_steps * 1000) + " ms/step\n")
+        for name in sorted(update_times):
+            times = update_times[name]
+            update_time = sum(times) / max(len(times), 1)
+            output.write("Proximal update of '" + name + "': " + "{0:.3f}".format(update_time * 1000) + " ms/step\n")
+
+            # Replay the same results with the per-synapse loop, leaving out the first step as well
+            calls = update_calls[name]
+            if len(calls) < 2:
+                continue
+            segments = {}
+            updateSpatialElementsLoop(regions[name], segments, *calls[0])
+            start_time = time.time()
+            for args in calls[1:]:
+                updateSpatialElementsLoop(regions[name], segments, *args)
+            loop_time = (time.time() - start_time) / (len(calls) - 1)
+            output.write("Per-synapse loop of '" + name + "': " + "{0:.3f}".format(loop_time * 1000) + " ms/step\n")
+            if update_time > 0:
+                output.write("Speed-up: " + "{0:.1f}".format(loop_time / update_time) + "x\n")
+        return True
+    finally:
+        network.shutdown()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Measures the time spent by the time steps of NuPIC Studio.")
+    parser.add_argument("--project", default=os.path.join(REPO_DIR, "projects", "hot_gym.nuproj"), help="project file (.nuproj)")
+    parser.add_argument("--steps", type=int, default=100, help="number of time steps to perform")
+    parser.add_argument("--elements", type=int, default=100000, help="number of elements whose states are moved")
+    args = parser.parse_args(args)
+
+    benchmarkStates(args.elements, args.steps, sys.stdout)
+    sys.stdout.write("\n")
+    succeeded = benchmarkProject(args.project, args.steps, sys.stdout)
+    return 0 if succeeded else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import unittest
+from nupic.research.connections import Connections
+from nupic_studio.htm.connections_tracker import ConnectionsTracker
+from nupic_studio.htm.run_context import NetworkError
+
+
+class ConnectionsTrackerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = Connections(16)
+        self.tracker = ConnectionsTracker(self.connections)
+
+    def testCreate(self):
+        segment = self.connections.createSegment(3)
+        synapse = self.connections.createSynapse(segment, 7, 0.5)
+        self.assertEqual(self.tracker.created_segments, {segment: 3})
+        self.assertEqual(self.tracker.created_synapses, set([synapse]))
+        self.assertEqual(self.tracker.destroyed_segments, set())
+        self.assertEqual(self.tracker.destroyed_synapses, set())
+
+    def testUpdatePermanence(self):
+        segment = self.connections.createSegment(3)
+        synapse = self.connections.createSynapse(segment, 7, 0.5)
+        self.tracker.reset()
+        self.connections.updateSynapsePermanence(synapse, 0.6)
+        self.assertEqual(self.tracker.updated_synapses, set([synapse]))
+        self.assertEqual(self.connections.dataForSynapse(synapse).permanence, 0.6)
+
+    def testDestroySynapse(self):
+        segment = self.connections.createSegment(3)
+        synapse = self.connections.createSynapse(segment, 7, 0.5)
+        self.tracker.reset()
+        self.connections.updateSynapsePermanence(synapse, 0.6)
+        self.connections.destroySynapse(synapse)
+        self.assertEqual(self.tracker.destroyed_synapses, set([synapse]))
+        self.assertEqual(self.tracker.updated_synapses, set())
+
+    def testCreateAndDestroyInSameStep(self):
+        segment = self.connections.createSegment(3)
+        synapse = self.connections.createSynapse(segment, 7, 0.5)
+        self.connections.destroySynapse(synapse)
+        self.assertEqual(self.tracker.created_synapses, set())
+        self.assertEqual(self.tracker.destroyed_synapses, set())
+
+    def testDestroySegment(self):
+        segment = self.connections.createSegment(3)
+        old_synapse = self.connections.createSynapse(segment, 7, 0.5)
+        self.tracker.reset()
+
+        # The original destroySegment destroys the synapses through destroySynapse, so each one must be forgotten once
+        new_synapse = self.connections.createSynapse(segment, 8, 0.5)
+        self.connections.destroySegment(segment)
+        self.assertEqual(self.tracker.destroyed_segments, set([segment]))
+        self.assertEqual(self.tracker.destroyed_synapses, set([old_synapse]))
+        self.assertEqual(self.tracker.created_synapses, set())
+        self.assertFalse(self.tracker.destroying_segment)
+        self.assertEqual(self.connections.numSynapses(), 0)
+
+    def testCreateAndDestroySegmentInSameStep(self):
+        segment = self.connections.createSegment(3)
+        self.connections.createSynapse(segment, 7, 0.5)
+        self.connections.destroySegment(segment)
+        self.assertEqual(self.tracker.created_segments, {})
+        self.assertEqual(self.tracker.destroyed_segments, set())
+        self.assertEqual(self.tracker.created_synapses, set())
+        self.assertEqual(self.tracker.destroyed_synapses, set())
+
+    def testMissingMethod(self):
+        class IncompleteConnections(object):
+            def createSegment(self, cell):
+                return 0
+
+        self.assertRaises(NetworkError, ConnectionsTracker, IncompleteConnections())
+
+
+if __name__ == '__main__':
+    unittest.main()
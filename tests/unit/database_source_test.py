@@ -0,0 +1,79 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from nupic_studio.htm.encoding import FieldDataType
+from nupic_studio.htm.database_source import DatabaseRecordStream, connection_pool, parseConnectionString
+
+
+class DatabaseRecordStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        # A database with a table of 5 records in a temporary directory
+        self.base_dir = tempfile.mkdtemp()
+        connection = sqlite3.connect(os.path.join(self.base_dir, 'data.db'))
+        connection.execute('CREATE TABLE records (value TEXT, flag INTEGER)')
+        connection.executemany('INSERT INTO records VALUES (?, ?)', [(str(i), i % 2) for i in range(5)])
+        connection.commit()
+        connection.close()
+        self.streams = []
+
+    def tearDown(self):
+        for stream in self.streams:
+            stream.close()
+        shutil.rmtree(self.base_dir)
+
+    def createStream(self, connection_string='sqlite:///data.db', table='records', **params):
+        stream = DatabaseRecordStream(connection_string, table, base_dir=self.base_dir, **params)
+        self.streams.append(stream)
+        return stream
+
+    def readAll(self, stream):
+        records = []
+        record = stream.getNextRecordDict()
+        while record is not None:
+            records.append(record)
+            record = stream.getNextRecordDict()
+        return records
+
+    def testParseConnectionString(self):
+        self.assertEqual(parseConnectionString('sqlite:///data.db'), ('sqlite', 'data.db'))
+        self.assertEqual(parseConnectionString('data.db'), ('sqlite', 'data.db'))
+
+    def testRelativePathIsResolvedFromBaseDir(self):
+        stream = self.createStream(batch_size=2)
+        self.assertEqual(stream.address, os.path.join(self.base_dir, 'data.db'))
+        self.assertEqual([record['value'] for record in self.readAll(stream)], ['0', '1', '2', '3', '4'])
+
+    def testConversionAndRewind(self):
+        field_types = {'value': FieldDataType.INTEGER, 'flag': FieldDataType.BOOLEAN}
+        stream = self.createStream(field_types=field_types, batch_size=2)
+        self.assertEqual(stream.getNextRecordDict(), {'value': 0, 'flag': False})
+        self.assertEqual(stream.getNextRecordDict(), {'value': 1, 'flag': True})
+        stream.rewind()
+        self.assertEqual(len(self.readAll(stream)), 5)
+
+    def testSeek(self):
+        stream = self.createStream(offset=3)
+        self.assertEqual([record['value'] for record in self.readAll(stream)], ['3', '4'])
+
+    def testMissingFile(self):
+        self.assertRaises(IOError, self.createStream, 'sqlite:///missing.db')
+        self.assertFalse(os.path.isfile(os.path.join(self.base_dir, 'missing.db')))
+
+    def testInvalidTable(self):
+        self.assertRaises(ValueError, self.createStream, table='records; DROP TABLE records')
+
+    def testConnectionIsShared(self):
+        stream = self.createStream()
+        other_stream = self.createStream()
+        self.assertIs(stream.pooled_connection, other_stream.pooled_connection)
+        self.assertEqual(stream.pooled_connection.references, 2)
+        stream.close()
+        other_stream.close()
+        self.assertEqual(len(connection_pool.connections), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
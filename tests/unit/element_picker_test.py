@@ -0,0 +1,77 @@
+import unittest
+from nupic_studio.simulation import ElementPicker
+
+
+class Elements(object):
+    """
+    Group of elements (like instances or lines) whose visibility is given by a set.
+    """
+
+    def __init__(self, hidden=()):
+        self.hidden = set(hidden)
+
+    def isVisible(self, idx):
+        return idx not in self.hidden
+
+
+class ElementPickerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.picker = ElementPicker()
+
+    def pickDown(self, x, y):
+        # Cast a ray from above the elements to below them
+        return self.picker.pick((x, y, 100), (x, y, -100))
+
+    def testPickNearestSphere(self):
+        self.picker.add("low", (0, 0, -10), 1.0)
+        self.picker.add("high", (0, 0, 10), 1.0)
+        name, position = self.pickDown(0, 0)
+        self.assertEqual(name, "high")
+        self.assertAlmostEqual(position[2], 11.0)
+
+    def testMissSphere(self):
+        self.picker.add("bit", (0, 0, 0), 1.0)
+        self.assertEqual(self.pickDown(2, 0), (None, None))
+
+    def testHiddenInstanceIsNotPicked(self):
+        instances = Elements(hidden=[0])
+        self.picker.add("hidden", (0, 0, 10), 1.0, instances, 0)
+        self.picker.add("shown", (0, 0, -10), 1.0, instances, 1)
+        self.assertEqual(self.pickDown(0, 0)[0], "shown")
+
+    def testPickLine(self):
+        self.picker.addLine("segment", (0, 0, 0), (100, 0, 0), 1.0)
+        name, position = self.pickDown(70, 0.5)
+        self.assertEqual(name, "segment")
+        self.assertAlmostEqual(position[0], 70.0)
+        self.assertEqual(self.pickDown(70, 1.5), (None, None))
+        self.assertEqual(self.pickDown(102, 0), (None, None))
+
+    def testLineIsOnlyPutInCellsAroundIt(self):
+        self.picker.addLine("segment", (0, 0, 0), (100, 100, 0), 1.0)
+        entry, cells = self.picker.entries["segment"]
+        # The bounding box of the line covers 21 x 21 cells in each layer
+        self.assertTrue(len(cells) < 21 * 21)
+        self.assertEqual(self.pickDown(0, 100), (None, None))
+
+    def testHiddenLineIsNotPicked(self):
+        lines = Elements(hidden=[3])
+        self.picker.addLine("segment_3", (0, 0, 0), (10, 0, 0), 1.0, lines, 3)
+        self.assertEqual(self.pickDown(5, 0), (None, None))
+
+    def testRemove(self):
+        self.picker.addLine("synapse_0", (0, 0, 0), (10, 0, 0), 0.5)
+        self.picker.remove("synapse_0")
+        self.assertEqual(self.pickDown(5, 0), (None, None))
+        self.assertEqual(sum(len(entries) for entries in self.picker.grid.values()), 0)
+
+    def testReplaceLine(self):
+        self.picker.addLine("synapse_0", (0, 0, 0), (10, 0, 0), 0.5)
+        self.picker.addLine("synapse_0", (0, 20, 0), (10, 20, 0), 0.5)
+        self.assertEqual(self.pickDown(5, 0), (None, None))
+        self.assertEqual(self.pickDown(5, 20)[0], "synapse_0")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+from nupic_studio.htm import encoded_records
+from nupic_studio.htm.encoded_records import EncodedRecords, getCachePrefix
+
+
+class EncodedRecordsTest(unittest.TestCase):
+
+    def setUp(self):
+        # Cache files are written in a temporary directory instead of the user's one
+        self.cache_dir = tempfile.mkdtemp()
+        self.original_cache_dir = encoded_records.CACHE_DIR
+        encoded_records.CACHE_DIR = self.cache_dir
+        self.prefix = os.path.join(self.cache_dir, 'data.csv.0123abcd.')
+
+    def tearDown(self):
+        encoded_records.CACHE_DIR = self.original_cache_dir
+        shutil.rmtree(self.cache_dir)
+
+    def createRecords(self, name, **params):
+        return EncodedRecords(self.prefix + name + '.npz', 10, stale_prefix=self.prefix, **params)
+
+    def recordPass(self, records):
+        outputs = [numpy.array([1, 0, 0, 1, 0, 0, 0, 0, 0, 1]), numpy.array([0, 1, 1, 0, 0, 0, 0, 0, 1, 0])]
+        for i in range(len(outputs)):
+            records.add(outputs[i], [float(i)])
+        return outputs
+
+    def testNextPasses(self):
+        records = self.createRecords('a')
+        outputs = self.recordPass(records)
+        self.assertTrue(records.finishPass())
+        for i in range(2 * len(outputs)):
+            output_array, output_values = records.getNext()
+            self.assertEqual(output_array.tolist(), outputs[i % len(outputs)].tolist())
+            self.assertEqual(output_values.tolist(), [float(i % len(outputs))])
+
+    def testLoad(self):
+        records = self.createRecords('a')
+        outputs = self.recordPass(records)
+        records.finishPass()
+        loaded_records = self.createRecords('a')
+        self.assertTrue(loaded_records.load())
+        self.assertEqual(loaded_records.getNext()[0].tolist(), outputs[0].tolist())
+
+    def testLoadMissingFile(self):
+        self.assertFalse(self.createRecords('a').load())
+
+    def testTooLargeSource(self):
+        records = self.createRecords('a', max_size=4)
+        self.recordPass(records)
+        self.assertFalse(records.enabled)
+        self.assertFalse(records.finishPass())
+
+    def testStaleFilesAreRemoved(self):
+        other_file_name = os.path.join(self.cache_dir, 'other.csv.4567cdef.b.npz')
+        open(other_file_name, 'w').close()
+        old_records = self.createRecords('a')
+        self.recordPass(old_records)
+        old_records.finishPass()
+        new_records = self.createRecords('b')
+        self.recordPass(new_records)
+        new_records.finishPass()
+        self.assertFalse(os.path.isfile(old_records.cache_file_name))
+        self.assertTrue(os.path.isfile(new_records.cache_file_name))
+        self.assertTrue(os.path.isfile(other_file_name))
+
+    def testPrefixDependsOnPath(self):
+        self.assertNotEqual(getCachePrefix(os.path.join('a', 'data.csv')), getCachePrefix(os.path.join('b', 'data.csv')))
+        self.assertTrue(os.path.basename(getCachePrefix(os.path.join('a', 'data.csv'))).startswith('data.csv.'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+from nupic_studio.htm import encoded_records
+from nupic_studio.htm.encoding import EncoderMemo
+from nupic_studio.htm.encoded_records import EncodedRecords
+
+
+class CountingEncoder(object):
+    """
+    Encoder which sets the bit given by the value (or the sum of the values) and counts how many times it is called.
+    """
+
+    def __init__(self):
+        self.encode_calls = 0
+        self.decode_calls = 0
+
+    def getWidth(self):
+        return 4
+
+    def encodeIntoArray(self, value, output):
+        self.encode_calls += 1
+        output[int(numpy.sum(value)) % 4] = 1
+
+    def getScalars(self, value):
+        # Integer scalars, like the ones of some encoders
+        return numpy.array([numpy.sum(value)], dtype=numpy.int64)
+
+    def decode(self, encoded, parentFieldName=''):
+        self.decode_calls += 1
+        return {parentFieldName: int(numpy.argmax(encoded))}, [parentFieldName]
+
+
+class EncoderMemoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.encoder = CountingEncoder()
+        self.memo = EncoderMemo(self.encoder, max_size=2)
+
+    def testEncodingsAreMemoized(self):
+        output, scalars = self.memo.encode(1)
+        self.assertEqual(output.tolist(), [0, 1, 0, 0])
+        self.assertEqual(scalars.tolist(), [1])
+        self.memo.encode(1)
+        self.assertEqual(self.encoder.encode_calls, 1)
+        self.assertEqual((self.memo.encode_hits, self.memo.encode_misses), (1, 1))
+
+    def testScalarsMatchEncodedRecords(self):
+        cache_dir = tempfile.mkdtemp()
+        original_cache_dir = encoded_records.CACHE_DIR
+        encoded_records.CACHE_DIR = cache_dir
+        try:
+            # Encode the record in the first pass and take it from the encoded records in the next one
+            records = EncodedRecords(os.path.join(cache_dir, 'data.npz'), 4)
+            output, scalars = self.memo.encode(3)
+            records.add(output, scalars)
+            self.assertTrue(records.finishPass())
+            cached_output, cached_scalars = records.getNext()
+        finally:
+            encoded_records.CACHE_DIR = original_cache_dir
+            shutil.rmtree(cache_dir)
+        self.assertEqual(output.tolist(), cached_output.tolist())
+        self.assertEqual(scalars.tolist(), cached_scalars.tolist())
+        self.assertEqual(scalars.dtype, cached_scalars.dtype)
+
+    def testLeastRecentlyUsedIsDiscarded(self):
+        self.memo.encode(1)
+        self.memo.encode(2)
+        self.memo.encode(1)
+        self.memo.encode(3)
+        self.assertEqual(list(self.memo.encodings.keys()), [1, 3])
+        self.memo.encode(2)
+        self.assertEqual(self.encoder.encode_calls, 4)
+
+    def testUnhashableValuesAreNotMemoized(self):
+        self.memo.encode([1])
+        self.memo.encode([1])
+        self.assertEqual(self.encoder.encode_calls, 2)
+        self.assertEqual(len(self.memo.encodings), 0)
+
+    def testDecodingsAreKeyedByBits(self):
+        fields, order = self.memo.decode(numpy.array([0, 0, 1, 0]), 'field')
+        self.assertEqual(fields, {'field': 2})
+        self.memo.decode(numpy.array([0.0, 0.0, 0.7, 0.0]), 'field')
+        self.assertEqual(self.encoder.decode_calls, 1)
+        self.assertEqual((self.memo.decode_hits, self.memo.decode_misses), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
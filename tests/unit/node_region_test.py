@@ -0,0 +1,45 @@
+import unittest
+import numpy
+from nupic_studio.htm.node_region import Region
+from nupic_studio.htm.node_sensor import Sensor
+
+
+class RegionInputTest(unittest.TestCase):
+
+    def setUp(self):
+        # A sensor with 10 bits whose encoder only outputs 7 of them, followed by a sensor with 6 bits
+        self.narrow_sensor = Sensor("narrow")
+        self.narrow_sensor.width = 10
+        self.narrow_sensor.height = 1
+        self.sensor = Sensor("sensor")
+        self.sensor.width = 6
+        self.sensor.height = 1
+
+        # The input map is arranged as Region.initialize does, with as many positions as bits in each sensor
+        self.region = Region("region")
+        self.region.input_feeders = [self.narrow_sensor, self.sensor]
+        self.region.input_sources = [(None, numpy.arange(10)), (None, numpy.arange(6))]
+        self.region.input = numpy.zeros(16, dtype=int)
+
+    def testFeedersKeepTheirPositions(self):
+        self.narrow_sensor.output = numpy.array([1, 0, 0, 0, 0, 0, 1])
+        self.sensor.output = numpy.array([1, 1, 0, 0, 0, 1])
+        input = self.region.getInput()
+        self.assertEqual(input.tolist(), [1, 0, 0, 0, 0, 0, 1, 0, 0, 0] + [1, 1, 0, 0, 0, 1])
+
+    def testPositionsBeyondOutputAreCleared(self):
+        self.region.input[:] = 1
+        self.narrow_sensor.output = numpy.zeros(7)
+        self.sensor.output = numpy.zeros(6)
+        input = self.region.getInput()
+        self.assertEqual(input.tolist(), [0] * 16)
+
+
+class RegionColumnsTest(unittest.TestCase):
+
+    def testNoColumnsBeforeInitialize(self):
+        self.assertEqual(Region("region").columns, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
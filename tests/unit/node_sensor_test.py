@@ -0,0 +1,59 @@
+import unittest
+import numpy
+from nupic_studio.htm.encoding import Encoding
+from nupic_studio.htm.node_sensor import Sensor, PredictionsMethod
+from nupic_studio.htm.run_context import RunContext
+
+
+class WidthEncoder(object):
+    """
+    Encoder which only gives its width and puts every value in the first bucket.
+    """
+
+    def __init__(self, width):
+        self.width = width
+
+    def getWidth(self):
+        return self.width
+
+    def getBucketIndices(self, value):
+        return [0]
+
+
+class RecordingClassifier(object):
+    """
+    Classifier which keeps the patterns that it is given.
+    """
+
+    def __init__(self):
+        self.patterns = []
+
+    def compute(self, recordNum, patternNZ, classification, learn, infer):
+        self.patterns.append(patternNZ)
+        return {}
+
+
+class SensorClassificationTest(unittest.TestCase):
+
+    def setUp(self):
+        # A sensor whose output is made of an encoding of 4 bits followed by an encoding of 6 bits
+        self.sensor = Sensor("sensor")
+        self.sensor.context = RunContext()
+        self.sensor.predictions_method = PredictionsMethod.CLASSIFICATION
+        for width in [4, 6]:
+            encoding = Encoding()
+            encoding.encoder = WidthEncoder(width)
+            encoding.classifier = RecordingClassifier()
+            encoding.enable_inference = True
+            self.sensor.encodings.append(encoding)
+        self.sensor.record_values = [0, 0]
+
+    def testEachEncodingClassifiesItsOwnBits(self):
+        self.sensor.output = numpy.array([0, 1, 0, 1] + [1, 0, 0, 0, 1, 1])
+        self.sensor.getPredictions(fast=True)
+        self.assertEqual(self.sensor.encodings[0].classifier.patterns, [[1, 3]])
+        self.assertEqual(self.sensor.encodings[1].classifier.patterns, [[4, 8, 9]])
+
+
+if __name__ == '__main__':
+    unittest.main()
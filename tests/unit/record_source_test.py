@@ -0,0 +1,91 @@
+import unittest
+from nupic_studio.htm.record_source import RecordSource
+
+
+class ListStream(object):
+    """
+    Stream with the interface of a FileRecordStream which returns the records of a list.
+    """
+
+    def __init__(self, records, fail_at=None):
+        self.records = records
+        self.fail_at = fail_at
+        self.position = 0
+        self.rewinds = 0
+
+    def getNextRecordDict(self):
+        if self.position == self.fail_at:
+            raise IOError("read failed")
+        if self.position >= len(self.records):
+            return None
+        record = self.records[self.position]
+        self.position += 1
+        return record
+
+    def rewind(self):
+        self.position = 0
+        self.rewinds += 1
+
+
+class RecordSourceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sources = []
+
+    def tearDown(self):
+        for source in self.sources:
+            source.close()
+
+    def createSource(self, stream, **params):
+        source = RecordSource(stream, **params)
+        self.sources.append(source)
+        return source
+
+    def readPass(self, source):
+        records = []
+        record = source.getNextRecordDict()
+        while record is not None:
+            records.append(record)
+            record = source.getNextRecordDict()
+        return records
+
+    def testPassesFromCache(self):
+        records = [{'value': i} for i in range(10)]
+        stream = ListStream(records)
+        source = self.createSource(stream, batch_size=3)
+        self.assertEqual(self.readPass(source), records)
+        source.rewind()
+        self.assertEqual(self.readPass(source), records)
+        self.assertTrue(source.reading_cache)
+        self.assertEqual(stream.rewinds, 0)
+
+    def testPassesFromStream(self):
+        records = [{'value': i} for i in range(10)]
+        stream = ListStream(records)
+        source = self.createSource(stream, batch_size=3, max_cached_records=4)
+        self.assertEqual(self.readPass(source), records)
+        source.rewind()
+        self.assertEqual(self.readPass(source), records)
+        self.assertFalse(source.reading_cache)
+
+    def testRewindInTheMiddle(self):
+        records = [{'value': i} for i in range(10)]
+        source = self.createSource(ListStream(records), batch_size=3)
+        source.getNextRecordDict()
+        source.getNextRecordDict()
+        source.rewind()
+        self.assertEqual(self.readPass(source), records)
+
+    def testErrorIsSticky(self):
+        records = [{'value': i} for i in range(10)]
+        source = self.createSource(ListStream(records, fail_at=4), batch_size=2)
+        self.assertEqual(source.getNextRecordDict(), records[0])
+        self.assertEqual(source.getNextRecordDict(), records[1])
+        self.assertEqual(source.getNextRecordDict(), records[2])
+        self.assertEqual(source.getNextRecordDict(), records[3])
+        self.assertRaises(IOError, source.getNextRecordDict)
+        self.assertRaises(IOError, source.getNextRecordDict)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from nupic_studio.htm.state_store import StateKind, StateStore
+
+
+class StateStoreRingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = StateStore([StateKind.ACTIVE, StateKind.PERMANENCE], capacity=2, max_len=3,
+                                carried=[StateKind.PERMANENCE])
+
+    def testStepsAgo(self):
+        id = self.store.allocate()
+        for value in [True, False, True]:
+            self.store.nextStep()
+            self.store.set(StateKind.ACTIVE, id, value)
+        self.assertEqual(self.store.get(StateKind.ACTIVE, id), True)
+        self.assertEqual(self.store.get(StateKind.ACTIVE, id, 1), False)
+        self.assertEqual(self.store.get(StateKind.ACTIVE, id, 2), True)
+        self.assertEqual(self.store.getHistory(StateKind.ACTIVE, id), [True, False, True])
+
+    def testOldestStepIsOverwritten(self):
+        id = self.store.allocate()
+        self.store.nextStep()
+        self.store.set(StateKind.ACTIVE, id, True)
+        for i in range(3):
+            self.store.nextStep()
+        self.assertEqual(self.store.getHistory(StateKind.ACTIVE, id), [False, False, False])
+        self.assertEqual(self.store.recorded_steps, 3)
+
+    def testCarriedKinds(self):
+        id = self.store.allocate()
+        self.store.set(StateKind.ACTIVE, id, True)
+        self.store.set(StateKind.PERMANENCE, id, 0.5)
+        self.store.nextStep()
+        self.assertEqual(self.store.get(StateKind.ACTIVE, id), False)
+        self.assertAlmostEqual(self.store.get(StateKind.PERMANENCE, id), 0.5)
+
+    def testReleasedIdIsCleanedWhenReused(self):
+        id = self.store.allocate()
+        self.store.set(StateKind.ACTIVE, id, True)
+        self.store.release(id)
+        self.assertEqual(self.store.allocate(), id)
+        self.assertEqual(self.store.get(StateKind.ACTIVE, id), False)
+
+    def testGrow(self):
+        ids = self.store.allocateMany(5)
+        self.assertEqual(ids.tolist(), [0, 1, 2, 3, 4])
+        self.assertTrue(self.store.capacity >= 5)
+        self.store.set(StateKind.ACTIVE, ids, True)
+        self.assertEqual(self.store.getCurrRow(StateKind.ACTIVE)[:5].tolist(), [True] * 5)
+
+    def testCopyIsFrozen(self):
+        id = self.store.allocate()
+        self.store.set(StateKind.ACTIVE, id, True)
+        copy = self.store.copy()
+        self.store.nextStep()
+        self.store.set(StateKind.ACTIVE, id, False)
+        self.assertEqual(copy.get(StateKind.ACTIVE, id), True)
+
+    def testCopyIsFrozenWhenCurrentStepChanges(self):
+        id = self.store.allocate()
+        self.store.nextStep()
+        copy = self.store.copy()
+        self.store.set(StateKind.ACTIVE, id, True)
+        self.assertEqual(copy.get(StateKind.ACTIVE, id), False)
+        self.assertEqual(self.store.get(StateKind.ACTIVE, id), True)
+
+    def testCopyIsFrozenWhenIdIsReused(self):
+        id = self.store.allocate()
+        self.store.set(StateKind.PERMANENCE, id, 0.5)
+        self.store.nextStep()
+        copy = self.store.copy()
+        self.store.release(id)
+        self.store.allocate()
+        self.assertAlmostEqual(copy.get(StateKind.PERMANENCE, id, 1), 0.5)
+        self.assertEqual(self.store.get(StateKind.PERMANENCE, id, 1), 0.0)
+
+    def testCopySharesRows(self):
+        self.store.allocateMany(2)
+        copy = self.store.copy()
+        self.assertIs(copy.getRow(StateKind.ACTIVE, 1), self.store.getRow(StateKind.ACTIVE, 1))
+
+
+class StateStoreCountersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = StateStore([StateKind.ACTIVE], capacity=1, max_len=3,
+                                counters={'activation_count': StateKind.ACTIVE})
+        self.id = self.store.allocate()
+
+    def performSteps(self, values):
+        for value in values:
+            self.store.nextStep()
+            self.store.set(StateKind.ACTIVE, self.id, value)
+            self.store.updateCounters()
+
+    def testCounters(self):
+        self.performSteps([True, False, True, True])
+        self.assertEqual(self.store.getCounter('activation_count', self.id), 3)
+        self.assertEqual(self.store.getRate('activation_count', self.id), 0.75)
+        self.assertTrue(self.store.countsAllSteps())
+
+    def testCountersFromHistoryWhenNotCounting(self):
+        self.store.setCounting(False)
+        self.performSteps([True, True, False, True, False])
+        self.assertEqual(self.store.getCounter('activation_count', self.id), 1)
+        self.assertEqual(self.store.getCountedSteps(), 3)
+        self.assertFalse(self.store.countsAllSteps())
+
+    def testCountersAreBackfilledWhenEnabled(self):
+        self.store.setCounting(False)
+        self.performSteps([True, True, False, True])
+        self.store.setCounting(True)
+        self.store.updateCounters()
+        self.assertEqual(self.store.getCounter('activation_count', self.id), 2)
+        self.assertEqual(self.store.getCountedSteps(), 3)
+        self.assertFalse(self.store.countsAllSteps())
+
+    def testCopyKeepsCounters(self):
+        self.performSteps([True, True])
+        copy = self.store.copy()
+        self.performSteps([True])
+        self.assertEqual(copy.getCounter('activation_count', self.id), 2)
+        self.assertEqual(self.store.getCounter('activation_count', self.id), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()